@@ -2,14 +2,65 @@
 """
 Data Simulator for Full Circle Exchange
 Generates 10k+ realistic transactions based on Tab 1 pricing parameters
+
+For scale testing (10M+ rows) pass --output-dir: transactions are then drawn
+as whole arrays per chunk, sharded over worker processes with independent
+seed streams, and written as part files as they are generated.
 """
 
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+import argparse
 import random
-import json
 import os
+import sys
+import time
+
+# Configuration arrays
+IPHONE_MODELS = [
+    'iPhone 11', 'iPhone 11 Pro', 'iPhone 11 Pro Max',
+    'iPhone 12', 'iPhone 12 Mini', 'iPhone 12 Pro', 'iPhone 12 Pro Max',
+    'iPhone 13', 'iPhone 13 Mini', 'iPhone 13 Pro', 'iPhone 13 Pro Max',
+    'iPhone 14', 'iPhone 14 Plus', 'iPhone 14 Pro', 'iPhone 14 Pro Max',
+    'iPhone 15', 'iPhone 15 Plus', 'iPhone 15 Pro', 'iPhone 15 Pro Max'
+]
+
+MARKETS = ['romania', 'bulgaria', 'greece', 'poland', 'finland']
+INVENTORY_LEVELS = ['low', 'decent', 'high']
+PRICING_TIERS = [0.9, 1.0, 1.1]  # Competitive, Market, Premium
+
+# Base prices for iPhone models (EUR) - realistic market prices
+BASE_PRICES = {
+    'iPhone 11': 320, 'iPhone 11 Pro': 420, 'iPhone 11 Pro Max': 480,
+    'iPhone 12': 480, 'iPhone 12 Mini': 420, 'iPhone 12 Pro': 580, 'iPhone 12 Pro Max': 650,
+    'iPhone 13': 600, 'iPhone 13 Mini': 540, 'iPhone 13 Pro': 720, 'iPhone 13 Pro Max': 780,
+    'iPhone 14': 720, 'iPhone 14 Plus': 780, 'iPhone 14 Pro': 900, 'iPhone 14 Pro Max': 980,
+    'iPhone 15': 880, 'iPhone 15 Plus': 940, 'iPhone 15 Pro': 1100, 'iPhone 15 Pro Max': 1200
+}
+
+# Market multipliers for logistics and demand
+MARKET_MULTIPLIERS = {
+    'romania': 0.95, 'bulgaria': 0.93, 'greece': 1.02, 
+    'poland': 0.98, 'finland': 1.08
+}
+
+# Logistics costs by market (EUR)
+LOGISTICS_COSTS = {
+    'romania': 15, 'bulgaria': 18, 'greece': 25, 
+    'poland': 20, 'finland': 30
+}
+
+# Partitioned generation: rows per shard (one seed stream each) and per part file
+SHARD_ROWS = 1_000_000
+CHUNK_ROWS = 250_000
+
+# Feedback simulation: decision features and outcomes (outcomes repeat to weight them)
+FEEDBACK_MODELS = ['iPhone 13', 'iPhone 13 Pro', 'iPhone 14', 'iPhone 14 Pro', 'iPhone 15']
+SALE_OUTCOMES = ['Device Sold', 'Device Sold', 'Device Sold', 'Still in Inventory', 'Price Reduced']
+FEEDBACK_FEATURES = ['Model', 'market', 'Battery', 'inventory_level', 'Backglass_Damage', 'Screen_Damage',
+                     'new_model_imminent']
 
 # Set random seeds for reproducibility
 np.random.seed(42)
@@ -18,40 +69,6 @@ random.seed(42)
 def generate_simulated_transactions(num_records=10000):
     """Generate realistic iPhone resale transaction data"""
     
-    # Configuration arrays
-    iphone_models = [
-        'iPhone 11', 'iPhone 11 Pro', 'iPhone 11 Pro Max',
-        'iPhone 12', 'iPhone 12 Mini', 'iPhone 12 Pro', 'iPhone 12 Pro Max',
-        'iPhone 13', 'iPhone 13 Mini', 'iPhone 13 Pro', 'iPhone 13 Pro Max',
-        'iPhone 14', 'iPhone 14 Plus', 'iPhone 14 Pro', 'iPhone 14 Pro Max',
-        'iPhone 15', 'iPhone 15 Plus', 'iPhone 15 Pro', 'iPhone 15 Pro Max'
-    ]
-    
-    markets = ['romania', 'bulgaria', 'greece', 'poland', 'finland']
-    inventory_levels = ['low', 'decent', 'high']
-    pricing_tiers = [0.9, 1.0, 1.1]  # Competitive, Market, Premium
-    
-    # Base prices for iPhone models (EUR) - realistic market prices
-    base_prices = {
-        'iPhone 11': 320, 'iPhone 11 Pro': 420, 'iPhone 11 Pro Max': 480,
-        'iPhone 12': 480, 'iPhone 12 Mini': 420, 'iPhone 12 Pro': 580, 'iPhone 12 Pro Max': 650,
-        'iPhone 13': 600, 'iPhone 13 Mini': 540, 'iPhone 13 Pro': 720, 'iPhone 13 Pro Max': 780,
-        'iPhone 14': 720, 'iPhone 14 Plus': 780, 'iPhone 14 Pro': 900, 'iPhone 14 Pro Max': 980,
-        'iPhone 15': 880, 'iPhone 15 Plus': 940, 'iPhone 15 Pro': 1100, 'iPhone 15 Pro Max': 1200
-    }
-    
-    # Market multipliers for logistics and demand
-    market_multipliers = {
-        'romania': 0.95, 'bulgaria': 0.93, 'greece': 1.02, 
-        'poland': 0.98, 'finland': 1.08
-    }
-    
-    # Logistics costs by market (EUR)
-    logistics_costs = {
-        'romania': 15, 'bulgaria': 18, 'greece': 25, 
-        'poland': 20, 'finland': 30
-    }
-    
     transactions = []
     
     # Generate date range (last 18 months)
@@ -60,8 +77,8 @@ def generate_simulated_transactions(num_records=10000):
     
     for i in range(num_records):
         # Random device characteristics
-        model = np.random.choice(iphone_models, p=get_model_weights())
-        market = random.choice(markets)
+        model = np.random.choice(IPHONE_MODELS, p=get_model_weights())
+        market = random.choice(MARKETS)
         battery = np.random.normal(88, 8)  # Normal distribution around 88%
         battery = max(60, min(100, int(battery)))  # Clamp to valid range
         
@@ -71,7 +88,7 @@ def generate_simulated_transactions(num_records=10000):
         has_damage = has_screen_damage or has_backglass_damage
         
         # Market context
-        inventory_level = np.random.choice(inventory_levels, p=[0.3, 0.5, 0.2])  # More decent inventory
+        inventory_level = np.random.choice(INVENTORY_LEVELS, p=[0.3, 0.5, 0.2])  # More decent inventory
         new_model_imminent = random.random() < 0.15  # 15% of time new model coming
         
         # Pricing strategy selection (AI bandit simulation)
@@ -83,11 +100,11 @@ def generate_simulated_transactions(num_records=10000):
         else:
             tier_probs = [0.2, 0.5, 0.3]  # More premium for good condition
         
-        pricing_tier = np.random.choice(pricing_tiers, p=tier_probs)
+        pricing_tier = np.random.choice(PRICING_TIERS, p=tier_probs)
         
         # Calculate base selling price
-        base_price = base_prices[model]
-        market_adjusted_price = base_price * market_multipliers[market]
+        base_price = BASE_PRICES[model]
+        market_adjusted_price = base_price * MARKET_MULTIPLIERS[market]
         
         # Apply pricing tier
         selling_price_eur = market_adjusted_price * pricing_tier
@@ -122,7 +139,7 @@ def generate_simulated_transactions(num_records=10000):
             refurbishing_cost_eur = selling_price_eur * 0.04  # Cleaning only
             refurbishing_tier = 'cleaning'
         
-        logistics_cost_eur = logistics_costs[market]
+        logistics_cost_eur = LOGISTICS_COSTS[market]
         operational_cost_eur = selling_price_eur * 0.10  # 10% operational
         
         total_costs = acquisition_cost_eur + refurbishing_cost_eur + logistics_cost_eur + operational_cost_eur
@@ -149,7 +166,7 @@ def generate_simulated_transactions(num_records=10000):
         transaction_date = start_date + timedelta(days=random_days)
         
         # Create vanilla profit for baseline comparison (simple market rate pricing)
-        vanilla_selling_price = base_price * market_multipliers[market] * 1.0  # Always market rate
+        vanilla_selling_price = base_price * MARKET_MULTIPLIERS[market] * 1.0  # Always market rate
         vanilla_costs = (vanilla_selling_price * 0.70) + (vanilla_selling_price * 0.06) + logistics_cost_eur + (vanilla_selling_price * 0.10)
         vanilla_profit_eur = vanilla_selling_price - vanilla_costs
         
@@ -196,6 +213,145 @@ def get_model_weights():
     weights = [w / sum(weights) for w in weights]
     return weights
 
+def generate_transactions_vectorized(num_records, rng, end_date=None):
+    """
+    Same transactions as generate_simulated_transactions, drawn column by column.
+
+    Every column is one array draw from rng (a numpy Generator) and the pricing
+    rules are applied with array masks, so the distributions match the loop
+    version while the cost per row is a few vector operations.
+    """
+    n = num_records
+    end_date = end_date or datetime.now()
+    start_date = end_date - timedelta(days=540)
+
+    # Random device characteristics
+    model_index = rng.choice(len(IPHONE_MODELS), size=n, p=get_model_weights())
+    market_index = rng.integers(0, len(MARKETS), size=n)
+    battery = np.clip(np.trunc(rng.normal(88, 8, size=n)), 60, 100).astype(np.int64)
+
+    has_screen_damage = rng.random(n) < 0.12
+    has_backglass_damage = rng.random(n) < 0.15
+    has_damage = has_screen_damage | has_backglass_damage
+
+    inventory_index = rng.choice(len(INVENTORY_LEVELS), size=n, p=[0.3, 0.5, 0.2])
+    high_inventory = inventory_index == INVENTORY_LEVELS.index('high')
+    new_model_imminent = rng.random(n) < 0.15
+
+    # Tier probabilities per row, same rules as the loop version
+    tier_probs = np.where(
+        high_inventory[:, None], [0.6, 0.3, 0.1],
+        np.where(((battery < 80) | has_damage)[:, None], [0.5, 0.4, 0.1], [0.2, 0.5, 0.3])
+    )
+    tier_index = (rng.random(n)[:, None] > np.cumsum(tier_probs, axis=1)[:, :2]).sum(axis=1)
+    pricing_tier = np.asarray(PRICING_TIERS)[tier_index]
+
+    # Selling price with condition and market adjustments
+    base_price = np.asarray([BASE_PRICES[model] for model in IPHONE_MODELS], dtype=np.float64)[model_index]
+    market_multiplier = np.asarray([MARKET_MULTIPLIERS[market] for market in MARKETS])[market_index]
+    selling_price_eur = base_price * market_multiplier * pricing_tier
+    selling_price_eur = np.where(battery < 80, selling_price_eur * 0.95, selling_price_eur)
+    selling_price_eur = np.where(has_damage, selling_price_eur * 0.88, selling_price_eur)
+    selling_price_eur = np.where(new_model_imminent, selling_price_eur * 0.92, selling_price_eur)
+    selling_price_eur = np.where(high_inventory, selling_price_eur * 0.96, selling_price_eur)
+    selling_price_eur = np.round(selling_price_eur, 2)
+
+    # Costs
+    acquisition_cost_eur = selling_price_eur * 0.70
+    major_damage = has_screen_damage & has_backglass_damage
+    refurbishing_rate = np.select([major_damage, has_damage], [0.15, 0.08], default=0.04)
+    refurbishing_cost_eur = selling_price_eur * refurbishing_rate
+    refurbishing_tier = np.select([major_damage, has_damage], ['major', 'minor'], default='cleaning')
+    logistics_cost_eur = np.asarray([LOGISTICS_COSTS[market] for market in MARKETS])[market_index]
+    operational_cost_eur = selling_price_eur * 0.10
+
+    total_costs = acquisition_cost_eur + refurbishing_cost_eur + logistics_cost_eur + operational_cost_eur
+    profit_eur = selling_price_eur - total_costs
+    profit_margin = np.divide(profit_eur, selling_price_eur, out=np.zeros(n), where=selling_price_eur > 0)
+
+    # Days to sell (influenced by pricing strategy and condition)
+    base_days = 14 + np.select([tier_index == 2, tier_index == 0], [7, -5], default=0) + np.where(has_damage, 3, 0)
+    days_to_sell = np.maximum(1, np.trunc(rng.normal(base_days, 5)).astype(np.int64))
+
+    transaction_date = np.datetime64(start_date.date()) + rng.integers(0, 541, size=n).astype('timedelta64[D]')
+
+    # Vanilla profit for baseline comparison (always market rate)
+    vanilla_selling_price = base_price * market_multiplier
+    vanilla_costs = (vanilla_selling_price * 0.70) + (vanilla_selling_price * 0.06) + logistics_cost_eur + (vanilla_selling_price * 0.10)
+    vanilla_profit_eur = vanilla_selling_price - vanilla_costs
+
+    return pd.DataFrame({
+        'date': transaction_date.astype(str),
+        'model': np.asarray(IPHONE_MODELS, dtype=object)[model_index],
+        'market': np.asarray(MARKETS, dtype=object)[market_index],
+        'battery_health': battery,
+        'has_screen_damage': has_screen_damage,
+        'has_backglass_damage': has_backglass_damage,
+        'has_damage': has_damage,
+        'inventory_level': np.asarray(INVENTORY_LEVELS, dtype=object)[inventory_index],
+        'new_model_imminent': new_model_imminent,
+        'pricing_tier': pricing_tier,
+        'selling_price_eur': selling_price_eur,
+        'acquisition_cost_eur': np.round(acquisition_cost_eur, 2),
+        'refurbishing_cost_eur': np.round(refurbishing_cost_eur, 2),
+        'refurbishing_tier': refurbishing_tier.astype(object),
+        'logistics_cost_eur': logistics_cost_eur,
+        'operational_cost_eur': np.round(operational_cost_eur, 2),
+        'total_costs_eur': np.round(total_costs, 2),
+        'profit_eur': np.round(profit_eur, 2),
+        'profit_margin': np.round(profit_margin, 4),
+        'revenue_eur': selling_price_eur,
+        'days_to_sell': days_to_sell,
+        'vanilla_profit_eur': np.round(vanilla_profit_eur, 2)
+    })
+
+def write_part(df, path, file_format):
+    if file_format == 'parquet':
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+def simulate_shard(shard_index, num_records, seed_sequence, output_dir, file_format='csv',
+                   chunk_rows=CHUNK_ROWS, end_date=None):
+    """Generate one shard chunk by chunk, writing each chunk as its own part file"""
+    rng = np.random.default_rng(seed_sequence)
+    totals = {'rows': 0, 'revenue_eur': 0.0, 'profit_eur': 0.0, 'days_to_sell': 0.0}
+    for chunk_index, start in enumerate(range(0, num_records, chunk_rows)):
+        df = generate_transactions_vectorized(min(chunk_rows, num_records - start), rng, end_date)
+        write_part(df, os.path.join(output_dir, f'part-{shard_index:05d}-{chunk_index:04d}.{file_format}'), file_format)
+        totals['rows'] += len(df)
+        for column in ['revenue_eur', 'profit_eur', 'days_to_sell']:
+            totals[column] += float(df[column].sum())
+    return totals
+
+def generate_partitioned_transactions(num_records, output_dir, workers=None, seed=42, file_format='csv',
+                                      shard_rows=SHARD_ROWS, chunk_rows=CHUNK_ROWS):
+    """
+    Generate num_records transactions as part files in output_dir.
+
+    Records are split into shards of shard_rows, each with its own seed stream
+    spawned from seed, so the output depends only on seed and the shard and
+    chunk sizes - not on how many worker processes generated it. Returns the
+    summed totals of all shards.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    shard_sizes = [min(shard_rows, num_records - start) for start in range(0, num_records, shard_rows)]
+    seed_sequences = np.random.SeedSequence(seed).spawn(len(shard_sizes))
+    # Fix the date range once so every shard covers the same 18 months
+    end_date = datetime.now()
+
+    totals = {'rows': 0, 'revenue_eur': 0.0, 'profit_eur': 0.0, 'days_to_sell': 0.0}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(simulate_shard, shard_index, shard_size, seed_sequence, output_dir,
+                                   file_format, chunk_rows, end_date)
+                   for shard_index, (shard_size, seed_sequence) in enumerate(zip(shard_sizes, seed_sequences))]
+        for future in futures:
+            shard_totals = future.result()
+            for key, value in shard_totals.items():
+                totals[key] += value
+            print(f"  {totals['rows']:,} / {num_records:,} records written")
+    return totals
+
 def generate_ai_feedback_simulation(num_decisions=500):
     """Generate simulated AI bandit feedback history"""
     
@@ -262,7 +418,97 @@ def generate_ai_feedback_simulation(num_decisions=500):
     
     return feedback_history
 
-def main():
+def generate_feedback_vectorized(indices, num_decisions, rng, start_date):
+    """
+    Feedback events at positions indices of a num_decisions-long history, as
+    generate_ai_feedback_simulation would produce them, drawn as arrays.
+
+    Returns a flat DataFrame: timestamp, decision_id, tier, reward,
+    sale_outcome and one column per feature (see FEEDBACK_FEATURES).
+    """
+    n = len(indices)
+
+    # AI learning simulation - gets better over the first 200 decisions
+    learning_factor = np.minimum(1.0, indices / 200)
+    early = learning_factor < 0.3
+    tier = np.where(early, rng.choice(PRICING_TIERS, size=n), rng.choice(PRICING_TIERS, size=n, p=[0.25, 0.45, 0.30]))
+    base_reward = np.where(early, rng.uniform(20, 80, size=n), rng.uniform(40, 120, size=n))
+    reward = base_reward * (1 + learning_factor * 0.5) + rng.uniform(-15, 15, size=n)
+    reward = np.round(np.maximum(5, reward), 2)
+
+    # Spread evenly over 6 months; whole-day offsets, so format each day once
+    days_offset = (indices * (180 / num_decisions)).astype(np.int64)
+    day_strings = np.asarray([(start_date + timedelta(days=day)).strftime('%Y-%m-%d %H:%M:%S')
+                              for day in range(int(days_offset.max()) + 1)], dtype=object)
+
+    return pd.DataFrame({
+        'timestamp': day_strings[days_offset],
+        'decision_id': 'sim_decision_' + pd.Series(indices + 1).astype(str).str.zfill(4),
+        'tier': tier,
+        'reward': reward,
+        'sale_outcome': np.asarray(SALE_OUTCOMES, dtype=object)[rng.integers(0, len(SALE_OUTCOMES), size=n)],
+        'Model': np.asarray(FEEDBACK_MODELS, dtype=object)[rng.integers(0, len(FEEDBACK_MODELS), size=n)],
+        'market': np.asarray(MARKETS, dtype=object)[rng.integers(0, len(MARKETS), size=n)],
+        'Battery': rng.integers(75, 101, size=n),
+        'inventory_level': np.asarray(INVENTORY_LEVELS, dtype=object)[rng.integers(0, len(INVENTORY_LEVELS), size=n)],
+        'Backglass_Damage': rng.integers(0, 2, size=n),
+        'Screen_Damage': rng.integers(0, 2, size=n),
+        'new_model_imminent': rng.random(n) < 0.5
+    })
+
+def feedback_jsonl(df):
+    """JSON lines of feedback events in the feedback history record layout (features nested)"""
+    records = df.drop(columns=FEEDBACK_FEATURES)
+    records['features'] = df[FEEDBACK_FEATURES].to_dict('records')
+    return records.to_json(orient='records', lines=True)
+
+def write_feedback_events(num_decisions, output_path, seed=42, chunk_rows=CHUNK_ROWS):
+    """
+    Stream num_decisions feedback events to output_path chunk by chunk.
+
+    A .parquet path gets one row group per chunk with the features as flat
+    columns; any other path gets JSON lines in the feedback history layout.
+    Memory is bounded by chunk_rows. Returns the summed reward.
+    """
+    rng = np.random.default_rng(seed)
+    start_date = datetime.now() - timedelta(days=180)
+    columnar = output_path.endswith('.parquet')
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+
+    total_reward = 0.0
+    writer = None
+    jsonl_file = None if columnar else open(output_path, 'w')
+    try:
+        for start in range(0, num_decisions, chunk_rows):
+            indices = np.arange(start, min(start + chunk_rows, num_decisions))
+            df = generate_feedback_vectorized(indices, num_decisions, rng, start_date)
+            if columnar:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(output_path, table.schema)
+                writer.write_table(table)
+            else:
+                jsonl_file.write(feedback_jsonl(df))
+            total_reward += float(df['reward'].sum())
+            print(f"  {indices[-1] + 1:,} / {num_decisions:,} feedback events written")
+    finally:
+        if writer is not None:
+            writer.close()
+        if jsonl_file is not None:
+            jsonl_file.close()
+    return total_reward
+
+def open_feedback_store(data_dir):
+    """The shared pricing store under data_dir (etl_worker/pricing_store.py), created if missing"""
+    etl_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'etl_worker')
+    if etl_dir not in sys.path:
+        sys.path.append(etl_dir)
+    from pricing_store import open_store
+    return open_store(data_dir)
+
+def main(num_records=10000):
     """Generate and save simulated data"""
     print("🔄 Generating simulated transaction data...")
     
@@ -270,7 +516,7 @@ def main():
     os.makedirs('data', exist_ok=True)
     
     # Generate 10k transaction records
-    df = generate_simulated_transactions(10000)
+    df = generate_simulated_transactions(num_records)
     
     # Save to CSV
     output_file = 'data/analytics_data.csv'
@@ -280,11 +526,13 @@ def main():
     # Generate AI feedback simulation
     feedback_data = generate_ai_feedback_simulation(500)
     
-    # Save feedback history
-    feedback_file = 'data/ai_feedback_history.json'
-    with open(feedback_file, 'w') as f:
-        json.dump(feedback_data, f, indent=2)
-    print(f"✅ Generated {len(feedback_data):,} AI feedback decisions -> {feedback_file}")
+    # Append it to the shared feedback log (decisions already stored are kept)
+    store = open_feedback_store('data')
+    try:
+        store.record_feedback(feedback_data, source='simulator')
+        print(f"✅ Generated {len(feedback_data):,} AI feedback decisions -> {store.path}")
+    finally:
+        store.close()
     
     # Print summary statistics
     print("\n📊 Data Summary:")
@@ -307,5 +555,57 @@ def main():
     for market, count in market_counts.items():
         print(f"  {market.title()}: {count:,} units")
 
+def positive_int(value):
+    """argparse type for counts that must be at least 1"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got {value}")
+    return number
+
+def main_partitioned(args):
+    """Generate a large partitioned transaction dataset for scale testing"""
+    print(f"🔄 Generating {args.records:,} simulated transactions into {args.output_dir}...")
+    started = time.time()
+    totals = generate_partitioned_transactions(args.records, args.output_dir, workers=args.workers, seed=args.seed,
+                                               file_format=args.format, chunk_rows=args.chunk_size)
+    elapsed = time.time() - started
+    rows = totals['rows']
+    print(f"✅ Generated {rows:,} transaction records in {elapsed:.1f}s "
+          f"({rows / max(elapsed, 1e-9):,.0f} rows/s) -> {args.output_dir}")
+
+    print("\n📊 Data Summary:")
+    print(f"📈 Total Revenue: €{totals['revenue_eur']:,.0f}")
+    print(f"💰 Total Profit: €{totals['profit_eur']:,.0f}")
+    print(f"💹 Avg Profit/Unit: €{totals['profit_eur'] / rows:.0f}")
+    print(f"⏱️ Avg Days to Sell: {totals['days_to_sell'] / rows:.1f}")
+
+def main_feedback(args):
+    """Generate a large feedback event history for benchmarking learning analytics and replay"""
+    print(f"🔄 Generating {args.feedback_records:,} simulated feedback events -> {args.feedback_output}...")
+    started = time.time()
+    total_reward = write_feedback_events(args.feedback_records, args.feedback_output, seed=args.seed,
+                                         chunk_rows=args.chunk_size)
+    elapsed = time.time() - started
+    print(f"✅ Generated {args.feedback_records:,} AI feedback events in {elapsed:.1f}s "
+          f"({args.feedback_records / max(elapsed, 1e-9):,.0f} events/s) -> {args.feedback_output}")
+    print(f"💰 Average reward: €{total_reward / args.feedback_records:.1f}")
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Generate simulated transaction and feedback data")
+    parser.add_argument('--records', type=positive_int, default=10000, help="Number of transactions to generate")
+    parser.add_argument('--output-dir', help="Write vectorized, multi-process output as part files to this directory")
+    parser.add_argument('--workers', type=positive_int, default=None, help="Worker processes for --output-dir (default: CPU count)")
+    parser.add_argument('--seed', type=int, default=42, help="Root seed of the per-shard seed streams")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv', help="Part file format")
+    parser.add_argument('--chunk-size', type=positive_int, default=CHUNK_ROWS, help="Rows per part file or feedback chunk")
+    parser.add_argument('--feedback-records', type=positive_int, default=1_000_000, help="Feedback events for --feedback-output")
+    parser.add_argument('--feedback-output',
+                        help="Stream vectorized feedback events to this .jsonl (JSON lines) or .parquet file")
+    args = parser.parse_args()
+
+    if args.output_dir:
+        main_partitioned(args)
+    if args.feedback_output:
+        main_feedback(args)
+    if not (args.output_dir or args.feedback_output):
+        main(args.records)
@@ -0,0 +1,59 @@
+"""
+Rollup tables of the analytics dataset.
+
+Transactions are summed per period x market x model x condition. Only sums,
+sums of squares and unit counts are stored, so rollups of different chunks or
+ETL runs can simply be added together and every mean the dashboard shows
+(profit per unit, days to sell, margin) is recovered as sum / units.
+
+This module is shared by the ETL (which materializes the rollups) and the UI
+(which reads them, or builds them from raw rows when they are missing).
+"""
+
+import numpy as np
+import pandas as pd
+
+ROLLUP_DIMENSIONS = ['period', 'market', 'model', 'condition_category']
+SUMMED_COLUMNS = ['revenue_eur', 'profit_eur', 'selling_price_eur', 'vanilla_profit_eur',
+                  'days_to_sell', 'profit_margin']
+
+
+def condition_category(has_damage):
+    """'Damaged' / 'Undamaged' labels for a has_damage column"""
+    return np.where(has_damage.astype(bool), 'Damaged', 'Undamaged')
+
+
+def rollup_transactions(df, freq='D'):
+    """Sum transactions per period ('D' for day, 'M' for month) x market x model x condition"""
+    keys = pd.DataFrame({
+        'period': pd.to_datetime(df['date']).dt.to_period(freq).dt.to_timestamp(),
+        'market': df['market'].values,
+        'model': df['model'].values,
+        'condition_category': condition_category(df['has_damage'])
+    }, index=df.index)
+    # Sums are accumulated in float64 even when the rows are float32
+    measures = pd.DataFrame({f'{column}_sum': df[column].astype('float64')
+                             for column in SUMMED_COLUMNS if column in df.columns}, index=df.index)
+    measures['profit_eur_sumsq'] = df['profit_eur'].astype('float64') ** 2
+    measures['units'] = 1
+    return pd.concat([keys, measures], axis=1).groupby(ROLLUP_DIMENSIONS, as_index=False, observed=True).sum()
+
+
+def combine_rollups(rollups, freq=None):
+    """Add rollups together, optionally re-bucketing their periods to a coarser frequency"""
+    combined = pd.concat([rollup for rollup in rollups if rollup is not None], ignore_index=True)
+    if freq is not None:
+        combined['period'] = combined['period'].dt.to_period(freq).dt.to_timestamp()
+    return combined.groupby(ROLLUP_DIMENSIONS, as_index=False, observed=True).sum()
+
+
+def summarize_rollup(rollup, by):
+    """Totals and means per group of the given dimensions"""
+    summary = rollup.groupby(by, observed=True).sum(numeric_only=True)
+    units = summary['units'].replace(0, np.nan)
+    summary['avg_profit_eur'] = summary['profit_eur_sum'] / units
+    if 'days_to_sell_sum' in summary.columns:
+        summary['avg_days_to_sell'] = summary['days_to_sell_sum'] / units
+    if 'profit_margin_sum' in summary.columns:
+        summary['avg_profit_margin'] = summary['profit_margin_sum'] / units
+    return summary
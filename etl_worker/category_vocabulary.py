@@ -0,0 +1,186 @@
+"""
+Append-only vocabulary of the ML context columns.
+
+Every context column (slot) is either a numerical feature or one category of
+a categorical feature. The initial layout is the one-hot encoder's (sorted
+categories, then the numerical features). Categories seen later (a new model
+such as "iPhone 16", a new market) are appended as new slots at the end, so
+existing slots never move. Rows written before a category existed are zero in
+its slot, which is exactly what they would have been had the slot always
+existed. Bandit parameters can therefore be widened in place instead of being
+refit.
+
+For very large catalogs (thousands of SKUs) HashedVocabulary replaces the
+one-hot slots with a fixed number of hashed columns, so the context width -
+and the per-arm cost of the linear bandits, quadratic in it - no longer grows
+with the catalog.
+
+This module is shared by the ETL (which grows and saves the vocabulary) and
+the model service (which builds contexts with it).
+"""
+
+import hashlib
+import json
+
+import numpy as np
+
+
+class CategoryVocabulary:
+    """Maps (feature, category) pairs and numerical features to fixed context column slots"""
+
+    def __init__(self, categorical_features, numerical_features, slots):
+        self.categorical_features = list(categorical_features)
+        self.numerical_features = list(numerical_features)
+        # One (feature, category) pair per column; category is None for numerical features
+        self.slots = [(feature, category) for feature, category in slots]
+        self._index = {slot: column for column, slot in enumerate(self.slots)}
+
+    @classmethod
+    def from_categories(cls, categories, categorical_features, numerical_features):
+        """Initial layout: each feature's categories in the given order, then the numerical features"""
+        slots = [(feature, category)
+                 for feature, feature_categories in zip(categorical_features, categories)
+                 for category in feature_categories]
+        slots += [(feature, None) for feature in numerical_features]
+        return cls(categorical_features, numerical_features, slots)
+
+    @classmethod
+    def from_encoder(cls, encoder, categorical_features, numerical_features):
+        """Same layout as a fitted OneHotEncoder followed by the scaled numerical features"""
+        categories = [[category.item() if isinstance(category, np.generic) else category
+                       for category in feature_categories]
+                      for feature_categories in encoder.categories_]
+        return cls.from_categories(categories, categorical_features, numerical_features)
+
+    @classmethod
+    def load(cls, path):
+        """A saved vocabulary (a HashedVocabulary if it was saved by one)"""
+        with open(path, 'r') as f:
+            saved = json.load(f)
+        if 'hash_width' in saved:
+            return HashedVocabulary(saved['categorical_features'], saved['numerical_features'], saved['hash_width'])
+        return cls(saved['categorical_features'], saved['numerical_features'], saved['slots'])
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump({
+                'categorical_features': self.categorical_features,
+                'numerical_features': self.numerical_features,
+                'slots': self.slots
+            }, f, indent=2)
+
+    @property
+    def width(self):
+        return len(self.slots)
+
+    def feature_names(self):
+        """Column names in slot order (feature_category for categories, as the encoder names them)"""
+        return [feature if category is None else f'{feature}_{category}' for feature, category in self.slots]
+
+    def unseen(self, df):
+        """(feature, category) pairs in df that have no slot yet, in order of appearance"""
+        pairs = []
+        for feature in self.categorical_features:
+            for category in df[feature].astype(str).unique():
+                if (feature, category) not in self._index:
+                    pairs.append((feature, category))
+        return pairs
+
+    def extend(self, df):
+        """Append a slot for every category of df without one; returns the new (feature, category) pairs"""
+        new_slots = self.unseen(df)
+        for slot in new_slots:
+            self._index[slot] = len(self.slots)
+            self.slots.append(slot)
+        return new_slots
+
+    def encode_one(self, feature, category):
+        """(column, value) of one category, or None if it has no slot"""
+        column = self._index.get((feature, category))
+        return None if column is None else (column, 1.0)
+
+    def extends(self, other):
+        """True if this vocabulary is other plus zero or more appended slots"""
+        return (self.categorical_features == other.categorical_features
+                and self.numerical_features == other.numerical_features
+                and self.slots[:other.width] == other.slots)
+
+    def context_matrix(self, df, scaled_numerical):
+        """
+        Context rows for df: one-hot category slots plus the already scaled
+        numerical features. Categories without a slot stay all zeros.
+        """
+        contexts = np.zeros((len(df), self.width), dtype=np.float64)
+        rows = np.arange(len(df))
+        for feature in self.categorical_features:
+            lookup = {category: column for (slot_feature, category), column in self._index.items()
+                      if slot_feature == feature}
+            columns = df[feature].astype(str).map(lookup).fillna(-1).to_numpy(dtype=np.int64)
+            known = columns >= 0
+            contexts[rows[known], columns[known]] = 1.0
+        numerical_columns = [self._index[(feature, None)] for feature in self.numerical_features]
+        contexts[:, numerical_columns] = scaled_numerical
+        return contexts
+
+
+class HashedVocabulary(CategoryVocabulary):
+    """
+    Fixed-width layout: every (feature, category) pair is hashed into one of
+    hash_width signed columns, followed by the numerical features. Every
+    category has a column from the start, so nothing is ever unseen and the
+    vocabulary never grows; the price is occasional collisions between
+    categories that share a column.
+    """
+
+    def __init__(self, categorical_features, numerical_features, hash_width):
+        self.hash_width = int(hash_width)
+        super().__init__(categorical_features, numerical_features,
+                         [('hash', str(column)) for column in range(self.hash_width)]
+                         + [(feature, None) for feature in numerical_features])
+        self._hashes = {}
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump({
+                'categorical_features': self.categorical_features,
+                'numerical_features': self.numerical_features,
+                'hash_width': self.hash_width
+            }, f, indent=2)
+
+    def _hash(self, feature, category):
+        """Column and sign of a category (stable across processes, unlike hash())"""
+        key = (feature, category)
+        if key not in self._hashes:
+            digest = int.from_bytes(hashlib.md5(f'{feature}={category}'.encode()).digest()[:8], 'little')
+            self._hashes[key] = (digest % self.hash_width, 1.0 if (digest >> 63) & 1 else -1.0)
+        return self._hashes[key]
+
+    def encode_one(self, feature, category):
+        return self._hash(feature, category)
+
+    def feature_names(self):
+        return [f'hash_{column}' for column in range(self.hash_width)] + self.numerical_features
+
+    def unseen(self, df):
+        return []
+
+    def extend(self, df):
+        return []
+
+    def extends(self, other):
+        return (isinstance(other, HashedVocabulary) and other.hash_width == self.hash_width
+                and self.categorical_features == other.categorical_features
+                and self.numerical_features == other.numerical_features)
+
+    def context_matrix(self, df, scaled_numerical):
+        contexts = np.zeros((len(df), self.width), dtype=np.float64)
+        rows = np.arange(len(df))
+        for feature in self.categorical_features:
+            categories = df[feature].astype(str)
+            hashed = {category: self._hash(feature, category) for category in categories.unique()}
+            columns = categories.map(lambda category: hashed[category][0]).to_numpy(dtype=np.int64)
+            signs = categories.map(lambda category: hashed[category][1]).to_numpy(dtype=np.float64)
+            # Signed hashing keeps collisions from biasing a column's mean
+            np.add.at(contexts, (rows, columns), signs)
+        contexts[:, self.hash_width:] = scaled_numerical
+        return contexts
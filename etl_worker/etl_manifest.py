@@ -0,0 +1,107 @@
+"""
+Content-hashed manifest of the ETL's inputs and outputs.
+
+The manifest records the hash of every input file, a hash of the ETL code,
+row counts and the hash of every output. A rerun whose inputs and code hash
+the same as the manifest (and whose outputs are all still present) can be
+skipped. The manifest version is derived from the output hashes, so the model
+service and UI can key their caches on it.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+
+HASH_CHUNK_BYTES = 1 << 20
+CODE_FILES = ['etl_task.py', 'analytics_rollups.py', 'etl_manifest.py', 'etl_profiler.py',
+              'pricing_store.py', 'category_vocabulary.py', 'feature_pipeline.py']
+
+
+def path_sha256(path):
+    """SHA-256 of a file, or of every file (relative name and content) under a directory"""
+    digest = hashlib.sha256()
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                file_path = os.path.join(root, name)
+                digest.update(os.path.relpath(file_path, path).encode())
+                digest.update(path_sha256(file_path).encode())
+        return digest.hexdigest()
+
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def code_version():
+    """Hash of the ETL source files, so code changes invalidate the manifest"""
+    code_dir = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha256()
+    for name in CODE_FILES:
+        digest.update(path_sha256(os.path.join(code_dir, name)).encode())
+    return digest.hexdigest()[:16]
+
+
+def input_fingerprint(input_paths, previous_manifest=None):
+    """
+    Hash of every input, keyed by name.
+
+    Files whose size and mtime match the previous manifest reuse its hash
+    instead of being read again, which makes an unchanged rerun near free.
+    """
+    previous_inputs = (previous_manifest or {}).get('inputs', {})
+    fingerprint = {}
+    for name, path in input_paths.items():
+        stat = os.stat(path)
+        previous = previous_inputs.get(name, {})
+        if previous.get('bytes') == stat.st_size and previous.get('mtime_ns') == stat.st_mtime_ns:
+            sha256 = previous['sha256']
+        else:
+            sha256 = path_sha256(path)
+        fingerprint[name] = {'sha256': sha256, 'bytes': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    return fingerprint
+
+
+def load_manifest(manifest_path):
+    """The last written manifest, or None"""
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, 'r') as f:
+        return json.load(f)
+
+
+def is_current(manifest, inputs, output_paths):
+    """True if the manifest was produced from these inputs by this code and all outputs exist"""
+    if manifest is None or manifest.get('code_version') != code_version():
+        return False
+    recorded_inputs = {name: entry['sha256'] for name, entry in manifest.get('inputs', {}).items()}
+    if recorded_inputs != {name: entry['sha256'] for name, entry in inputs.items()}:
+        return False
+    return all(os.path.exists(path) for path in output_paths.values())
+
+
+def write_manifest(manifest_path, inputs, output_paths, row_counts):
+    """Hash the outputs and write the manifest; returns it"""
+    outputs = {
+        name: {'sha256': path_sha256(path)}
+        for name, path in output_paths.items() if os.path.exists(path)
+    }
+    version = hashlib.sha256(json.dumps(
+        {name: entry['sha256'] for name, entry in sorted(outputs.items())}
+    ).encode()).hexdigest()[:16]
+
+    manifest = {
+        'version': version,
+        'code_version': code_version(),
+        'created_at': datetime.now().isoformat(),
+        'inputs': inputs,
+        'outputs': outputs,
+        'row_counts': row_counts
+    }
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    print(f"Manifest version {version} saved to {manifest_path}")
+    return manifest
@@ -0,0 +1,154 @@
+"""
+Per-stage instrumentation for the ETL.
+
+Every stage records wall time, CPU time (including finished worker processes),
+the growth of the process's peak RSS and the rows it handled. Stages that run
+more than once (e.g. per chunk in streaming mode) are aggregated under their
+name, so every operation gets its own stage name. A stage started inside
+another is recorded as 'parent/child' and its time is not counted again in
+the top-level total. At the end of a run the profile is appended as one JSON line to the run
+report so ETL performance can be tracked over time.
+"""
+
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+NEST_SEPARATOR = '/'
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB (None if unavailable)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return peak / (1024 * 1024) if os.uname().sysname == 'Darwin' else peak / 1024
+
+
+def cpu_seconds():
+    """User + system CPU time of this process and its reaped children"""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def count_rows(value):
+    """Rows of a DataFrame, or of all DataFrames in a dict (None for anything else)"""
+    if hasattr(value, 'columns'):
+        return len(value)
+    if isinstance(value, dict) and value and all(hasattr(item, 'columns') for item in value.values()):
+        return sum(len(item) for item in value.values())
+    return None
+
+
+class StageProfiler:
+    """Collects per-stage timings for one ETL run"""
+
+    def __init__(self):
+        self.stages = {}
+        self._active = []  # Names of the stages currently running, outermost first
+        self.started_at = datetime.now()
+        self._start_wall = time.perf_counter()
+        self._start_cpu = cpu_seconds()
+
+    def _stage_record(self, name):
+        return self.stages.setdefault(name, {
+            'stage': name, 'calls': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0,
+            'peak_rss_delta_mb': 0.0, 'rows': 0
+        })
+
+    def record(self, name, wall_seconds, cpu=0.0, rss_delta_mb=0.0, rows=None, parent=None):
+        """Add one measured call of a stage, nested under parent if given"""
+        if parent is not None:
+            name = f'{parent}{NEST_SEPARATOR}{name}'
+        record = self._stage_record(name)
+        record['calls'] += 1
+        record['wall_seconds'] += wall_seconds
+        record['cpu_seconds'] += cpu
+        record['peak_rss_delta_mb'] += rss_delta_mb
+        if rows is not None:
+            record['rows'] += int(rows)
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        """
+        Measure the enclosed block; the yielded dict's 'rows' may be set inside it.
+        Inside another stage the block is recorded as a child of that stage.
+        """
+        measured = {'rows': rows}
+        parent = NEST_SEPARATOR.join(self._active) or None
+        self._stage_record(f'{parent}{NEST_SEPARATOR}{name}' if parent else name)  # Report parents before children
+        self._active.append(name)
+        start_wall, start_cpu, start_rss = time.perf_counter(), cpu_seconds(), peak_rss_mb()
+        try:
+            yield measured
+        finally:
+            end_rss = peak_rss_mb()
+            self._active.pop()
+            self.record(
+                name,
+                wall_seconds=time.perf_counter() - start_wall,
+                cpu=cpu_seconds() - start_cpu,
+                rss_delta_mb=(end_rss - start_rss) if start_rss is not None else 0.0,
+                rows=measured['rows'],
+                parent=parent
+            )
+
+    def profiled(self, name):
+        """Decorator measuring a function as a stage; rows come from its first argument"""
+        def decorator(function):
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                rows = count_rows(args[0]) if args else None
+                with self.stage(name, rows=rows):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def report(self, mode, **extra):
+        """The run profile as a JSON-serializable dict"""
+        stages = []
+        for record in self.stages.values():
+            stages.append({
+                **record,
+                'depth': record['stage'].count(NEST_SEPARATOR),
+                'wall_seconds': round(record['wall_seconds'], 4),
+                'cpu_seconds': round(record['cpu_seconds'], 4),
+                'peak_rss_delta_mb': round(record['peak_rss_delta_mb'], 2),
+                'rows_per_second': round(record['rows'] / record['wall_seconds'])
+                if record['rows'] and record['wall_seconds'] > 0 else None
+            })
+        rss = peak_rss_mb()
+        return {
+            'started_at': self.started_at.isoformat(),
+            'mode': mode,
+            'total_wall_seconds': round(time.perf_counter() - self._start_wall, 4),
+            'total_cpu_seconds': round(cpu_seconds() - self._start_cpu, 4),
+            # Top-level stages only; nested stages are already part of their parent's time
+            'staged_wall_seconds': round(sum(stage['wall_seconds'] for stage in stages if stage['depth'] == 0), 4),
+            'peak_rss_mb': round(rss, 2) if rss is not None else None,
+            **extra,
+            'stages': stages
+        }
+
+    def write_report(self, path, mode, **extra):
+        """Append this run's profile to a JSON-lines report and print a summary"""
+        report = self.report(mode, **extra)
+        with open(path, 'a') as f:
+            f.write(json.dumps(report) + '\n')
+
+        print(f"Stage profile ({report['total_wall_seconds']:.2f}s wall, peak RSS {report['peak_rss_mb']} MB):")
+        for stage in report['stages']:
+            label = '  ' * stage['depth'] + stage['stage'].rsplit(NEST_SEPARATOR, 1)[-1]
+            print(f"  {label:<40} {stage['wall_seconds']:>8.3f}s wall {stage['cpu_seconds']:>8.3f}s cpu "
+                  f"{stage['peak_rss_delta_mb']:>8.1f} MB {stage['rows']:>10,} rows")
+        print(f"Run report appended to {path}")
+        return report
@@ -1,13 +1,28 @@
 import pandas as pd
 import numpy as np
 import os
+import sys
+import glob
+import json
+import shutil
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
 from sklearn.preprocessing import OneHotEncoder, StandardScaler
 import joblib
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 from datetime import datetime
 
-print("ETL task started: Preparing enhanced training data with dual data sources...")
+from analytics_rollups import combine_rollups, rollup_transactions
+from category_vocabulary import CategoryVocabulary, HashedVocabulary
+import etl_manifest
+from etl_profiler import StageProfiler
+from feature_pipeline import CATEGORICAL_FEATURES, NUMERICAL_FEATURES, FeaturePipeline
+from pricing_store import STORE_FILENAME, open_store
 
-# Business Rationale: Create a single "source of truth" by combining historical data 
+# Business Rationale: Create a single "source of truth" by combining historical data
 # with richer synthetic data for consistent analytics and ML model training
 
 # Input paths for dual data sources (adjust for local development)
@@ -18,21 +33,178 @@ synthetic_sales_path = os.path.join(base_data_path, 'synthetic_sales_data.csv')
 # Output paths
 analytics_output_path = os.path.join(base_data_path, 'analytics_data.csv')
 ml_output_path = os.path.join(base_data_path, 'processed_ml_data.csv')
+# Rows written after the category vocabulary grew go to a new CSV segment per
+# feature width (processed_ml_data.w<width>.csv) instead of rewriting the file
+# with zero columns; read_ml_csv zero-fills the older segments
+ml_segment_pattern = os.path.join(base_data_path, 'processed_ml_data.w*.csv')
 encoder_path = os.path.join(base_data_path, 'encoder.joblib')
 scaler_path = os.path.join(base_data_path, 'scaler.joblib')
+vocabulary_path = os.path.join(base_data_path, 'category_vocabulary.json')
+pipeline_path = os.path.join(base_data_path, 'feature_pipeline.joblib')
+watermark_path = os.path.join(base_data_path, 'etl_watermark.json')
 
-print("Loading original iPhone price data...")
-iphone_df = pd.read_csv(iphone_price_path)
+# Columnar copies of the outputs: typed Parquet tables that consumers read with
+# column pruning, plus the ML feature matrix as memory-mappable .npy segments.
+# Each is a directory of part files: full runs write part-00000 and incremental
+# runs add the next part, so appending never rewrites history. A feature
+# segment keeps the vocabulary width it was written with; readers zero-fill
+# the slots appended since.
+analytics_parquet_path = os.path.join(base_data_path, 'analytics_data.parquet')
+ml_parquet_path = os.path.join(base_data_path, 'processed_ml_data.parquet')
+ml_features_path = os.path.join(base_data_path, 'ml_features')
+COLUMNAR_PATHS = [analytics_parquet_path, ml_parquet_path, ml_features_path]
+legacy_ml_features_path = os.path.join(base_data_path, 'ml_features.npy')  # Single matrix of older runs
 
-print("Loading synthetic sales data...")
-synthetic_df = pd.read_csv(synthetic_sales_path)
+# Analytics dataset partitioned as year=YYYY/month=M/market=X so date range and
+# market filters only read the matching partitions
+analytics_partitioned_path = os.path.join(base_data_path, 'analytics_partitioned')
+
+# Pre-aggregated rollups (day and month x market x model x condition) and a
+# bounded per-month sample of raw rows for the dashboard's distribution plots
+rollup_daily_path = os.path.join(base_data_path, 'analytics_rollup_daily.parquet')
+rollup_monthly_path = os.path.join(base_data_path, 'analytics_rollup_monthly.parquet')
+analytics_sample_path = os.path.join(base_data_path, 'analytics_sample.parquet')
+manifest_path = os.path.join(base_data_path, 'etl_manifest.json')
+run_report_path = os.path.join(base_data_path, 'etl_run_report.jsonl')
+store_path = os.path.join(base_data_path, STORE_FILENAME)
+feedback_history_paths = [os.path.join(base_data_path, 'ai_feedback_history.json'),
+                          os.path.join(base_data_path, 'demo_feedback_history.json')]
+
+# Files tracked by the manifest (inputs come from the source registry)
+OUTPUT_PATHS = {
+    'analytics_data.csv': analytics_output_path,
+    'processed_ml_data.csv': ml_output_path,
+    'encoder.joblib': encoder_path,
+    'scaler.joblib': scaler_path,
+    'category_vocabulary.json': vocabulary_path,
+    'feature_pipeline.joblib': pipeline_path,
+    'analytics_data.parquet': analytics_parquet_path,
+    'processed_ml_data.parquet': ml_parquet_path,
+    'ml_features': ml_features_path,
+    'analytics_partitioned': analytics_partitioned_path,
+    'analytics_rollup_daily.parquet': rollup_daily_path,
+    'analytics_rollup_monthly.parquet': rollup_monthly_path,
+    'analytics_sample.parquet': analytics_sample_path
+}
+
+# Shared schema of both sources after harmonization
+HARMONIZED_COLUMNS = ['date', 'model', 'market', 'battery_health', 'has_damage',
+                      'acquisition_cost_eur', 'selling_price_eur', 'profit_eur', 'days_to_sell']
+NUMERIC_HARMONIZED_COLUMNS = ['battery_health', 'has_damage', 'acquisition_cost_eur',
+                              'selling_price_eur', 'profit_eur', 'days_to_sell']
+
+# Note: Simplified feature set (removed Storage, RAM, Screen Size as per requirements),
+# CATEGORICAL_FEATURES and NUMERICAL_FEATURES come from feature_pipeline
+TARGET_COLUMNS = ['selling_price_eur', 'profit_eur', 'vanilla_profit_eur']
+
+# Hashed category columns instead of one-hot slots (0 = one-hot), for very large catalogs
+FEATURE_HASH_WIDTH = int(os.getenv('FEATURE_HASH_WIDTH', 0))
+
+# Dtype plan for every frame in the pipeline, applied when sources are read
+# and again after each transform: categoricals for repeated strings, the
+# smallest integer type that fits and float32 for monetary values (its ~7
+# significant digits keep cents exact up to ~100k EUR)
+DTYPE_PLAN = {
+    'model': 'category',
+    'market': 'category',
+    'battery_health': 'int8',
+    'has_damage': 'bool',
+    'has_damage_int': 'int8',
+    'days_to_sell': 'int16',
+    'acquisition_cost_eur': 'float32',
+    'selling_price_eur': 'float32',
+    'profit_eur': 'float32',
+    'vanilla_profit_eur': 'float32',
+    'revenue_eur': 'float32',
+    'profit_margin': 'float32',
+    'year': 'int16',
+    'month': 'int8',
+    'quarter': 'int8',
+    'day_of_week': 'int8'
+}
+
+# Stored schema of analytics_data.parquet (strings are dictionary-encoded by Parquet)
+ANALYTICS_SCHEMA = pa.schema([
+    ('date', pa.timestamp('ms')),
+    ('model', pa.string()),
+    ('market', pa.string()),
+    ('battery_health', pa.int8()),
+    ('has_damage', pa.bool_()),
+    ('acquisition_cost_eur', pa.float32()),
+    ('selling_price_eur', pa.float32()),
+    ('profit_eur', pa.float32()),
+    ('days_to_sell', pa.int16()),
+    ('vanilla_profit_eur', pa.float32()),
+    ('year', pa.int32()),
+    ('month', pa.int32()),
+    ('quarter', pa.int8()),
+    ('day_of_week', pa.int8()),
+    ('revenue_eur', pa.float32()),
+    ('profit_margin', pa.float32())
+])
+ANALYTICS_PARTITIONING = ds.partitioning(
+    pa.schema([('year', pa.int32()), ('month', pa.int32()), ('market', pa.string())]),
+    flavor='hive'
+)
+
+# Incremental mode: refit the scaler when a new batch's feature means move this
+# many standard deviations away from the fitted means
+DRIFT_THRESHOLD_STD = 0.5
+MIN_ROWS_FOR_DRIFT_CHECK = 30
+
+SAMPLE_ROWS_PER_MONTH = 500
+SAMPLE_COLUMNS = ['date', 'model', 'market', 'has_damage', 'days_to_sell',
+                  'profit_eur', 'selling_price_eur', 'profit_margin']
+
+
+# Wall/CPU time, peak RSS growth and rows of every stage in this run
+profiler = StageProfiler()
+
+
+def apply_dtype_plan(df):
+    """Cast the columns covered by DTYPE_PLAN to their planned dtypes"""
+    casts = {column: dtype for column, dtype in DTYPE_PLAN.items()
+             if column in df.columns and df[column].dtype != dtype}
+    return df.astype(casts) if casts else df
+
+
+def read_dtypes(columns):
+    """read_csv dtype argument applying the plan to the given columns"""
+    return {column: DTYPE_PLAN[column] for column in columns if column in DTYPE_PLAN}
+
+
+def default_dtype_bytes(series):
+    """Estimated size of a column with pandas' default dtypes (object strings, 64-bit numbers)"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        counts = series.value_counts()
+        return 8 * len(series) + sum(sys.getsizeof(value) * count for value, count in counts.items())
+    if series.dtype == object:
+        return series.memory_usage(deep=True, index=False)
+    if pd.api.types.is_bool_dtype(series):
+        return len(series)
+    return 8 * len(series)
+
+
+def report_memory(stage, df):
+    """Print a frame's memory under the dtype plan against the default-dtype estimate"""
+    planned = df.memory_usage(deep=True, index=False).sum()
+    default = sum(default_dtype_bytes(df[column]) for column in df.columns)
+    saved = 1 - planned / default if default else 0
+    print(f"  [{stage}] {len(df):,} rows: {planned / 1e6:.2f} MB "
+          f"({default / 1e6:.2f} MB with default dtypes, {saved:.0%} saved)")
+
+
+def read_analytics_csv(path=None):
+    """Read the analytics CSV back with the dtype plan"""
+    path = path or analytics_output_path
+    columns = pd.read_csv(path, nrows=0).columns
+    return pd.read_csv(path, dtype=read_dtypes(columns), parse_dates=['date'])
 
-print("Step 1: Harmonizing original iPhone price data to match synthetic schema...")
 
 def harmonize_original_data(df):
     """
     Harmonize original iPhone price data to match synthetic data schema.
-    
+
     Business Logic:
     - Convert currency from INR to EUR (1 EUR = 90 INR)
     - Rename columns to match synthetic schema
@@ -40,124 +212,826 @@ def harmonize_original_data(df):
     - Calculate profit metrics based on selling price
     """
     harmonized_df = df.copy()
-    
+
     # Currency conversion: INR to EUR (1 EUR = 90 INR)
     EUR_TO_INR_RATE = 90
-    
+
     # Column renaming to match synthetic data schema
     harmonized_df['model'] = harmonized_df['Model']  # Product_name -> model
     harmonized_df['selling_price_eur'] = harmonized_df['current_price(LKR)'] / EUR_TO_INR_RATE  # Convert to EUR
-    
+
     # Create missing columns with sensible defaults
     harmonized_df['date'] = datetime.now().strftime('%Y-%m-%d')  # Current date as default
     harmonized_df['market'] = 'Greece'  # Default market (replaced India with Greece)
-    
+
     # Infer has_damage from existing damage columns
     harmonized_df['has_damage'] = (
-        harmonized_df['backglass_damages'].astype(bool) | 
+        harmonized_df['backglass_damages'].astype(bool) |
         (harmonized_df['screen_damages'] != 'undamaged')
     ).astype(bool)
-    
+
     # Calculate acquisition cost (assume 70% of selling price)
     harmonized_df['acquisition_cost_eur'] = harmonized_df['selling_price_eur'] * 0.70
-    
+
     # Calculate profit (selling price - acquisition cost - operational costs)
     operational_cost_rate = 0.15  # 15% operational costs
     harmonized_df['profit_eur'] = (
-        harmonized_df['selling_price_eur'] - 
-        harmonized_df['acquisition_cost_eur'] - 
+        harmonized_df['selling_price_eur'] -
+        harmonized_df['acquisition_cost_eur'] -
         (harmonized_df['selling_price_eur'] * operational_cost_rate)
     )
-    
+
     # Default days to sell (assume 14 days for historical data)
     harmonized_df['days_to_sell'] = 14
-    
+
     # Select only the columns that match synthetic data schema
-    final_columns = ['date', 'model', 'market', 'battery_health', 'has_damage', 
-                    'acquisition_cost_eur', 'selling_price_eur', 'profit_eur', 'days_to_sell']
-    
-    return harmonized_df[final_columns]
+    return apply_dtype_plan(harmonized_df[HARMONIZED_COLUMNS])
+
+
+def harmonize_synthetic_data(df):
+    """Synthetic sales already follow the target schema"""
+    return apply_dtype_plan(df[HARMONIZED_COLUMNS])
+
+
+# Source registry: every feed is loaded and harmonized to HARMONIZED_COLUMNS
+# independently (in parallel in full and incremental runs), then combined in
+# registration order. Sources are append-only, so incremental runs pick up
+# each one after the number of rows already ingested; date-tracked sources
+# also report the latest transaction date seen.
+SOURCE_REGISTRY = {}
+
+
+def register_source(name, path, harmonize, tracking='date', dtypes=None):
+    """
+    Add a feed: harmonize(raw_df) must return a frame with HARMONIZED_COLUMNS.
+    dtypes is passed to read_csv so raw columns are compact from the start.
+    """
+    if tracking not in ('date', 'rows'):
+        raise ValueError(f"Unknown tracking {tracking!r} for source {name}")
+    SOURCE_REGISTRY[name] = {'path': path, 'harmonize': harmonize, 'tracking': tracking,
+                             'dtypes': dtypes or {}}
+
+
+register_source('synthetic_sales_data', synthetic_sales_path, harmonize_synthetic_data, tracking='date',
+                dtypes=read_dtypes(HARMONIZED_COLUMNS))
+# Historical iPhone price records carry no date (they are stamped with the run
+# date), so only their row count is tracked
+register_source('iphone_price_data', iphone_price_path, harmonize_original_data, tracking='rows',
+                dtypes={'Model': 'category', 'current_price(LKR)': 'float32', 'battery_health': 'int8',
+                        'screen_damages': 'category'})
+
+
+def source_paths():
+    return {name: source['path'] for name, source in SOURCE_REGISTRY.items()}
+
+
+def advance_position(name, position, raw_rows, harmonized_df):
+    """Source position after ingesting raw_rows more rows (harmonized as harmonized_df)"""
+    position = dict(position or {})
+    position['rows_processed'] = int(position.get('rows_processed', 0)) + raw_rows
+    if SOURCE_REGISTRY[name]['tracking'] == 'date' and len(harmonized_df):
+        dates = pd.to_datetime(harmonized_df['date'])
+        max_date = dates.max()
+        if 'max_date' in position:
+            max_date = max(max_date, pd.Timestamp(position['max_date']))
+        # Reporting only: appended rows may be backdated, so new rows are found by position
+        position['max_date'] = str(max_date.date())
+        position.pop('rows_at_max_date', None)
+    return position
+
+
+def load_source(name, position=None):
+    """
+    Load and harmonize one registered source, only rows after position if
+    given. Runs in a worker process; returns (harmonized_df, new_position, timings).
+    """
+    start_time = time.perf_counter()
+    source = SOURCE_REGISTRY[name]
+    # Files are append-only: the first rows_processed rows were ingested already
+    rows_processed = int((position or {}).get('rows_processed', 0))
+    raw_df = pd.read_csv(source['path'], dtype=source['dtypes'], skiprows=range(1, rows_processed + 1))
+    read_seconds = time.perf_counter() - start_time
+    harmonized_df = source['harmonize'](raw_df)
+    timings = {'rows': len(raw_df), 'read_seconds': read_seconds,
+               'harmonize_seconds': time.perf_counter() - start_time - read_seconds}
+    return harmonized_df, advance_position(name, position, len(raw_df), harmonized_df), timings
+
+
+def load_sources(positions=None, workers=None):
+    """Load every registered source concurrently in a process pool"""
+    positions = positions or {}
+    names = list(SOURCE_REGISTRY)
+    workers = min(len(names), workers or os.cpu_count() or 1)
+    print(f"Step 1: Loading and harmonizing {len(names)} sources ({workers} worker processes)...")
+
+    with profiler.stage('load_sources') as measured:
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(load_source, names, [positions.get(name) for name in names]))
+        else:
+            results = [load_source(name, positions.get(name)) for name in names]
+        measured['rows'] = sum(len(harmonized_df) for harmonized_df, _, _ in results)
+
+    harmonized, new_positions = {}, {}
+    for name, (harmonized_df, position, timings) in zip(names, results):
+        # Measured inside the worker, so only wall time is available per source
+        profiler.record(f'read:{name}', timings['read_seconds'], rows=timings['rows'], parent='load_sources')
+        profiler.record(f'harmonize:{name}', timings['harmonize_seconds'], rows=len(harmonized_df),
+                        parent='load_sources')
+        seconds = timings['read_seconds'] + timings['harmonize_seconds']
+        print(f"  {name}: {len(harmonized_df):,} records in {seconds:.2f}s")
+        report_memory(name, harmonized_df)
+        harmonized[name] = harmonized_df
+        new_positions[name] = position
+    return harmonized, new_positions
+
 
-# Apply harmonization
-harmonized_original = harmonize_original_data(iphone_df)
-print(f"Harmonized {len(harmonized_original)} original records")
+def check_source_schema(name, df):
+    """Raise if a harmonized source does not match HARMONIZED_COLUMNS"""
+    missing = [column for column in HARMONIZED_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"Source {name} is missing harmonized columns {missing}")
+    if len(df):
+        non_numeric = [column for column in NUMERIC_HARMONIZED_COLUMNS
+                       if not pd.api.types.is_numeric_dtype(df[column])]
+        if non_numeric:
+            raise ValueError(f"Source {name} has non-numeric values in {non_numeric}")
 
-print("Step 2: Combining datasets...")
-# Ensure synthetic data has the same column structure
-synthetic_df_clean = synthetic_df[['date', 'model', 'market', 'battery_health', 'has_damage', 
-                                  'acquisition_cost_eur', 'selling_price_eur', 'profit_eur', 'days_to_sell']]
 
-# Combine the datasets using pd.concat
-combined_df = pd.concat([synthetic_df_clean, harmonized_original], ignore_index=True)
-print(f"Combined dataset contains {len(combined_df)} total records")
+@profiler.profiled('combine')
+def combine_sources(harmonized):
+    """Schema-check the harmonized sources and stack them in registration order"""
+    for name, df in harmonized.items():
+        check_source_schema(name, df)
+    frames = [df[HARMONIZED_COLUMNS] for df in harmonized.values() if len(df)]
+    if not frames:
+        return apply_dtype_plan(pd.DataFrame(columns=HARMONIZED_COLUMNS))
+    # Categoricals with different categories concatenate as objects, so re-apply the plan
+    return apply_dtype_plan(pd.concat(frames, ignore_index=True))
 
-print("Step 3: Adding baseline comparison metrics...")
-# Calculate vanilla profit baseline (fixed "Market Rate" tier of 1.0)
-def calculate_vanilla_profit(row):
+
+def calculate_vanilla_profit(df):
     """
-    Calculate profit if device had been sold at fixed Market Rate (1.0 tier).
+    Calculate profit if devices had been sold at fixed Market Rate (1.0 tier).
     This creates a baseline for comparison with the intelligent pricing model.
+    Works on whole columns at once (a DataFrame or a single row).
     """
     market_rate_multiplier = 1.0
-    baseline_selling_price = row['selling_price_eur'] * market_rate_multiplier
-    baseline_profit = baseline_selling_price - row['acquisition_cost_eur'] - (baseline_selling_price * 0.15)
+    baseline_selling_price = df['selling_price_eur'] * market_rate_multiplier
+    baseline_profit = baseline_selling_price - df['acquisition_cost_eur'] - (baseline_selling_price * 0.15)
     return baseline_profit
 
-combined_df['vanilla_profit_eur'] = combined_df.apply(calculate_vanilla_profit, axis=1)
-
-print("Step 4: Creating analytics-ready dataset...")
-# Add time-series features for analytics
-combined_df['date'] = pd.to_datetime(combined_df['date'])
-combined_df['year'] = combined_df['date'].dt.year
-combined_df['month'] = combined_df['date'].dt.month
-combined_df['quarter'] = combined_df['date'].dt.quarter
-combined_df['day_of_week'] = combined_df['date'].dt.dayofweek
-
-# Add derived analytics features
-combined_df['revenue_eur'] = combined_df['selling_price_eur']  # Revenue = selling price
-combined_df['profit_margin'] = combined_df['profit_eur'] / combined_df['selling_price_eur']  # Profit margin %
-
-# Save analytics-ready dataset
-combined_df.to_csv(analytics_output_path, index=False)
-print(f"Analytics dataset saved to {analytics_output_path}")
-
-print("Step 5: Creating ML model-ready dataset...")
-# Prepare features for ML model
-ml_df = combined_df.copy()
-
-# Create categorical and numerical features for ML model
-# Note: Simplified feature set (removed Storage, RAM, Screen Size as per requirements)
-categorical_features = ['market', 'model']
-numerical_features = ['battery_health', 'days_to_sell']
-
-# Convert boolean to int
-ml_df['has_damage_int'] = ml_df['has_damage'].astype(int)
-numerical_features.append('has_damage_int')
-
-# One-hot encode categorical features
-encoder = OneHotEncoder(handle_unknown="ignore", sparse_output=False)
-encoded_categorical = encoder.fit_transform(ml_df[categorical_features])
-
-# Scale numerical features
-scaler = StandardScaler()
-scaled_numerical = scaler.fit_transform(ml_df[numerical_features])
-
-# Combine features
-feature_names = list(encoder.get_feature_names_out(categorical_features)) + numerical_features
-features_combined = np.hstack([encoded_categorical, scaled_numerical])
-
-# Create final ML dataset
-ml_final_df = pd.DataFrame(features_combined, columns=feature_names)
-ml_final_df['selling_price_eur'] = ml_df['selling_price_eur'].values
-ml_final_df['profit_eur'] = ml_df['profit_eur'].values
-ml_final_df['vanilla_profit_eur'] = ml_df['vanilla_profit_eur'].values
-
-# Save ML-ready dataset and artifacts
-ml_final_df.to_csv(ml_output_path, index=False)
-joblib.dump(encoder, encoder_path)
-joblib.dump(scaler, scaler_path)
-
-print(f"ML dataset saved to {ml_output_path}")
-print(f"Encoder saved to {encoder_path}")
-print(f"Scaler saved to {scaler_path}")
-print("ETL task completed successfully!")
+
+@profiler.profiled('vanilla_baseline')
+def add_vanilla_baseline(combined_df):
+    """Add the fixed "Market Rate" tier baseline profit used for comparisons"""
+    combined_df['vanilla_profit_eur'] = calculate_vanilla_profit(combined_df)
+    return combined_df
+
+
+@profiler.profiled('analytics_features')
+def add_analytics_features(combined_df):
+    """Add time-series and derived analytics features"""
+    # Add time-series features for analytics
+    combined_df['date'] = pd.to_datetime(combined_df['date'])
+    combined_df['year'] = combined_df['date'].dt.year
+    combined_df['month'] = combined_df['date'].dt.month
+    combined_df['quarter'] = combined_df['date'].dt.quarter
+    combined_df['day_of_week'] = combined_df['date'].dt.dayofweek
+
+    # Add derived analytics features
+    combined_df['revenue_eur'] = combined_df['selling_price_eur']  # Revenue = selling price
+    combined_df['profit_margin'] = combined_df['profit_eur'] / combined_df['selling_price_eur']  # Profit margin %
+    return apply_dtype_plan(combined_df)
+
+
+@profiler.profiled('ml_features')
+def prepare_ml_features(df):
+    """Select the raw ML feature columns, converting has_damage to an int flag"""
+    return apply_dtype_plan(FeaturePipeline.raw_features(df))
+
+
+def fit_preprocessors(ml_df):
+    """Fit the one-hot encoder and scaler on the ML feature columns"""
+    # One-hot encode categorical features
+    with profiler.stage('fit_encoder', rows=len(ml_df)):
+        encoder = OneHotEncoder(handle_unknown="ignore", sparse_output=False)
+        encoder.fit(ml_df[CATEGORICAL_FEATURES])
+
+    # Scale numerical features
+    with profiler.stage('fit_scaler', rows=len(ml_df)):
+        scaler = StandardScaler()
+        scaler.fit(ml_df[NUMERICAL_FEATURES])
+    return encoder, scaler
+
+
+def fit_vocabulary(encoder, hash_width=0):
+    """
+    Context column slots in the fitted encoder's layout followed by the
+    numerical features, or hash_width hashed category columns if set
+    """
+    if hash_width:
+        return HashedVocabulary(CATEGORICAL_FEATURES, NUMERICAL_FEATURES, hash_width)
+    return CategoryVocabulary.from_encoder(encoder, CATEGORICAL_FEATURES, NUMERICAL_FEATURES)
+
+
+def build_pipeline(vocabulary, scaler, days_to_sell_median):
+    """The feature pipeline the model service loads; serving assumes the median time to sell"""
+    return FeaturePipeline(vocabulary, scaler, FeaturePipeline.default_serving_values(days_to_sell_median))
+
+
+def build_ml_dataset(df, pipeline, ml_df=None):
+    """Run the feature pipeline over the rows and attach the reward targets (ml_df: df's prepared features, if at hand)"""
+    if ml_df is None:
+        ml_df = prepare_ml_features(df)
+    with profiler.stage('transform_features', rows=len(ml_df)):
+        features_combined = pipeline.transform(ml_df)
+
+    # Create final ML dataset
+    ml_final_df = pd.DataFrame(features_combined, columns=pipeline.feature_names())
+    for column in TARGET_COLUMNS:
+        ml_final_df[column] = df[column].values
+    return ml_final_df
+
+
+def analytics_table(df):
+    """Convert an analytics frame to an Arrow table with the stored schema"""
+    return pa.Table.from_pandas(df[ANALYTICS_SCHEMA.names], schema=ANALYTICS_SCHEMA, preserve_index=False)
+
+
+def ml_feature_matrix(ml_final_df):
+    """Feature columns of the ML dataset as a contiguous float64 matrix"""
+    return np.ascontiguousarray(ml_final_df.drop(columns=TARGET_COLUMNS).to_numpy(dtype=np.float64))
+
+
+def reset_parts():
+    """Empty the columnar part directories (replacing single-file outputs of older runs)"""
+    for path in COLUMNAR_PATHS:
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+        os.makedirs(path)
+    if os.path.exists(legacy_ml_features_path):
+        os.remove(legacy_ml_features_path)
+
+
+def columnar_parts_exist():
+    """True if the columnar outputs are part directories (older runs wrote single files)"""
+    return all(os.path.isdir(path) for path in COLUMNAR_PATHS)
+
+
+def next_part_name():
+    """Name shared by the next analytics, ML and feature part files"""
+    return f"part-{sum(name.endswith('.npy') for name in os.listdir(ml_features_path)):05d}"
+
+
+@profiler.profiled('write_columnar')
+def write_columnar_outputs(analytics_df, ml_final_df, append=False):
+    """
+    Write both datasets and the feature matrix as new Parquet and .npy part
+    files, after removing the existing parts unless append
+    """
+    if not append:
+        reset_parts()
+    part_name = next_part_name()
+    pq.write_table(analytics_table(analytics_df), os.path.join(analytics_parquet_path, f'{part_name}.parquet'))
+    pq.write_table(pa.Table.from_pandas(ml_final_df, preserve_index=False),
+                   os.path.join(ml_parquet_path, f'{part_name}.parquet'))
+    np.save(os.path.join(ml_features_path, f'{part_name}.npy'), ml_feature_matrix(ml_final_df))
+    print(f"Columnar outputs saved as {part_name} in {analytics_parquet_path}, {ml_parquet_path} and {ml_features_path}")
+
+
+@profiler.profiled('write_partitions')
+def write_analytics_partitions(df, part_name, replace=False):
+    """
+    Write analytics rows into the year/month/market partitioned dataset.
+
+    Files are named after part_name, so new rows can be added to existing
+    partitions without touching what is already there. replace=True clears
+    the dataset first.
+    """
+    if replace and os.path.exists(analytics_partitioned_path):
+        shutil.rmtree(analytics_partitioned_path)
+    ds.write_dataset(
+        analytics_table(df), analytics_partitioned_path, format='parquet',
+        partitioning=ANALYTICS_PARTITIONING, basename_template=f'{part_name}-{{i}}.parquet',
+        existing_data_behavior='overwrite_or_ignore'
+    )
+    # Readers compare this marker's mtime with the CSV to detect a stale dataset
+    open(os.path.join(analytics_partitioned_path, '_SUCCESS'), 'w').close()
+
+
+@profiler.profiled('rollup_sample')
+def sample_transactions(df, existing_sample=None):
+    """
+    Keep up to SAMPLE_ROWS_PER_MONTH uniformly sampled rows per month.
+
+    Every row gets a pseudo-random sample_key and each month keeps its smallest
+    keys, so merging the samples of several chunks or runs stays uniform. Keys
+    are hashed from the row values, so the same input always gives the same
+    sample (and manifest version) however it was chunked.
+    """
+    sample = df[SAMPLE_COLUMNS].copy()
+    row_hashes = pd.util.hash_pandas_object(sample, index=False).to_numpy()
+    sample['sample_key'] = (row_hashes >> np.uint64(11)) / float(2 ** 53)
+    if existing_sample is not None:
+        sample = pd.concat([existing_sample, sample], ignore_index=True)
+    month = sample['date'].dt.to_period('M')
+    rank = sample.groupby(month)['sample_key'].rank(method='first')
+    return sample[rank <= SAMPLE_ROWS_PER_MONTH].sort_values('date').reset_index(drop=True)
+
+
+@profiler.profiled('write_rollups')
+def write_rollups(daily_rollup, sample):
+    """Write the daily and monthly rollup tables and the row sample"""
+    daily_rollup.to_parquet(rollup_daily_path, index=False)
+    combine_rollups([daily_rollup], freq='M').to_parquet(rollup_monthly_path, index=False)
+    sample.to_parquet(analytics_sample_path, index=False)
+    print(f"Rollups saved to {rollup_daily_path} and {rollup_monthly_path} ({len(daily_rollup):,} daily cells)")
+
+
+@profiler.profiled('write_store')
+def write_store(df, replace=False):
+    """Write analytics rows into the transactions table of the embedded store"""
+    store = open_store(base_data_path)
+    try:
+        store.write_transactions(df, replace=replace)
+    finally:
+        store.close()
+
+
+def store_has_transactions():
+    """True if the store exists and the ETL has written transactions into it"""
+    store = open_store(base_data_path, create=False)
+    if store is None:
+        return False
+    try:
+        return store.transactions_updated_at() is not None
+    finally:
+        store.close()
+
+
+@profiler.profiled('import_feedback')
+def import_feedback_history():
+    """Copy the feedback history JSON files into the store (already stored decisions are kept)"""
+    store = open_store(base_data_path)
+    try:
+        for path in feedback_history_paths:
+            if os.path.exists(path):
+                with open(path, 'r') as f:
+                    records = json.load(f)
+                store.record_feedback(records, source=os.path.basename(path))
+                print(f"Imported {len(records)} feedback records from {path}")
+    finally:
+        store.close()
+
+
+@profiler.profiled('write_preprocessors')
+def save_preprocessors(pipeline, scaler, encoder=None):
+    """Save the feature pipeline, its vocabulary and scaler, and the encoder when it was (re)fit"""
+    if encoder is not None:
+        joblib.dump(encoder, encoder_path)
+        print(f"Encoder saved to {encoder_path}")
+    pipeline.vocabulary.save(vocabulary_path)
+    joblib.dump(scaler, scaler_path)
+    pipeline.save(pipeline_path)
+    print(f"Category vocabulary ({pipeline.width} columns) saved to {vocabulary_path}")
+    print(f"Scaler saved to {scaler_path}")
+    print(f"Feature pipeline saved to {pipeline_path}")
+
+
+def saved_hash_width():
+    """Hash width of the saved vocabulary (0 for one-hot slots), or None if there is none"""
+    if not os.path.exists(vocabulary_path):
+        return None
+    return getattr(CategoryVocabulary.load(vocabulary_path), 'hash_width', 0)
+
+
+def load_vocabulary():
+    """The saved vocabulary, or the saved encoder's layout for outputs written before vocabularies existed"""
+    if os.path.exists(vocabulary_path):
+        return CategoryVocabulary.load(vocabulary_path)
+    return fit_vocabulary(joblib.load(encoder_path))
+
+
+def load_watermark():
+    """Last processed position of each source, or None before the first run"""
+    if not os.path.exists(watermark_path):
+        return None
+    with open(watermark_path, 'r') as f:
+        return json.load(f)
+
+
+def save_watermark(positions, days_to_sell_counts):
+    """
+    Persist how far each source has been processed: rows_processed for every
+    source, plus the latest max_date seen for date-tracked sources. The
+    running days_to_sell value counts let incremental runs update the serving
+    median without rereading the history.
+    """
+    watermark = dict(positions)
+    watermark['days_to_sell_counts'] = {str(float(value)): int(count) for value, count in days_to_sell_counts.items()}
+    watermark['updated_at'] = datetime.now().isoformat()
+    with open(watermark_path, 'w') as f:
+        json.dump(watermark, f, indent=2)
+    print(f"Watermark saved to {watermark_path}")
+
+
+def days_to_sell_value_counts(ml_df):
+    """days_to_sell value -> row count, the running statistic behind the serving median"""
+    return ml_df['days_to_sell'].astype('float64').value_counts()
+
+
+def load_days_to_sell_counts(watermark):
+    """Running days_to_sell value counts (read from the analytics CSV for watermarks written before they existed)"""
+    counts = watermark.get('days_to_sell_counts')
+    if counts is None:
+        return days_to_sell_value_counts(pd.read_csv(analytics_output_path, usecols=['days_to_sell']))
+    return pd.Series({float(value): count for value, count in counts.items()}, dtype='int64')
+
+
+def transform_sources(harmonized):
+    """Steps 2-4: combine the harmonized sources, add baseline and analytics features"""
+    print("Step 2: Combining datasets...")
+    combined_df = combine_sources(harmonized)
+    print(f"Combined dataset contains {len(combined_df)} total records")
+
+    print("Step 3: Adding baseline comparison metrics...")
+    combined_df = add_vanilla_baseline(combined_df)
+
+    print("Step 4: Creating analytics-ready dataset...")
+    combined_df = add_analytics_features(combined_df)
+    report_memory('combined', combined_df)
+    return combined_df
+
+
+def run_full_etl(workers=None, hash_width=FEATURE_HASH_WIDTH):
+    """Rebuild every output from the complete history of all sources"""
+    harmonized, positions = load_sources(workers=workers)
+    combined_df = transform_sources(harmonized)
+
+    # Save analytics-ready dataset
+    with profiler.stage(csv_stage_name(analytics_output_path), rows=len(combined_df)):
+        combined_df.to_csv(analytics_output_path, index=False)
+    print(f"Analytics dataset saved to {analytics_output_path}")
+    write_store(combined_df, replace=True)
+    print(f"Transactions saved to {store_path}")
+
+    print("Step 5: Creating ML model-ready dataset...")
+    ml_df = prepare_ml_features(combined_df)
+    encoder, scaler = fit_preprocessors(ml_df)
+    days_to_sell_counts = days_to_sell_value_counts(ml_df)
+    pipeline = build_pipeline(fit_vocabulary(encoder, hash_width), scaler, ml_df['days_to_sell'].median())
+    ml_final_df = build_ml_dataset(combined_df, pipeline, ml_df)
+    report_memory('ml_dataset', ml_final_df)
+
+    # Save ML-ready dataset and artifacts
+    with profiler.stage(csv_stage_name(ml_output_path), rows=len(ml_final_df)):
+        ml_final_df.to_csv(ml_output_path, index=False)
+    remove_ml_csv_segments()
+    print(f"ML dataset saved to {ml_output_path}")
+    save_preprocessors(pipeline, scaler, encoder)
+    write_columnar_outputs(combined_df, ml_final_df)
+    write_analytics_partitions(combined_df, 'full', replace=True)
+    print(f"Partitioned analytics dataset saved to {analytics_partitioned_path}")
+
+    print("Step 6: Materializing rollup tables...")
+    with profiler.stage('rollups', rows=len(combined_df)):
+        daily_rollup = rollup_transactions(combined_df)
+    write_rollups(daily_rollup, sample_transactions(combined_df))
+    import_feedback_history()
+
+    save_watermark(positions, days_to_sell_counts)
+
+
+def iter_transformed_chunks(chunk_size):
+    """
+    Yield analytics-ready chunks of every source without loading any fully.
+
+    Sources are read one after another in registration order, the same order
+    as combine_sources. Each yielded item is (source, raw_rows, harmonized, chunk).
+    """
+    for name, source in SOURCE_REGISTRY.items():
+        for raw_chunk in pd.read_csv(source['path'], dtype=source['dtypes'], chunksize=chunk_size):
+            with profiler.stage(f'harmonize:{name}', rows=len(raw_chunk)):
+                harmonized_chunk = source['harmonize'](raw_chunk)
+            check_source_schema(name, harmonized_chunk)
+            chunk = add_vanilla_baseline(harmonized_chunk[HARMONIZED_COLUMNS].copy())
+            yield name, len(raw_chunk), harmonized_chunk, add_analytics_features(chunk)
+
+
+def csv_stage_name(path):
+    """Profiler stage for writing one CSV output, e.g. 'write_csv:analytics_data'"""
+    return f"write_csv:{os.path.splitext(os.path.basename(path))[0]}"
+
+
+def write_csv_chunk(df, path, first_chunk):
+    """Write the first chunk with a header, append the rest"""
+    with profiler.stage(csv_stage_name(path), rows=len(df)):
+        df.to_csv(path, mode='w' if first_chunk else 'a', header=first_chunk, index=False)
+
+
+def median_from_counts(counts):
+    """Median of the values a value -> count Series describes (as Series.median would compute it)"""
+    counts = counts.sort_index()
+    cumulative = counts.cumsum().to_numpy()
+    total = cumulative[-1]
+    lower = counts.index[np.searchsorted(cumulative, (total - 1) // 2 + 1)]
+    upper = counts.index[np.searchsorted(cumulative, total // 2 + 1)]
+    return (float(lower) + float(upper)) / 2
+
+
+def run_streaming_etl(chunk_size, hash_width=FEATURE_HASH_WIDTH):
+    """
+    Full ETL in two passes over bounded chunks, for sources larger than memory.
+
+    Pass 1 writes the analytics dataset chunk by chunk while collecting the
+    categorical vocabularies and fitting the scaler with partial_fit. Pass 2
+    reads the analytics Parquet back in batches and writes the ML dataset and
+    feature matrix.
+    """
+    print(f"Pass 1: Streaming sources in chunks of {chunk_size:,} rows...")
+    categories = {feature: set() for feature in CATEGORICAL_FEATURES}
+    scaler = StandardScaler()
+    days_to_sell_counts = pd.Series(dtype='int64')
+    positions = {}
+    total_rows = 0
+    reset_parts()
+    part_name = next_part_name()
+    analytics_part_path = os.path.join(analytics_parquet_path, f'{part_name}.parquet')
+    analytics_writer = pq.ParquetWriter(analytics_part_path, ANALYTICS_SCHEMA)
+    daily_rollup = None
+    sample = None
+
+    for chunk_index, (source, raw_rows, harmonized_chunk, chunk) in enumerate(iter_transformed_chunks(chunk_size)):
+        positions[source] = advance_position(source, positions.get(source), raw_rows, harmonized_chunk)
+
+        ml_chunk = prepare_ml_features(chunk)
+        for feature in CATEGORICAL_FEATURES:
+            categories[feature].update(ml_chunk[feature].unique())
+        with profiler.stage('fit_scaler', rows=len(ml_chunk)):
+            scaler.partial_fit(ml_chunk[NUMERICAL_FEATURES])
+        days_to_sell_counts = days_to_sell_counts.add(days_to_sell_value_counts(ml_chunk), fill_value=0)
+
+        write_csv_chunk(chunk, analytics_output_path, first_chunk=total_rows == 0)
+        with profiler.stage('write_columnar:analytics', rows=len(chunk)):
+            analytics_writer.write_table(analytics_table(chunk))
+        write_analytics_partitions(chunk, f'chunk{chunk_index:05d}', replace=chunk_index == 0)
+        write_store(chunk, replace=chunk_index == 0)
+        # Rollups are sums, so per-chunk rollups add up to the full rollup
+        with profiler.stage('rollups', rows=len(chunk)):
+            daily_rollup = combine_rollups([daily_rollup, rollup_transactions(chunk)])
+        sample = sample_transactions(chunk, sample)
+        total_rows += len(chunk)
+        print(f"  {total_rows:,} records processed")
+
+    analytics_writer.close()
+    if total_rows == 0:
+        raise ValueError("All sources are empty - nothing to process")
+    print(f"Analytics dataset saved to {analytics_output_path} (partitioned copy under {analytics_partitioned_path})")
+    print(f"Transactions saved to {store_path}")
+    write_rollups(daily_rollup, sample)
+
+    # Same sorted vocabularies a single fit over the full frame would learn
+    encoder = OneHotEncoder(
+        categories=[sorted(categories[feature]) for feature in CATEGORICAL_FEATURES],
+        handle_unknown="ignore", sparse_output=False
+    )
+    encoder.fit(pd.DataFrame([[sorted(categories[feature])[0] for feature in CATEGORICAL_FEATURES]],
+                             columns=CATEGORICAL_FEATURES))
+    pipeline = build_pipeline(fit_vocabulary(encoder, hash_width), scaler, median_from_counts(days_to_sell_counts))
+
+    print("Pass 2: Creating ML model-ready dataset chunk by chunk...")
+    features = np.lib.format.open_memmap(os.path.join(ml_features_path, f'{part_name}.npy'), mode='w+',
+                                         dtype=np.float64, shape=(total_rows, pipeline.width))
+    ml_writer = None
+    rows_written = 0
+    remove_ml_csv_segments()
+    for batch in pq.ParquetFile(analytics_part_path).iter_batches(batch_size=chunk_size):
+        ml_chunk = build_ml_dataset(batch.to_pandas(), pipeline)
+        write_csv_chunk(ml_chunk, ml_output_path, first_chunk=rows_written == 0)
+        with profiler.stage('write_columnar:ml', rows=len(ml_chunk)):
+            table = pa.Table.from_pandas(ml_chunk, preserve_index=False)
+            if ml_writer is None:
+                ml_writer = pq.ParquetWriter(os.path.join(ml_parquet_path, f'{part_name}.parquet'), table.schema)
+            ml_writer.write_table(table)
+            features[rows_written:rows_written + len(ml_chunk)] = ml_feature_matrix(ml_chunk)
+        rows_written += len(ml_chunk)
+    ml_writer.close()
+    features.flush()
+    del features
+    print(f"ML dataset saved to {ml_output_path}, {ml_parquet_path} and {ml_features_path}")
+    save_preprocessors(pipeline, scaler, encoder)
+    import_feedback_history()
+
+    save_watermark(positions, days_to_sell_counts)
+
+
+def needs_refit(new_ml_df, scaler):
+    """Return the reason the scaler must be refit for this batch, or None"""
+    # New categories get appended vocabulary slots instead, see ml_csv_path
+    # Significant drift in the numerical feature distribution
+    if len(new_ml_df) >= MIN_ROWS_FOR_DRIFT_CHECK:
+        batch_means = new_ml_df[NUMERICAL_FEATURES].mean().values
+        shift = np.abs(batch_means - scaler.mean_) / scaler.scale_
+        if np.any(shift > DRIFT_THRESHOLD_STD):
+            drifted = [name for name, value in zip(NUMERICAL_FEATURES, shift) if value > DRIFT_THRESHOLD_STD]
+            return f"drift in {drifted}"
+    return None
+
+
+def append_csv(df, path):
+    """Append rows to an existing CSV, matching its column order"""
+    with profiler.stage(csv_stage_name(path), rows=len(df)):
+        existing_columns = pd.read_csv(path, nrows=0).columns
+        df[existing_columns].to_csv(path, mode='a', header=False, index=False)
+
+
+def ml_csv_segments():
+    """ML dataset CSV files in write order: the original file, then one per wider vocabulary"""
+    widened = sorted(glob.glob(ml_segment_pattern),
+                     key=lambda path: int(os.path.basename(path).split('.')[1][1:]))
+    return [ml_output_path] + widened
+
+
+def remove_ml_csv_segments():
+    """Drop widened segments before processed_ml_data.csv is rewritten in full"""
+    for path in glob.glob(ml_segment_pattern):
+        os.remove(path)
+
+
+def ml_csv_path(width):
+    """CSV segment new ML rows of this feature width are appended to (created if needed)"""
+    current_path = ml_csv_segments()[-1]
+    current_width = len(pd.read_csv(current_path, nrows=0).columns) - len(TARGET_COLUMNS)
+    if width == current_width:
+        return current_path
+    return os.path.join(base_data_path, f'processed_ml_data.w{width}.csv')
+
+
+def read_ml_csv():
+    """The ML dataset from all CSV segments, zero-filling the slots older segments lack"""
+    segments = [pd.read_csv(path) for path in ml_csv_segments()]
+    columns = segments[-1].columns
+    return pd.concat([segment.reindex(columns=columns, fill_value=0.0) for segment in segments], ignore_index=True)
+
+
+def output_paths():
+    """Outputs tracked by the manifest, including any widened ML CSV segments"""
+    return {**OUTPUT_PATHS, **{os.path.basename(path): path for path in ml_csv_segments()[1:]}}
+
+
+def run_incremental_etl(workers=None):
+    """Process only rows newer than the last run's watermark and append them to the outputs"""
+    watermark = load_watermark()
+    outputs = [analytics_output_path, ml_output_path, encoder_path, scaler_path]
+    if watermark is None or not all(os.path.exists(p) for p in outputs):
+        print("No watermark or previous outputs found - running a full ETL instead")
+        run_full_etl(workers)
+        return
+
+    # Sources registered since the last run have no position and are loaded in full
+    positions = {name: watermark.get(name) for name in SOURCE_REGISTRY}
+    days_to_sell_counts = load_days_to_sell_counts(watermark)
+    for name, position in positions.items():
+        print(f"  {name}: resuming after {position or 'nothing (new source)'}")
+    harmonized, new_positions = load_sources(positions, workers)
+
+    if not any(len(df) for df in harmonized.values()):
+        print("No new records since the last run - nothing to do")
+        return
+
+    new_df = transform_sources(harmonized)
+    append_csv(new_df, analytics_output_path)
+    print(f"Appended {len(new_df)} records to {analytics_output_path}")
+    if os.path.exists(analytics_partitioned_path):
+        write_analytics_partitions(new_df, f"incremental-{datetime.now().strftime('%Y%m%d%H%M%S%f')}")
+    else:
+        write_analytics_partitions(read_analytics_csv(), 'full')
+    print(f"Partitioned analytics dataset updated at {analytics_partitioned_path}")
+    if store_has_transactions():
+        write_store(new_df)
+    else:
+        write_store(read_analytics_csv(), replace=True)
+    print(f"Transactions saved to {store_path}")
+
+    if os.path.exists(rollup_daily_path) and os.path.exists(analytics_sample_path):
+        with profiler.stage('rollups', rows=len(new_df)):
+            daily_rollup = combine_rollups([pd.read_parquet(rollup_daily_path), rollup_transactions(new_df)])
+        sample = sample_transactions(new_df, pd.read_parquet(analytics_sample_path))
+    else:
+        history_df = read_analytics_csv()
+        with profiler.stage('rollups', rows=len(history_df)):
+            daily_rollup = rollup_transactions(history_df)
+        sample = sample_transactions(history_df)
+    write_rollups(daily_rollup, sample)
+
+    print("Step 5: Updating ML model-ready dataset...")
+    scaler = joblib.load(scaler_path)
+    vocabulary = load_vocabulary()
+    new_ml_df = prepare_ml_features(new_df)
+    refit_reason = needs_refit(new_ml_df, scaler)
+
+    if refit_reason:
+        # Scaling changed, so every row has to be rescaled (category slots are kept)
+        print(f"Refitting scaler ({refit_reason})...")
+        analytics_df = read_analytics_csv()
+        history_ml_df = prepare_ml_features(analytics_df)
+        with profiler.stage('fit_scaler', rows=len(history_ml_df)):
+            scaler = StandardScaler().fit(history_ml_df[NUMERICAL_FEATURES])
+        vocabulary.extend(history_ml_df)
+        days_to_sell_counts = days_to_sell_value_counts(history_ml_df)
+        pipeline = build_pipeline(vocabulary, scaler, history_ml_df['days_to_sell'].median())
+        ml_final_df = build_ml_dataset(analytics_df, pipeline, history_ml_df)
+        with profiler.stage(csv_stage_name(ml_output_path), rows=len(ml_final_df)):
+            ml_final_df.to_csv(ml_output_path, index=False)
+        remove_ml_csv_segments()
+        print(f"ML dataset rebuilt at {ml_output_path}")
+        write_columnar_outputs(analytics_df, ml_final_df)
+    else:
+        # New categories get fresh column slots; existing rows are zero in them
+        new_slots = vocabulary.extend(new_ml_df)
+        if new_slots:
+            print(f"Appended category slots {new_slots}")
+        days_to_sell_counts = days_to_sell_counts.add(days_to_sell_value_counts(new_ml_df), fill_value=0)
+        pipeline = build_pipeline(vocabulary, scaler, median_from_counts(days_to_sell_counts))
+        new_ml_final_df = build_ml_dataset(new_df, pipeline, new_ml_df)
+        segment_path = ml_csv_path(pipeline.width)
+        if os.path.exists(segment_path):
+            append_csv(new_ml_final_df, segment_path)
+        else:
+            write_csv_chunk(new_ml_final_df, segment_path, first_chunk=True)
+        print(f"Appended {len(new_df)} records to {segment_path}")
+        if columnar_parts_exist():
+            write_columnar_outputs(new_df, new_ml_final_df, append=True)
+        else:
+            # Outputs of runs before part files: rewritten once from the full history
+            write_columnar_outputs(read_analytics_csv(), read_ml_csv())
+    save_preprocessors(pipeline, scaler)
+    import_feedback_history()
+
+    save_watermark(new_positions, days_to_sell_counts)
+
+
+def output_row_counts():
+    """Rows in the outputs and rows ingested from each source"""
+    watermark = load_watermark() or {}
+    # Row counts come from the part files' metadata
+    row_counts = {
+        'analytics_data': ds.dataset(analytics_parquet_path).count_rows(),
+        'processed_ml_data': ds.dataset(ml_parquet_path).count_rows()
+    }
+    for name in SOURCE_REGISTRY:
+        row_counts[name] = (watermark.get(name) or {}).get('rows_processed')
+    return row_counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prepare analytics and ML training data")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--incremental', action='store_true',
+                      help="Only process rows newer than the last run's watermark")
+    mode.add_argument('--streaming', action='store_true',
+                      help="Process the sources in bounded chunks (for data larger than memory)")
+    parser.add_argument('--chunk-size', type=int, default=100000,
+                        help="Rows per chunk in --streaming mode")
+    parser.add_argument('--force', action='store_true',
+                        help="Run even if the inputs are unchanged since the last run")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Processes for loading sources in parallel (default: one per source)")
+    parser.add_argument('--hash-width', type=int, default=FEATURE_HASH_WIDTH,
+                        help="Hash categories into this many context columns instead of one-hot "
+                             "(full and streaming runs; incremental runs keep the saved layout)")
+    args = parser.parse_args()
+
+    run_mode = 'incremental' if args.incremental else 'streaming' if args.streaming else 'full'
+    print(f"ETL task started: Preparing enhanced training data from {len(SOURCE_REGISTRY)} data sources...")
+    with profiler.stage('manifest_check'):
+        manifest = etl_manifest.load_manifest(manifest_path)
+        # Feedback history files are imported into the store, so they count as inputs too
+        input_paths = {**source_paths(), **{os.path.basename(path): path for path in feedback_history_paths
+                                            if os.path.exists(path)}}
+        inputs = etl_manifest.input_fingerprint(input_paths, manifest)
+    # The store is not hashed into the manifest (the model service writes to it too)
+    layout_unchanged = args.incremental or saved_hash_width() == args.hash_width
+    if not args.force and etl_manifest.is_current(manifest, inputs, output_paths()) \
+            and store_has_transactions() and layout_unchanged:
+        print(f"Inputs and code unchanged since manifest version {manifest['version']} - nothing to do")
+        profiler.write_report(run_report_path, run_mode, skipped=True, manifest_version=manifest['version'])
+        return
+
+    if args.incremental:
+        run_incremental_etl(args.workers)
+    elif args.streaming:
+        run_streaming_etl(args.chunk_size, args.hash_width)
+    else:
+        run_full_etl(args.workers, args.hash_width)
+    with profiler.stage('manifest_write'):
+        manifest = etl_manifest.write_manifest(manifest_path, inputs, output_paths(), output_row_counts())
+    profiler.write_report(run_report_path, run_mode, skipped=False, manifest_version=manifest['version'])
+    print("ETL task completed successfully!")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,327 @@
+"""
+Embedded SQLite store for transactions, pricing decisions and feedback.
+
+One database file in the shared data directory (pricing_store.db) is the
+system of record for every component:
+
+- the ETL writes the analytics transactions and imports the feedback history
+- the model service logs each decision it issues and each reported outcome
+- the UI runs filtered aggregate queries instead of parsing whole files
+
+Feedback and outcomes are append-only logs: a record is inserted once and
+never rewritten, and both are indexed by time and decision id, so appends
+and time-range reads stay cheap however long the history grows.
+
+The database runs in WAL mode, so the UI keeps reading while the ETL or the
+model service (separate processes and containers) write. Transactions are
+indexed on date, market and model, which are the dashboard's filters.
+
+This module is shared by the ETL, the model service and the UI.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+STORE_FILENAME = 'pricing_store.db'
+
+TRANSACTION_COLUMNS = {
+    'date': 'TEXT NOT NULL',  # ISO yyyy-mm-dd, so text order is date order
+    'model': 'TEXT',
+    'market': 'TEXT',
+    'battery_health': 'INTEGER',
+    'has_damage': 'INTEGER',
+    'condition_category': 'TEXT',
+    'acquisition_cost_eur': 'REAL',
+    'selling_price_eur': 'REAL',
+    'profit_eur': 'REAL',
+    'days_to_sell': 'REAL',
+    'vanilla_profit_eur': 'REAL',
+    'revenue_eur': 'REAL',
+    'profit_margin': 'REAL'
+}
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS transactions (
+    {', '.join(f'{name} {sql_type}' for name, sql_type in TRANSACTION_COLUMNS.items())}
+);
+CREATE INDEX IF NOT EXISTS transactions_date ON transactions (date);
+CREATE INDEX IF NOT EXISTS transactions_market_date ON transactions (market, date);
+CREATE INDEX IF NOT EXISTS transactions_model ON transactions (model);
+
+CREATE TABLE IF NOT EXISTS decisions (
+    decision_id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    bandit_model TEXT,
+    recommended_tier REAL,
+    device_model TEXT,
+    market TEXT,
+    inventory_level TEXT,
+    battery INTEGER,
+    screen_damage INTEGER,
+    backglass_damage INTEGER,
+    new_model_imminent INTEGER,
+    estimated_market_value_eur REAL,
+    selling_price_eur REAL,
+    acquisition_cost_eur REAL,
+    data_version TEXT
+);
+CREATE INDEX IF NOT EXISTS decisions_created_at ON decisions (created_at);
+
+CREATE TABLE IF NOT EXISTS outcomes (
+    decision_id TEXT PRIMARY KEY,
+    reported_at TEXT NOT NULL,
+    reward_eur REAL,
+    reward_lkr REAL
+);
+CREATE INDEX IF NOT EXISTS outcomes_reported_at ON outcomes (reported_at);
+
+CREATE TABLE IF NOT EXISTS feedback (
+    decision_id TEXT PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    tier REAL,
+    reward REAL,
+    sale_outcome TEXT,
+    features TEXT,
+    source TEXT
+);
+CREATE INDEX IF NOT EXISTS feedback_timestamp ON feedback (timestamp);
+
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Feedback timestamps as the UI and the simulators write them
+FEEDBACK_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+SUMMED_COLUMNS = ['revenue_eur', 'profit_eur', 'selling_price_eur', 'vanilla_profit_eur',
+                  'days_to_sell', 'profit_margin']
+
+# SQL expression of a rollup period (see analytics_rollups) per frequency
+PERIOD_EXPRESSIONS = {'D': 'date', 'M': "substr(date, 1, 7) || '-01'"}
+
+
+class PricingStore:
+    """Thread-safe access to the SQLite store (one connection per process)"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self.connection.close()
+
+    def query(self, sql, params=()):
+        """Run a read query and return the result as a DataFrame"""
+        with self._lock:
+            return pd.read_sql_query(sql, self.connection, params=params)
+
+    def get_meta(self, key):
+        with self._lock:
+            row = self.connection.execute('SELECT value FROM store_meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self.connection.execute('INSERT OR REPLACE INTO store_meta (key, value) VALUES (?, ?)', (key, str(value)))
+
+    # Transactions (written by the ETL)
+
+    def write_transactions(self, df, replace=False):
+        """Insert analytics rows; replace=True first drops all existing transactions"""
+        has_damage = df['has_damage'].astype(bool)
+        values = {
+            'date': pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d').tolist(),
+            'has_damage': has_damage.astype(int).tolist(),
+            'condition_category': has_damage.map({True: 'Damaged', False: 'Undamaged'}).tolist()
+        }
+        for column, sql_type in TRANSACTION_COLUMNS.items():
+            if column in values:
+                continue
+            if column not in df.columns:
+                values[column] = [None] * len(df)
+            elif sql_type == 'TEXT':
+                values[column] = df[column].astype(str).tolist()
+            else:
+                # float64 tolist gives Python floats; SQLite stores NaN as NULL
+                values[column] = df[column].astype('float64').tolist()
+        rows = list(zip(*(values[column] for column in TRANSACTION_COLUMNS)))
+
+        placeholders = ', '.join('?' for _ in TRANSACTION_COLUMNS)
+        with self._lock, self.connection:
+            if replace:
+                self.connection.execute('DELETE FROM transactions')
+            self.connection.executemany(
+                f"INSERT INTO transactions ({', '.join(TRANSACTION_COLUMNS)}) VALUES ({placeholders})",
+                rows
+            )
+            self._set_meta('transactions_updated_at', time.time())
+        return len(rows)
+
+    def transactions_updated_at(self):
+        """Epoch seconds of the last transaction write, or None"""
+        value = self.get_meta('transactions_updated_at')
+        return float(value) if value is not None else None
+
+    def query_rollup(self, freq='D', start_date=None, end_date=None, markets=None):
+        """Rollup cells in the analytics_rollups layout, aggregated by the database"""
+        where, params = _transaction_filter(start_date, end_date, markets)
+        sums = ', '.join(f'SUM({column}) AS {column}_sum' for column in SUMMED_COLUMNS)
+        rollup = self.query(
+            f"SELECT {PERIOD_EXPRESSIONS[freq]} AS period, market, model, condition_category, {sums}, "
+            f"SUM(profit_eur * profit_eur) AS profit_eur_sumsq, COUNT(*) AS units "
+            f"FROM transactions {where} GROUP BY 1, 2, 3, 4",
+            params
+        )
+        rollup['period'] = pd.to_datetime(rollup['period'])
+        return rollup
+
+    def query_totals(self, columns, start_date=None, end_date=None, markets=None):
+        """Row count (row_count) plus sum and mean of each column, as a dict"""
+        where, params = _transaction_filter(start_date, end_date, markets)
+        aggregates = ', '.join(['COUNT(*) AS row_count'] + [f'SUM({column}) AS {column}_sum, AVG({column}) AS {column}_mean'
+                                                             for column in columns])
+        return self.query(f'SELECT {aggregates} FROM transactions {where}', params).iloc[0].to_dict()
+
+    def sample_transactions(self, columns, n):
+        """Uniform random sample of n transactions (only the given columns)"""
+        return self.query(f"SELECT {', '.join(columns)} FROM transactions ORDER BY RANDOM() LIMIT ?", (int(n),))
+
+    # Decisions and outcomes (logged by the model service)
+
+    def log_decision(self, decision_id, bandit_model, recommended_tier, input_data, market=None,
+                     estimated_market_value_eur=None, selling_price_eur=None, acquisition_cost_eur=None,
+                     data_version=None):
+        with self._lock, self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO decisions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (decision_id, _now(), bandit_model, float(recommended_tier),
+                 str(input_data.get('Model', 'iPhone 11')),
+                 str(market or input_data.get('market', 'poland')).lower(),
+                 input_data.get('inventory_level', 'decent'),
+                 int(input_data.get('Battery', 95)),
+                 int(input_data.get('Screen_Damage', 0)),
+                 int(input_data.get('Backglass_Damage', 0)),
+                 int(bool(input_data.get('new_model_imminent', False))),
+                 estimated_market_value_eur, selling_price_eur, acquisition_cost_eur, data_version)
+            )
+
+    def log_outcome(self, decision_id, reward_eur, reward_lkr):
+        with self._lock, self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO outcomes VALUES (?, ?, ?, ?)',
+                (decision_id, _now(), reward_eur, reward_lkr)
+            )
+
+    # Feedback history (imported by the ETL, recorded by the UI)
+
+    def record_feedback(self, records, source='ui'):
+        """Store feedback records ({timestamp, decision_id, tier, reward, sale_outcome, features}); existing ids are kept"""
+        with self._lock, self.connection:
+            self.connection.executemany(
+                'INSERT OR IGNORE INTO feedback VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(str(record['decision_id']), record['timestamp'], record.get('tier'), record.get('reward'),
+                  record.get('sale_outcome'), json.dumps(record.get('features', {})), source)
+                 for record in records]
+            )
+
+    def load_feedback(self, start=None, end=None, limit=None):
+        """
+        Feedback records between start and end (inclusive, either optional),
+        oldest first, in the dict layout the UI keeps in its session; limit
+        keeps only the most recent ones.
+        """
+        where, params = _time_filter('timestamp', start, end, FEEDBACK_TIME_FORMAT)
+        # Insertion order (rowid) breaks timestamp ties
+        feedback = self.query(
+            'SELECT * FROM (SELECT rowid AS seq, timestamp, decision_id, tier, reward, sale_outcome, features '
+            f'FROM feedback {where} ORDER BY timestamp DESC, seq DESC{" LIMIT ?" if limit else ""}) '
+            'ORDER BY timestamp, seq',
+            params + ([int(limit)] if limit else [])
+        )
+        records = feedback.drop(columns='seq').to_dict('records')
+        for record in records:
+            record['features'] = json.loads(record['features']) if record['features'] else {}
+        return records
+
+    def get_feedback(self, decision_id):
+        """The feedback record of one decision, or None"""
+        records = self.query(
+            'SELECT timestamp, decision_id, tier, reward, sale_outcome, features FROM feedback WHERE decision_id = ?',
+            (str(decision_id),)
+        ).to_dict('records')
+        if not records:
+            return None
+        record = records[0]
+        record['features'] = json.loads(record['features']) if record['features'] else {}
+        return record
+
+    def count_feedback(self):
+        with self._lock:
+            return self.connection.execute('SELECT COUNT(*) FROM feedback').fetchone()[0]
+
+    # Evaluation history (outcomes joined with the decisions they report on)
+
+    def load_evaluations(self, start=None, end=None, limit=None):
+        """Reported outcomes between start and end, oldest first, with the model and tier of their decision"""
+        where, params = _time_filter('outcomes.reported_at', start, end)
+        evaluations = self.query(
+            'SELECT * FROM (SELECT outcomes.reported_at AS timestamp, outcomes.decision_id, '
+            'decisions.bandit_model AS model, decisions.recommended_tier, outcomes.reward_eur, outcomes.reward_lkr '
+            f'FROM outcomes LEFT JOIN decisions USING (decision_id) {where} '
+            f'ORDER BY outcomes.reported_at DESC{" LIMIT ?" if limit else ""}) ORDER BY timestamp',
+            params + ([int(limit)] if limit else [])
+        )
+        return evaluations.to_dict('records')
+
+    def count_outcomes(self):
+        with self._lock:
+            return self.connection.execute('SELECT COUNT(*) FROM outcomes').fetchone()[0]
+
+
+def _now():
+    return pd.Timestamp.now().isoformat()
+
+
+def _time_filter(column, start=None, end=None, time_format=None):
+    """WHERE clause for start <= column <= end; times are stored as text in time_format (default ISO)"""
+    conditions, params = [], []
+    for operator, value in (('>=', start), ('<=', end)):
+        if value is not None:
+            timestamp = pd.Timestamp(value)
+            conditions.append(f'{column} {operator} ?')
+            params.append(timestamp.strftime(time_format) if time_format else timestamp.isoformat())
+    return ('WHERE ' + ' AND '.join(conditions)) if conditions else '', params
+
+
+def _transaction_filter(start_date=None, end_date=None, markets=None):
+    """WHERE clause and parameters for the date range and market filters"""
+    conditions, params = [], []
+    if start_date is not None:
+        conditions.append('date >= ?')
+        params.append(pd.Timestamp(start_date).strftime('%Y-%m-%d'))
+    if end_date is not None:
+        conditions.append('date <= ?')
+        params.append(pd.Timestamp(end_date).strftime('%Y-%m-%d'))
+    if markets:
+        conditions.append(f"market IN ({', '.join('?' for _ in markets)})")
+        params.extend(markets)
+    return ('WHERE ' + ' AND '.join(conditions)) if conditions else '', params
+
+
+def open_store(data_dir, create=True):
+    """The store in data_dir, or None if it does not exist and create is False"""
+    path = os.path.join(data_dir, STORE_FILENAME)
+    if not create and not os.path.exists(path):
+        return None
+    return PricingStore(path)
@@ -0,0 +1,183 @@
+"""
+Admission control for the pricing API.
+
+Keeps a bounded number of requests in flight per route, lets a small number
+wait briefly for a free slot and sheds everything else with a fast 503 so
+latency stays flat for the requests we do accept during a traffic spike.
+
+High priority requests (outcome reports) wait longer than the rest, have
+queue slots of their own and get freed slots before waiting normal priority
+requests, so under overload pricing requests are shed before outcomes are.
+"""
+
+import threading
+import time
+from functools import wraps
+
+from flask import Response, jsonify
+
+# Route priorities: outcome reporting feeds the learning loop and must not be
+# starved by dashboards, while /price_analysis is analysis-only and is shed first
+PRIORITY_HIGH = 'high'
+PRIORITY_NORMAL = 'normal'
+PRIORITY_LOW = 'low'
+
+
+class AdmissionController:
+    """Bounded in-flight limits per route with priority-aware load shedding"""
+
+    def __init__(self, global_limit=32, queue_limit=16, queue_timeout=0.05,
+                 retry_after=1, high_priority_reserve=0.25, low_priority_share=0.5,
+                 high_priority_timeout=2.0, high_priority_queue_reserve=0.5):
+        self.global_limit = global_limit
+        self.queue_limit = queue_limit  # Max requests waiting for a slot at once
+        self.queue_timeout = queue_timeout  # Seconds a request may wait before being shed
+        # High priority requests may wait longer (an outcome update takes far
+        # longer than a price lookup), and this share of the queue is theirs only
+        self.high_priority_timeout = high_priority_timeout
+        self.high_priority_queue_reserve = high_priority_queue_reserve
+        self.retry_after = retry_after
+        # Slots only high priority routes may use, and the share of capacity
+        # low priority routes may use, so outcomes always get through first
+        self.high_priority_reserve = high_priority_reserve
+        self.low_priority_share = low_priority_share
+
+        self.routes = {}
+        self.in_flight = 0
+        self.waiting = 0
+        self.waiting_high = 0
+        self._condition = threading.Condition()
+
+    def register(self, route, limit, priority=PRIORITY_NORMAL):
+        """Register a route with its own in-flight limit and priority"""
+        self.routes[route] = {
+            'limit': limit,
+            'priority': priority,
+            'in_flight': 0,
+            'waiting': 0,
+            'admitted': 0,
+            'shed': 0,
+            'max_queue_depth': 0
+        }
+
+    def _priority_capacity(self, priority):
+        """Share of the global limit a route of this priority may occupy"""
+        if priority == PRIORITY_HIGH:
+            return self.global_limit
+        if priority == PRIORITY_LOW:
+            return max(1, int(self.global_limit * self.low_priority_share))
+        return max(1, self.global_limit - int(self.global_limit * self.high_priority_reserve))
+
+    def _high_priority_blocked_globally(self):
+        """True if a waiting high priority request is held back by global capacity, not its route limit"""
+        return any(state['priority'] == PRIORITY_HIGH and state['waiting'] and state['in_flight'] < state['limit']
+                   for state in self.routes.values())
+
+    def _has_capacity(self, route):
+        state = self.routes[route]
+        # Freed global slots go to waiting high priority requests first; a high
+        # priority request waiting only on its own route limit holds nothing back
+        if state['priority'] != PRIORITY_HIGH and self.waiting_high and self._high_priority_blocked_globally():
+            return False
+        return (state['in_flight'] < state['limit'] and
+                self.in_flight < self._priority_capacity(state['priority']))
+
+    def _queue_capacity(self, priority):
+        """How many requests may be waiting when one of this priority joins the queue"""
+        if priority == PRIORITY_HIGH:
+            return self.queue_limit
+        return self.queue_limit - int(self.queue_limit * self.high_priority_queue_reserve)
+
+    def try_acquire(self, route):
+        """Admit the request or return False if it should be shed"""
+        state = self.routes[route]
+        high_priority = state['priority'] == PRIORITY_HIGH
+        with self._condition:
+            if not self._has_capacity(route):
+                # Low priority work never queues - it is shed immediately
+                if state['priority'] == PRIORITY_LOW or self.waiting >= self._queue_capacity(state['priority']):
+                    state['shed'] += 1
+                    return False
+
+                self.waiting += 1
+                self.waiting_high += high_priority
+                state['waiting'] += 1
+                state['max_queue_depth'] = max(state['max_queue_depth'], state['waiting'])
+                deadline = time.monotonic() + (self.high_priority_timeout if high_priority else self.queue_timeout)
+                try:
+                    while not self._has_capacity(route):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            state['shed'] += 1
+                            return False
+                        self._condition.wait(remaining)
+                finally:
+                    self.waiting -= 1
+                    self.waiting_high -= high_priority
+                    state['waiting'] -= 1
+                    # Normal priority waiters may have been held back for this request
+                    self._condition.notify_all()
+
+            self.in_flight += 1
+            state['in_flight'] += 1
+            state['admitted'] += 1
+            return True
+
+    def release(self, route):
+        """Free the slot held by an admitted request"""
+        with self._condition:
+            self.in_flight -= 1
+            self.routes[route]['in_flight'] -= 1
+            self._condition.notify_all()
+
+    def limit(self, route):
+        """Decorator wrapping a Flask view with admission control"""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.try_acquire(route):
+                    response = jsonify({
+                        'error': 'Service saturated, please retry',
+                        'route': route,
+                        'retry_after_seconds': self.retry_after
+                    })
+                    response.status_code = 503
+                    response.headers['Retry-After'] = str(self.retry_after)
+                    return response
+                try:
+                    response = view(*args, **kwargs)
+                except BaseException:
+                    self.release(route)
+                    raise
+                # Streamed responses keep their slot until the stream is closed
+                if isinstance(response, Response) and response.is_streamed:
+                    response.call_on_close(lambda: self.release(route))
+                else:
+                    self.release(route)
+                return response
+            return wrapper
+        return decorator
+
+    def metrics(self):
+        """Snapshot of queue depth, in-flight and shed counters per route"""
+        with self._condition:
+            return {
+                'global_limit': self.global_limit,
+                'in_flight': self.in_flight,
+                'queue_depth': self.waiting,
+                'high_priority_queue_depth': self.waiting_high,
+                'queue_limit': self.queue_limit,
+                'total_shed': sum(state['shed'] for state in self.routes.values()),
+                'routes': {
+                    route: {
+                        'priority': state['priority'],
+                        'limit': state['limit'],
+                        'in_flight': state['in_flight'],
+                        'queue_depth': state['waiting'],
+                        'max_queue_depth': state['max_queue_depth'],
+                        'admitted': state['admitted'],
+                        'shed': state['shed']
+                    }
+                    for route, state in self.routes.items()
+                }
+            }
@@ -0,0 +1,89 @@
+"""
+In-place widening of fitted MABWiser bandits when context columns are appended.
+
+When the category vocabulary gains a slot (see category_vocabulary), every
+context seen so far is zero in that column. A model fitted on contexts that
+already had the column would therefore hold exactly the widened state:
+
+- ridge regressions (LinTS/LinUCB): A gains l2_lambda on the new diagonal
+  entries and zeros elsewhere, A^-1 gains 1/l2_lambda, Xty and beta gain zeros
+- clusters: KMeans centers gain zero coordinates
+- neighborhood policies: stored historical contexts gain zero columns
+
+Widening costs O(new columns) per arm instead of a refit over all history.
+"""
+
+import numpy as np
+from mabwiser.clusters import _Clusters
+from mabwiser.linear import _Linear
+from mabwiser.neighbors import _Neighbors
+
+
+def _pad_columns(matrix, extra_columns):
+    return np.hstack([matrix, np.zeros((matrix.shape[0], extra_columns), dtype=matrix.dtype)])
+
+
+def widen_ridge(regression, extra_columns):
+    """Append zero-information features to one arm's ridge regression"""
+    if regression.A is None:
+        return  # Not initialized yet; init() will use the new width
+    width = regression.A.shape[0]
+    new_width = width + extra_columns
+
+    A = regression.l2_lambda * np.identity(new_width)
+    A[:width, :width] = regression.A
+    A_inv = np.identity(new_width) / regression.l2_lambda
+    A_inv[:width, :width] = regression.A_inv
+    regression.A, regression.A_inv = A, A_inv
+    regression.Xty = np.concatenate([regression.Xty, np.zeros(extra_columns)])
+    regression.beta = np.concatenate([regression.beta, np.zeros(extra_columns)])
+
+    if regression.scaler is not None and hasattr(regression.scaler, 'scale_'):
+        # Zero-valued columns: mean 0, and unit scale as fix_small_variance would set
+        scaler = regression.scaler
+        scaler.mean_ = np.concatenate([scaler.mean_, np.zeros(extra_columns)])
+        scaler.var_ = np.concatenate([scaler.var_, np.zeros(extra_columns)])
+        scaler.scale_ = np.concatenate([scaler.scale_, np.ones(extra_columns)])
+        scaler.n_features_in_ = new_width
+
+
+def _widen_learning_policy(policy, extra_columns):
+    if isinstance(policy, _Linear):
+        if policy.num_features is not None:
+            policy.num_features += extra_columns
+        for regression in policy.arm_to_model.values():
+            widen_ridge(regression, extra_columns)
+    # Non-contextual policies (EpsilonGreedy, UCB1, ...) hold no per-feature state
+
+
+def widen_model(model, extra_columns):
+    """Widen a fitted MAB in place for extra_columns appended context columns"""
+    if extra_columns <= 0:
+        return
+    implementation = model._imp
+
+    if isinstance(implementation, _Clusters):
+        kmeans = implementation.kmeans
+        if hasattr(kmeans, 'cluster_centers_'):
+            kmeans.cluster_centers_ = _pad_columns(kmeans.cluster_centers_, extra_columns)
+            kmeans.n_features_in_ = kmeans.cluster_centers_.shape[1]
+        if implementation.contexts is not None:
+            implementation.contexts = _pad_columns(implementation.contexts, extra_columns)
+        for policy in implementation.lp_list:
+            _widen_learning_policy(policy, extra_columns)
+    elif isinstance(implementation, _Neighbors) and not hasattr(implementation, 'table_to_plane'):
+        # Radius / KNearest refit their policy from the stored neighbors on every prediction
+        if implementation.contexts is not None:
+            implementation.contexts = _pad_columns(implementation.contexts, extra_columns)
+        _widen_learning_policy(implementation.lp, extra_columns)
+    elif isinstance(implementation, _Linear):
+        _widen_learning_policy(implementation, extra_columns)
+    elif hasattr(implementation, 'lp') or hasattr(implementation, 'arm_to_tree'):
+        # LSH tables and decision trees cannot be widened without refitting
+        raise ValueError(f"{type(implementation).__name__} bandits cannot be widened in place")
+
+
+def widen_models(models, extra_columns):
+    """Widen every fitted model in a name -> MAB dict"""
+    for model in models.values():
+        widen_model(model, extra_columns)
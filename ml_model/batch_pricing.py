@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Offline batch pricing for Full Circle Exchange.
+
+Reprices a full device inventory without going through HTTP: loads the same
+feature pipeline and bandit models as the API (or a saved checkpoint), reads
+devices in chunks, fans the chunks out over a process pool and writes the
+recommendation for every device to a Parquet file.
+
+Input columns follow the API payload: Model, Battery, Screen_Damage,
+Backglass_Damage, market, inventory_level, new_model_imminent (and an
+optional device_id). A malformed row does not stop the run: its output row
+carries the reason in the error column, as /score_devices_stream does.
+
+Usage:
+    python batch_pricing.py inventory.csv priced_inventory.parquet --workers 4
+"""
+
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import price_recommendation_app as pricing
+
+OUTPUT_COLUMNS = [
+    'device_id', 'Model', 'market', 'recommended_tier', 'pricing_strategy',
+    'recommended_price_eur', 'target_acquisition_cost_eur', 'best_market',
+    'best_market_tier', 'best_market_price_eur', 'best_market_net_profit_eur', 'error'
+]
+
+
+NUMERIC_FIELDS = {'Battery', 'Screen_Damage', 'Backglass_Damage'}
+
+
+def read_device_chunks(input_path, chunk_size):
+    """Yield DataFrames of at most chunk_size devices from a CSV or Parquet file"""
+    if input_path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(input_path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(input_path, chunksize=chunk_size)
+
+
+def parse_number(value):
+    """A numeric CSV field read as text (its column held a malformed value) back as a number, if it is one"""
+    if not isinstance(value, str):
+        return value
+    try:
+        number = float(value)
+    except ValueError:
+        return value  # Left as is, so only this row fails to price
+    return int(number) if number.is_integer() else number
+
+
+def chunk_to_devices(chunk):
+    """Convert a chunk to API-style device dicts, leaving missing values to the API defaults"""
+    devices = []
+    for record in chunk.to_dict('records'):
+        device_info = {
+            key: value.item() if isinstance(value, np.generic) else value
+            for key, value in record.items()
+            if not (isinstance(value, float) and np.isnan(value))
+        }
+        for key in NUMERIC_FIELDS.intersection(device_info):
+            device_info[key] = parse_number(device_info[key])
+        devices.append(device_info)
+    return devices
+
+
+def _init_worker(checkpoint):
+    """Install the parent's fitted models and data directory in this worker process"""
+    pricing.models = checkpoint['models']
+    pricing.pipeline = checkpoint['pipeline']
+    pricing.feature_names = checkpoint['feature_names']
+    # Unseen categories make sync_pipeline look for appended slots in --data-dir
+    pricing.models_data_dir = checkpoint['data_dir']
+    pricing.pipeline_mtime = checkpoint['pipeline_mtime']
+
+
+def score_chunk(devices, model_name, first_row):
+    """Price one chunk of devices for their own market and across all markets"""
+    recommendations = pricing.score_devices_isolating_errors(devices, model_name, 'recommend')
+    market_analyses = pricing.score_devices_isolating_errors(devices, model_name, 'optimize')
+
+    rows = []
+    for offset, (device_info, recommendation, analysis) in enumerate(zip(devices, recommendations, market_analyses)):
+        row = {
+            'device_id': str(device_info.get('device_id', first_row + offset)),
+            'Model': str(device_info.get('Model', 'iPhone 11')),
+            'market': str(device_info.get('market', 'poland'))
+        }
+        error = recommendation.get('error') or analysis.get('error')
+        if error:
+            rows.append({**row, 'error': error})
+            continue
+        best_option = analysis['best_option']
+        rows.append({
+            **row,
+            'recommended_tier': recommendation['recommended_tier'],
+            'pricing_strategy': recommendation['pricing_strategy'],
+            'recommended_price_eur': recommendation['recommended_price_eur'],
+            'target_acquisition_cost_eur': recommendation['target_acquisition_cost']['eur'],
+            'best_market': best_option['market'],
+            'best_market_tier': best_option['recommended_tier'],
+            'best_market_price_eur': best_option['selling_price_eur'],
+            'best_market_net_profit_eur': best_option['net_profit_eur'],
+            'error': None
+        })
+    return pd.DataFrame(rows, columns=OUTPUT_COLUMNS)
+
+
+def load_pricing_state(data_dir, checkpoint_path):
+    """Load fitted models from a checkpoint, or fit them from the ETL artifacts"""
+    current_version = pricing.read_data_version(data_dir)
+    needs_fit = True
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        pricing.load_models_checkpoint(checkpoint_path)
+        # A checkpoint is reused while the ETL manifest version is unchanged, and
+        # updated in place when the ETL only appended rows and category slots
+        needs_fit = pricing.data_version != current_version
+        if needs_fit:
+            print(f"Checkpoint was fitted on data version {pricing.data_version}, "
+                  f"current is {current_version}")
+            needs_fit = not pricing.update_models_in_place(data_dir)
+            if needs_fit:
+                print("Feature scaling or column layout changed - refitting")
+            elif checkpoint_path:
+                pricing.save_models_checkpoint(checkpoint_path)
+
+    if needs_fit:
+        if not pricing.initialize_models(data_dir):
+            raise SystemExit("Required ML files not found. Please run ETL first.")
+        if checkpoint_path:
+            pricing.save_models_checkpoint(checkpoint_path)
+            print(f"Saved model checkpoint to {checkpoint_path}")
+
+    pipeline_path = os.path.join(data_dir, 'feature_pipeline.joblib')
+    return {
+        'models': pricing.models,
+        'pipeline': pricing.pipeline,
+        'feature_names': pricing.feature_names,
+        'data_dir': data_dir,
+        # The loaded pipeline is the one on disk (checkpoints are brought up to date above)
+        'pipeline_mtime': os.path.getmtime(pipeline_path) if os.path.exists(pipeline_path) else None
+    }
+
+
+def run_batch_pricing(input_path, output_path, model_name='LinTS', data_dir='data',
+                      checkpoint_path=None, chunk_size=5000, workers=None):
+    """Price every device in input_path and write the results to a Parquet file"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    # Explicit types, so chunks whose rows all failed (or all succeeded) write the same schema
+    string_columns = {'device_id', 'Model', 'market', 'pricing_strategy', 'best_market', 'error'}
+    output_schema = pa.schema([(column, pa.string() if column in string_columns else pa.float64())
+                               for column in OUTPUT_COLUMNS])
+
+    checkpoint = load_pricing_state(data_dir, checkpoint_path)
+    if model_name not in checkpoint['models']:
+        raise SystemExit(f"Model {model_name} not available")
+
+    workers = workers or os.cpu_count() or 1
+    max_pending = workers * 2  # Bounded read-ahead keeps memory flat
+    start_time = time.time()
+    total_rows = 0
+    error_rows = 0
+    writer = None
+    pending = deque()
+
+    def write_result(result):
+        nonlocal writer, total_rows, error_rows
+        table = pa.Table.from_pandas(result, schema=output_schema, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(output_path, table.schema)
+        writer.write_table(table)
+        total_rows += len(result)
+        error_rows += int(result['error'].notna().sum())
+        elapsed = time.time() - start_time
+        print(f"  {total_rows:,} devices priced ({total_rows / elapsed:,.0f} rows/s)")
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(checkpoint,)) as executor:
+            first_row = 0
+            for chunk in read_device_chunks(input_path, chunk_size):
+                devices = chunk_to_devices(chunk)
+                pending.append(executor.submit(score_chunk, devices, model_name, first_row))
+                first_row += len(devices)
+                # Results are written in input order as soon as the oldest chunk finishes
+                while len(pending) >= max_pending:
+                    write_result(pending.popleft().result())
+            while pending:
+                write_result(pending.popleft().result())
+    finally:
+        if writer is not None:
+            writer.close()
+
+    elapsed = time.time() - start_time
+    rows_per_second = total_rows / elapsed if elapsed > 0 else 0
+    print(f"✅ Priced {total_rows:,} devices in {elapsed:.1f}s ({rows_per_second:,.0f} rows/s) -> {output_path}")
+    if error_rows:
+        print(f"⚠️ {error_rows:,} devices could not be priced - see the error column")
+    return {'rows': total_rows, 'errors': error_rows, 'seconds': elapsed, 'rows_per_second': rows_per_second}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline batch pricing of a device inventory")
+    parser.add_argument('input_path', help="CSV or Parquet file of devices")
+    parser.add_argument('output_path', help="Parquet file to write recommendations to")
+    parser.add_argument('--model', default='LinTS', choices=['LinTS', 'LinUCB', 'EpsilonGreedy'])
+    parser.add_argument('--data-dir', default='data', help="Directory with the ETL artifacts")
+    parser.add_argument('--checkpoint', help="Model checkpoint to load (created from the ETL artifacts if missing)")
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    run_batch_pricing(
+        args.input_path, args.output_path, model_name=args.model, data_dir=args.data_dir,
+        checkpoint_path=args.checkpoint, chunk_size=args.chunk_size, workers=args.workers
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+"""
+Compact storage for pending pricing decisions.
+
+Every open quote waits in memory until its outcome is reported. Instead of a
+dict per decision holding a float64 context, the full request payload and ISO
+timestamp strings, decisions live in preallocated column arrays indexed by
+slot: contexts in a float32 arena, timestamps as integer epoch milliseconds and
+categorical inputs as integer codes over known vocabularies (anything else
+shares one fallback code, so codes cannot overflow and arbitrary request
+strings are never kept). The decision id itself carries
+the slot number plus a random per-slot token, so lookups need no id -> slot
+dictionary and stale or forged ids are rejected.
+"""
+
+import secrets
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import numpy as np
+
+INVENTORY_LEVELS = ['low', 'decent', 'high']
+MARKETS = ['romania', 'bulgaria', 'greece', 'poland', 'finland']
+DEVICE_MODELS = [
+    'iPhone X', 'iPhone XR', 'iPhone XS', 'iPhone XS Max',
+    'iPhone 11', 'iPhone 11 Pro', 'iPhone 11 Pro Max',
+    'iPhone 12', 'iPhone 12 Mini', 'iPhone 12 Pro', 'iPhone 12 Pro Max',
+    'iPhone 13', 'iPhone 13 Mini', 'iPhone 13 Pro', 'iPhone 13 Pro Max',
+    'iPhone 14', 'iPhone 14 Plus', 'iPhone 14 Pro', 'iPhone 14 Pro Max',
+    'iPhone 15', 'iPhone 15 Plus', 'iPhone 15 Pro', 'iPhone 15 Pro Max'
+]
+UNKNOWN = 'other'  # Shared by every value outside a vocabulary (once it is full)
+# Device models released after DEVICE_MODELS may still be added, up to this many
+MAX_NEW_DEVICE_MODELS = 256
+
+SLOT_MASK = (1 << 48) - 1  # Low 48 bits of the decision id hold the slot
+
+
+def normalize_name(value):
+    return str(value).strip().lower()
+
+
+class Interner:
+    """
+    Two-way mapping between repeated values (model names, markets, tiers) and small integer codes.
+
+    With a fallback, at most max_new values beyond the initial ones get codes of
+    their own; later unseen values all map to the fallback's code. key decides
+    which spellings count as the same value (the first one seen is decoded).
+    """
+
+    def __init__(self, values=(), fallback=None, max_new=None, key=None):
+        self.codes = {}
+        self.values = []
+        self.key = key or (lambda value: value)
+        for value in values:
+            self._add(value)
+        self.fallback_code = self._add(fallback) if fallback is not None else None
+        self.max_codes = len(self.values) + max_new if max_new is not None else None
+
+    def _add(self, value):
+        code = len(self.values)
+        self.codes[self.key(value)] = code
+        self.values.append(value)
+        return code
+
+    def encode(self, value):
+        code = self.codes.get(self.key(value))
+        if code is None:
+            if self.max_codes is not None and len(self.values) >= self.max_codes:
+                return self.fallback_code
+            code = self._add(value)
+        return code
+
+    def decode(self, code):
+        return self.values[code]
+
+
+class PendingDecisionStore:
+    """Slot-indexed store of open decisions with a preallocated float32 context arena"""
+
+    # Per-slot columns besides the context arena
+    COLUMNS = {
+        'token': np.uint64,  # 0 marks a free slot
+        'tier_code': np.int8,
+        'model_code': np.int8,
+        'created_at_ms': np.int64,
+        'device_model_code': np.int32,
+        'market_code': np.int16,
+        'inventory_code': np.int8,
+        'battery': np.float32,
+        'screen_damage': np.uint8,
+        'backglass_damage': np.uint8,
+        'new_model_imminent': np.bool_,
+        'is_multimarket': np.bool_,
+        'estimated_market_value_eur': np.float32,
+        'selling_price_eur': np.float32,
+        'acquisition_cost_eur': np.float32
+    }
+
+    def __init__(self, initial_capacity=4096, context_width=None):
+        self.capacity = initial_capacity
+        self.context_width = context_width
+        self.contexts = None
+        self.columns = {name: np.zeros(initial_capacity, dtype=dtype) for name, dtype in self.COLUMNS.items()}
+        if context_width is not None:
+            self.contexts = np.zeros((initial_capacity, context_width), dtype=np.float32)
+
+        self.pending = 0
+        self.free_slots = []
+        self.next_slot = 0
+
+        self.tiers = Interner()
+        self.model_names = Interner()
+        self.device_models = Interner(DEVICE_MODELS, fallback=UNKNOWN, max_new=MAX_NEW_DEVICE_MODELS,
+                                      key=normalize_name)
+        self.markets = Interner(MARKETS, fallback=UNKNOWN, max_new=0, key=normalize_name)
+        self.inventory_levels = Interner(INVENTORY_LEVELS, fallback=UNKNOWN, max_new=0, key=normalize_name)
+        self._lock = threading.Lock()
+
+    def _find_slot(self, decision_id):
+        """Slot of an open decision, or None if the id is unknown, stale or malformed"""
+        try:
+            decision_int = uuid.UUID(str(decision_id)).int
+        except ValueError:
+            return None
+        slot = decision_int & SLOT_MASK
+        token = decision_int >> 64
+        if slot >= self.next_slot or token == 0 or int(self.columns['token'][slot]) != token:
+            return None
+        return slot
+
+    def _grow(self):
+        """Double the capacity of the arena and every column"""
+        new_capacity = self.capacity * 2
+        for name, column in self.columns.items():
+            grown = np.zeros(new_capacity, dtype=column.dtype)
+            grown[:self.capacity] = column
+            self.columns[name] = grown
+        if self.contexts is not None:
+            grown = np.zeros((new_capacity, self.context_width), dtype=np.float32)
+            grown[:self.capacity] = self.contexts
+            self.contexts = grown
+        self.capacity = new_capacity
+
+    def widen(self, context_width):
+        """Append zero columns to every stored context (after the category vocabulary grew)"""
+        with self._lock:
+            if self.contexts is None or context_width <= self.context_width:
+                return
+            widened = np.zeros((self.capacity, context_width), dtype=np.float32)
+            widened[:, :self.context_width] = self.contexts
+            self.contexts = widened
+            self.context_width = context_width
+
+    def _allocate_slot(self):
+        if self.free_slots:
+            return self.free_slots.pop()
+        if self.next_slot >= self.capacity:
+            self._grow()
+        slot = self.next_slot
+        self.next_slot += 1
+        return slot
+
+    def add(self, context, recommended_tier, model_name, input_data, market=None,
+            estimated_market_value_eur=np.nan, selling_price_eur=np.nan, acquisition_cost_eur=np.nan,
+            is_multimarket=False):
+        """Record an open decision awaiting its outcome and return its decision id"""
+        context = np.asarray(context, dtype=np.float32).reshape(-1)
+
+        with self._lock:
+            if self.contexts is None:
+                self.context_width = len(context)
+                self.contexts = np.zeros((self.capacity, self.context_width), dtype=np.float32)
+            elif len(context) != self.context_width:
+                raise ValueError(f"Context width {len(context)} does not match store width {self.context_width}")
+
+            slot = self._allocate_slot()
+            self.contexts[slot] = context
+
+            columns = self.columns
+            columns['tier_code'][slot] = self.tiers.encode(float(recommended_tier))
+            columns['model_code'][slot] = self.model_names.encode(model_name)
+            columns['created_at_ms'][slot] = int(time.time() * 1000)
+            columns['device_model_code'][slot] = self.device_models.encode(
+                str(input_data.get('Model', 'iPhone 11')).strip())
+            columns['market_code'][slot] = self.markets.encode(market or input_data.get('market', 'poland'))
+            columns['inventory_code'][slot] = self.inventory_levels.encode(input_data.get('inventory_level', 'decent'))
+            columns['battery'][slot] = float(input_data.get('Battery', 95))
+            # Damage flags are 0/1; anything else would wrap around in uint8
+            columns['screen_damage'][slot] = min(max(int(input_data.get('Screen_Damage', 0)), 0), 1)
+            columns['backglass_damage'][slot] = min(max(int(input_data.get('Backglass_Damage', 0)), 0), 1)
+            columns['new_model_imminent'][slot] = bool(input_data.get('new_model_imminent', False))
+            columns['is_multimarket'][slot] = is_multimarket
+            columns['estimated_market_value_eur'][slot] = estimated_market_value_eur
+            columns['selling_price_eur'][slot] = selling_price_eur
+            columns['acquisition_cost_eur'][slot] = acquisition_cost_eur
+
+            # Random token in the high half of a version 4 UUID, slot in the low bits
+            decision_uuid = uuid.UUID(int=(secrets.randbits(64) << 64) | slot, version=4)
+            columns['token'][slot] = decision_uuid.int >> 64
+            self.pending += 1
+            return str(decision_uuid)
+
+    def __contains__(self, decision_id):
+        with self._lock:
+            return self._find_slot(decision_id) is not None
+
+    def __len__(self):
+        return self.pending
+
+    def pop(self, decision_id):
+        """Remove an open decision and return it as a dict, or None if it is unknown"""
+        with self._lock:
+            slot = self._find_slot(decision_id)
+            if slot is None:
+                return None
+            columns = self.columns
+            decision = {
+                'context': self.contexts[slot].astype(np.float64).reshape(1, -1),
+                'recommended_tier': self.tiers.decode(columns['tier_code'][slot]),
+                'model': self.model_names.decode(columns['model_code'][slot]),
+                'timestamp': datetime.fromtimestamp(columns['created_at_ms'][slot] / 1000).isoformat(),
+                'is_multimarket': bool(columns['is_multimarket'][slot]),
+                'market': self.markets.decode(columns['market_code'][slot]),
+                'input_data': {
+                    'Model': self.device_models.decode(columns['device_model_code'][slot]),
+                    'market': self.markets.decode(columns['market_code'][slot]),
+                    'inventory_level': self.inventory_levels.decode(columns['inventory_code'][slot]),
+                    'Battery': float(columns['battery'][slot]),
+                    'Screen_Damage': int(columns['screen_damage'][slot]),
+                    'Backglass_Damage': int(columns['backglass_damage'][slot]),
+                    'new_model_imminent': bool(columns['new_model_imminent'][slot])
+                },
+                'estimated_market_value_eur': float(columns['estimated_market_value_eur'][slot]),
+                'selling_price_eur': float(columns['selling_price_eur'][slot]),
+                'acquisition_cost_eur': float(columns['acquisition_cost_eur'][slot])
+            }
+            columns['token'][slot] = 0
+            self.pending -= 1
+            self.free_slots.append(slot)
+            return decision
+
+    def memory_usage(self):
+        """Bytes held by the context arena and slot columns"""
+        with self._lock:
+            arena_bytes = self.contexts.nbytes if self.contexts is not None else 0
+            column_bytes = sum(column.nbytes for column in self.columns.values())
+            return {
+                'pending_decisions': self.pending,
+                'capacity': self.capacity,
+                'context_width': self.context_width,
+                'total_bytes': arena_bytes + column_bytes,
+                'bytes_per_slot': (arena_bytes + column_bytes) // self.capacity
+            }
@@ -0,0 +1,118 @@
+"""
+The one feature pipeline shared by training (ETL) and serving (model service).
+
+A FeaturePipeline turns either analytics rows or API device payloads into
+bandit contexts: it derives the raw features (has_damage_int), places the
+categories in their vocabulary slots and standardizes the numerical features
+with the fitted means and scales. The ETL builds it, uses it to write the ML
+dataset and saves it to feature_pipeline.joblib; the model service loads the
+same object, so both sides run identical transforms.
+
+There are two paths:
+
+- transform(): a DataFrame of raw features -> context matrix, for batches
+- transform_device(): one API payload -> context row without pandas, for
+  the single-request hot path
+
+This module is shared by the ETL and the model service.
+"""
+
+import joblib
+import numpy as np
+import pandas as pd
+
+CATEGORICAL_FEATURES = ['market', 'model']
+NUMERICAL_FEATURES = ['battery_health', 'days_to_sell', 'has_damage_int']
+
+
+class FeaturePipeline:
+    """Vocabulary slots plus fitted standardization, applied the same way to training and serving rows"""
+
+    def __init__(self, vocabulary, scaler, serving_defaults):
+        self.vocabulary = vocabulary
+        self.mean = np.asarray(scaler.mean_, dtype=np.float64)
+        self.scale = np.asarray(scaler.scale_, dtype=np.float64)
+        # Values used when a payload lacks a field; days_to_sell is an outcome, so serving always uses this
+        self.serving_defaults = dict(serving_defaults)
+        self._numerical_columns = [vocabulary._index[(feature, None)] for feature in NUMERICAL_FEATURES]
+
+    @staticmethod
+    def default_serving_values(days_to_sell):
+        """Serving defaults for missing payload fields; days_to_sell should be the training median"""
+        return {
+            'market': 'poland',
+            'model': 'iPhone 11',
+            'battery_health': 95,
+            'days_to_sell': float(days_to_sell)
+        }
+
+    @staticmethod
+    def raw_features(df):
+        """Raw feature columns of analytics rows (market, model, numerical features)"""
+        ml_df = df[CATEGORICAL_FEATURES + ['battery_health', 'days_to_sell']].copy()
+        ml_df['has_damage_int'] = df['has_damage'].astype(int)
+        return ml_df
+
+    def device_features(self, device_info):
+        """Raw feature values of one API payload (Model, market, Battery, damage flags)"""
+        return {
+            # Training markets are lowercase, clients send 'Romania'
+            'market': str(device_info.get('market', self.serving_defaults['market'])).lower(),
+            'model': device_info.get('Model', self.serving_defaults['model']),
+            'battery_health': device_info.get('Battery', self.serving_defaults['battery_health']),
+            'days_to_sell': self.serving_defaults['days_to_sell'],
+            'has_damage_int': int(device_info.get('Screen_Damage', 0) == 1 or device_info.get('Backglass_Damage', 0) == 1)
+        }
+
+    def device_frame(self, devices):
+        """Raw features of many API payloads as a DataFrame"""
+        return pd.DataFrame([self.device_features(device_info) for device_info in devices],
+                            columns=CATEGORICAL_FEATURES + NUMERICAL_FEATURES)
+
+    @property
+    def width(self):
+        return self.vocabulary.width
+
+    def feature_names(self):
+        return self.vocabulary.feature_names()
+
+    def transform(self, ml_df):
+        """Context matrix of a DataFrame of raw features"""
+        numerical = ml_df[NUMERICAL_FEATURES].to_numpy(dtype=np.float64)
+        return self.vocabulary.context_matrix(ml_df, (numerical - self.mean) / self.scale)
+
+    def transform_devices(self, devices):
+        """Context matrix of many API payloads"""
+        return self.transform(self.device_frame(devices))
+
+    def transform_device(self, device_info):
+        """Context row (shape 1 x width) of one API payload, without building a DataFrame"""
+        features = self.device_features(device_info)
+        context = np.zeros((1, self.width), dtype=np.float64)
+        for feature in CATEGORICAL_FEATURES:
+            encoded = self.vocabulary.encode_one(feature, str(features[feature]))
+            if encoded is not None:
+                column, value = encoded
+                context[0, column] += value
+        numerical = np.array([features[feature] for feature in NUMERICAL_FEATURES], dtype=np.float64)
+        context[0, self._numerical_columns] = (numerical - self.mean) / self.scale
+        return context
+
+    def unseen(self, devices):
+        """Categories of these payloads that have no vocabulary slot"""
+        if len(devices) == 1:
+            features = self.device_features(devices[0])
+            return [(feature, str(features[feature])) for feature in CATEGORICAL_FEATURES
+                    if self.vocabulary.encode_one(feature, str(features[feature])) is None]
+        return self.vocabulary.unseen(self.device_frame(devices))
+
+    def same_scaling(self, other):
+        """True if other standardizes the numerical features identically"""
+        return np.array_equal(self.mean, other.mean) and np.array_equal(self.scale, other.scale)
+
+    def save(self, path):
+        joblib.dump(self, path)
+
+    @staticmethod
+    def load(path):
+        return joblib.load(path)
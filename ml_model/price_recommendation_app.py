@@ -1,22 +1,64 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import OneHotEncoder, StandardScaler
 from mabwiser.mab import MAB, LearningPolicy
-import uuid
 import os
+import glob
+import json
+import time
 import joblib
+import sqlite3
+import threading
 from datetime import datetime
+from admission_control import AdmissionController, PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW
+from result_cache import VersionedLRUCache
+from decision_store import PendingDecisionStore
+from pricing_store import open_store
+from category_vocabulary import CategoryVocabulary
+from feature_pipeline import CATEGORICAL_FEATURES, NUMERICAL_FEATURES, FeaturePipeline
+from bandit_growth import widen_models
 
 app = Flask(__name__)
 
+# Admission control: bounded in-flight work per route, fast 503s when saturated
+admission = AdmissionController(
+    global_limit=int(os.getenv('ADMISSION_GLOBAL_LIMIT', 32)),
+    queue_limit=int(os.getenv('ADMISSION_QUEUE_LIMIT', 16)),
+    queue_timeout=float(os.getenv('ADMISSION_QUEUE_TIMEOUT', 0.05)),
+    high_priority_timeout=float(os.getenv('ADMISSION_HIGH_QUEUE_TIMEOUT', 2.0)),
+    retry_after=int(os.getenv('ADMISSION_RETRY_AFTER', 1))
+)
+admission.register('recommend_price', limit=int(os.getenv('ADMISSION_RECOMMEND_LIMIT', 16)), priority=PRIORITY_NORMAL)
+admission.register('optimize_market_and_price', limit=int(os.getenv('ADMISSION_OPTIMIZE_LIMIT', 8)), priority=PRIORITY_NORMAL)
+admission.register('report_outcome', limit=int(os.getenv('ADMISSION_REPORT_LIMIT', 16)), priority=PRIORITY_HIGH)
+admission.register('score_devices_stream', limit=int(os.getenv('ADMISSION_STREAM_LIMIT', 2)), priority=PRIORITY_NORMAL)
+admission.register('price_analysis', limit=int(os.getenv('ADMISSION_ANALYSIS_LIMIT', 8)), priority=PRIORITY_LOW)
+
 # Global variables
 models = {}
-encoder = None
-scaler = None
+pipeline = None  # The ETL's feature pipeline: vocabulary slots plus scaling (see feature_pipeline)
 feature_names = None
-active_decisions = {}
-evaluation_history = []
+data_version = None  # ETL manifest version the models were fitted on
+fitted_rows = 0  # Rows of the ML dataset the models have been fitted on
+models_data_dir = 'data'
+pipeline_mtime = None
+pipeline_lock = threading.Lock()
+unseen_checked_at = {}  # (feature, category) -> when the ETL pipeline was last checked for a slot
+active_decisions = PendingDecisionStore(initial_capacity=int(os.getenv('PENDING_DECISION_CAPACITY', 4096)))
+decision_log = None  # Embedded store (pricing_store.db) that decisions and outcomes (the evaluation history) are logged to
+
+ARMS = [0.9, 1.0, 1.1]
+TARGET_COLUMNS = ['selling_price_eur', 'profit_eur', 'vanilla_profit_eur']  # Non-feature columns of the ML dataset
+# Serving days_to_sell for ETL outputs written before the pipeline carried the training median
+LEGACY_DAYS_TO_SELL = 14
+
+# Streaming scoring: devices per vectorized chunk (bounds memory per request)
+STREAM_CHUNK_SIZE = int(os.getenv('STREAM_CHUNK_SIZE', 256))
+MAX_STREAM_CHUNK_SIZE = 4096
+
+# Categories without a slot re-check the ETL's pipeline file at most this often
+UNSEEN_RECHECK_SECONDS = float(os.getenv('UNSEEN_RECHECK_SECONDS', 30))
+MAX_UNSEEN_CHECKED = 10000
 
 # Currency conversion rates (as of 2024)
 CURRENCY_RATES = {
@@ -113,45 +155,33 @@ class PriceRecommendationEngine:
 
 price_engine = PriceRecommendationEngine()
 
-def enhanced_feature_engineering(df):
-    """Create simplified features focused on Model, Battery, and Condition"""
-    df = df.copy()
-    
-    # Handle missing columns with defaults
-    if 'Months_since_release' not in df.columns:
-        df['Months_since_release'] = 24
-    else:
-        df['Months_since_release'] = df['Months_since_release'].fillna(24)
-    
-    # Simplified interaction features (Storage, RAM, Screen Size removed)
-    df['Battery_Age_interaction'] = df['Battery'] * (100 - df['Months_since_release'])
-    df['Damage_Total'] = df['Backglass_Damage'] + df['Screen_Damage']
-    
-    # Polynomial features (only battery-related)
-    df['Battery_squared'] = df['Battery'] ** 2
-    
-    # Simplified market segmentation based on model instead of storage
-    def get_market_segment(row):
-        model_lower = str(row['Model']).lower()
-        if 'pro max' in model_lower or '15' in model_lower:
-            return 'premium'
-        elif 'pro' in model_lower or '14' in model_lower or '13' in model_lower:
-            return 'high_end'
-        elif '12' in model_lower or '11' in model_lower:
-            return 'mid_range'
-        else:
-            return 'budget'
-    
-    df['Market_Segment'] = df.apply(get_market_segment, axis=1)
-    
-    # Device condition score (simplified)
-    df['Condition_Score'] = (
-        df['Battery'] * 0.5 +
-        (1 - df['Backglass_Damage']) * 25 +
-        (1 - df['Screen_Damage']) * 25
-    )
-    
-    return df
+# Bump when the model base values in estimate_market_price change so cached
+# price analyses are invalidated
+PRICING_CATALOG_VERSION = 1
+
+# Memoized /price_analysis results, keyed on the normalized device spec
+price_analysis_cache = VersionedLRUCache(maxsize=int(os.getenv('PRICE_ANALYSIS_CACHE_SIZE', 10000)))
+
+def pricing_catalog_version():
+    """Fingerprint of the rates and catalog that price analyses depend on"""
+    return hash((
+        PRICING_CATALOG_VERSION,
+        tuple(sorted(CURRENCY_RATES.items())),
+        tuple(price_engine.tier_multipliers),
+        tuple(sorted(price_engine.tier_names.items()))
+    ))
+
+def normalize_device_spec(device_info):
+    """Cache key made of the fields estimate_market_price reads, or None if they are not numeric"""
+    try:
+        return (
+            str(device_info.get('Model', 'iPhone 11')).strip().lower(),
+            float(device_info.get('Battery', 95)),
+            float(device_info.get('Screen_Damage', 0)),
+            float(device_info.get('Backglass_Damage', 0))
+        )
+    except (TypeError, ValueError):
+        return None
 
 def calculate_business_reward(price_tier, base_price, context):
     """Calculate business-oriented reward function with more realistic variability"""
@@ -197,41 +227,144 @@ def calculate_business_reward(price_tier, base_price, context):
     
     return max(0, expected_profit)  # Ensure non-negative
 
-def initialize_models():
+def read_data_version(data_dir='data'):
+    """Version of the ETL outputs in data_dir (from etl_manifest.json), or None"""
+    manifest_path = os.path.join(data_dir, 'etl_manifest.json')
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, 'r') as f:
+        return json.load(f).get('version')
+
+def load_vocabulary(data_dir='data'):
+    """The ETL's category vocabulary, or the layout of its encoder for data written before vocabularies existed"""
+    vocabulary_path = os.path.join(data_dir, 'category_vocabulary.json')
+    if os.path.exists(vocabulary_path):
+        return CategoryVocabulary.load(vocabulary_path)
+    encoder_path = os.path.join(data_dir, 'encoder.joblib')
+    if os.path.exists(encoder_path):
+        return CategoryVocabulary.from_encoder(joblib.load(encoder_path), CATEGORICAL_FEATURES, NUMERICAL_FEATURES)
+    return None
+
+def load_pipeline(data_dir='data'):
+    """The ETL's feature pipeline, or one assembled from its vocabulary and scaler for older outputs"""
+    pipeline_path = os.path.join(data_dir, 'feature_pipeline.joblib')
+    if os.path.exists(pipeline_path):
+        return FeaturePipeline.load(pipeline_path)
+    scaler_path = os.path.join(data_dir, 'scaler.joblib')
+    loaded_vocabulary = load_vocabulary(data_dir)
+    if loaded_vocabulary is None or not os.path.exists(scaler_path):
+        return None
+    return FeaturePipeline(loaded_vocabulary, joblib.load(scaler_path),
+                           FeaturePipeline.default_serving_values(LEGACY_DAYS_TO_SELL))
+
+def load_feature_parts(features_dir, parquet_dir, start_row=0):
+    """
+    Feature columns, contexts and profits from start_row on, read from the
+    ETL's per-run part files (None if there are none). Only parts past
+    start_row are read. Segments written before the vocabulary grew are
+    zero-filled in the appended slots; a single full-width segment stays
+    memory-mapped.
+    """
+    import pyarrow.parquet as pq
+    parts = sorted(name[:-len('.npy')] for name in os.listdir(features_dir) if name.endswith('.npy'))
+    if not parts:
+        return None
+    latest_schema = pq.read_schema(os.path.join(parquet_dir, f'{parts[-1]}.parquet'))
+    feature_columns = [col for col in latest_schema.names if col not in TARGET_COLUMNS]
+    
+    segments, profits = [], []
+    first_row = 0
+    for part in parts:
+        segment = np.load(os.path.join(features_dir, f'{part}.npy'), mmap_mode='r')
+        skip = max(0, start_row - first_row)
+        first_row += len(segment)
+        if skip >= len(segment):
+            continue
+        segments.append(segment[skip:])
+        profit_column = pq.read_table(os.path.join(parquet_dir, f'{part}.parquet'), columns=['profit_eur'])
+        profits.append(profit_column.column('profit_eur').to_numpy()[skip:])
+    
+    if len(segments) == 1 and segments[0].shape[1] == len(feature_columns):
+        return feature_columns, segments[0], profits[0]
+    contexts = np.zeros((sum(len(segment) for segment in segments), len(feature_columns)))
+    row = 0
+    for segment in segments:
+        contexts[row:row + len(segment), :segment.shape[1]] = segment
+        row += len(segment)
+    return feature_columns, contexts, np.concatenate(profits) if profits else np.empty(0)
+
+def read_ml_csv_segments(processed_data_path):
+    """The ML dataset CSV plus its widened segments (.w<width>.csv), zero-filling slots older rows lack"""
+    base, extension = os.path.splitext(processed_data_path)
+    widened = sorted(glob.glob(f'{base}.w*{extension}'), key=lambda path: int(path[len(base) + 2:-len(extension)]))
+    segments = [pd.read_csv(path) for path in [processed_data_path] + widened]
+    columns = segments[-1].columns
+    return pd.concat([segment.reindex(columns=columns, fill_value=0.0) for segment in segments], ignore_index=True)
+
+def load_training_data(data_dir='data', start_row=0):
+    """Contexts and profits of the ML dataset from start_row on (None if it is missing)"""
+    processed_data_path = os.path.join(data_dir, 'processed_ml_data.csv')
+    processed_parquet_path = os.path.join(data_dir, 'processed_ml_data.parquet')
+    features_dir = os.path.join(data_dir, 'ml_features')
+    features_path = os.path.join(data_dir, 'ml_features.npy')  # Single matrix written by older ETL runs
+    
+    if os.path.isdir(features_dir) and os.path.isdir(processed_parquet_path):
+        training_data = load_feature_parts(features_dir, processed_parquet_path, start_row)
+        if training_data is not None:
+            return training_data
+    if os.path.isfile(processed_parquet_path) and os.path.exists(features_path):
+        # Memory-map the feature matrix and read only the reward column
+        import pyarrow.parquet as pq
+        feature_columns = [col for col in pq.read_schema(processed_parquet_path).names if col not in TARGET_COLUMNS]
+        contexts = np.load(features_path, mmap_mode='r')[start_row:]
+        profits = pq.read_table(processed_parquet_path, columns=['profit_eur']).column('profit_eur').to_numpy()[start_row:]
+    elif os.path.exists(processed_data_path):
+        df = read_ml_csv_segments(processed_data_path)
+        # Use the feature columns from the ML dataset (preprocessing already applied)
+        feature_columns = [col for col in df.columns if col not in TARGET_COLUMNS]
+        contexts = df[feature_columns].values[start_row:]
+        profits = df['profit_eur'].values[start_row:]
+    else:
+        return None
+    return feature_columns, contexts, profits
+
+def historical_rewards(profits):
+    """Decisions and LKR rewards used to train the bandits on historical profits"""
+    rewards = []
+    decisions = []
+    
+    for profit in profits:
+        # Use actual profit from dataset as reward, converted to LKR equivalent
+        optimal_tier = np.random.choice(ARMS)
+        reward = profit / CURRENCY_RATES['LKR_TO_EUR']  # Convert to LKR for internal calculations
+        rewards.append(reward)
+        decisions.append(optimal_tier)
+    return decisions, rewards
+
+def initialize_models(data_dir='data'):
     """Initialize bandit models with simplified features"""
-    global models, encoder, scaler, feature_names
+    global models, pipeline, feature_names, data_version, fitted_rows, models_data_dir, pipeline_mtime
     
-    # Load preprocessed encoder and scaler from ETL
-    encoder_path = 'data/encoder.joblib'
-    scaler_path = 'data/scaler.joblib'
-    processed_data_path = 'data/processed_ml_data.csv'
+    # Load the feature pipeline from ETL
+    pipeline_path = os.path.join(data_dir, 'feature_pipeline.joblib')
+    loaded_pipeline = load_pipeline(data_dir)
+    training_data = load_training_data(data_dir)
     
-    if not all(os.path.exists(p) for p in [encoder_path, scaler_path, processed_data_path]):
+    if loaded_pipeline is None or training_data is None:
         print(f"Required ML files not found. Please run ETL first.")
         return False
 
     # Load the ML-ready dataset and artifacts
-    df = pd.read_csv(processed_data_path)
-    encoder = joblib.load(encoder_path)
-    scaler = joblib.load(scaler_path)
-    
-    arms = [0.9, 1.0, 1.1]
-    
-    # Use the feature columns from the ML dataset (preprocessing already applied)
-    feature_columns = [col for col in df.columns if col not in ['selling_price_eur', 'profit_eur', 'vanilla_profit_eur']]
-    contexts = df[feature_columns].values
+    data_version = read_data_version(data_dir)
+    models_data_dir = data_dir
+    pipeline = loaded_pipeline
+    pipeline_mtime = os.path.getmtime(pipeline_path) if os.path.exists(pipeline_path) else None
+    feature_columns, contexts, profits = training_data
     feature_names = feature_columns
+    fitted_rows = len(profits)
 
     # Calculate business-oriented rewards using simplified profit from dataset
-    rewards = []
-    decisions = []
-    
-    for idx, row in df.iterrows():
-        # Use actual profit from dataset as reward, converted to LKR equivalent
-        optimal_tier = np.random.choice(arms)
-        reward = row['profit_eur'] / CURRENCY_RATES['LKR_TO_EUR']  # Convert to LKR for internal calculations
-        rewards.append(reward)
-        decisions.append(optimal_tier)
+    decisions, rewards = historical_rewards(profits)
 
     # Initialize different bandit algorithms with contextual support
     from mabwiser.mab import NeighborhoodPolicy
@@ -245,7 +378,7 @@ def initialize_models():
     for name, policy in algorithms.items():
         # Create contextual bandit model with neighborhood policy for contexts
         model = MAB(
-            arms=arms, 
+            arms=ARMS, 
             learning_policy=policy,
             neighborhood_policy=NeighborhoodPolicy.Clusters(n_clusters=3)
         )
@@ -255,33 +388,154 @@ def initialize_models():
     print(f"Initialized {len(models)} pricing models with EUR conversion.")
     return True
 
+def grow_pipeline(new_pipeline):
+    """Adopt a pipeline with appended vocabulary slots, widening models and pending contexts in place"""
+    global pipeline, feature_names
+    extra_columns = new_pipeline.width - pipeline.width
+    widen_models(models, extra_columns)
+    active_decisions.widen(new_pipeline.width)
+    pipeline = new_pipeline
+    feature_names = new_pipeline.feature_names()
+    print(f"Category vocabulary grew by {extra_columns} columns - models widened in place")
+
+def compatible_pipeline(new_pipeline):
+    """True if the models can serve new_pipeline's contexts (same scaling, slots only appended)"""
+    return new_pipeline.vocabulary.extends(pipeline.vocabulary) and new_pipeline.same_scaling(pipeline)
+
+def sync_pipeline():
+    """Pick up category slots the ETL has appended since the models were loaded"""
+    global pipeline_mtime
+    pipeline_path = os.path.join(models_data_dir, 'feature_pipeline.joblib')
+    if not os.path.exists(pipeline_path):
+        return
+    with pipeline_lock:
+        mtime = os.path.getmtime(pipeline_path)
+        if mtime == pipeline_mtime:
+            return
+        pipeline_mtime = mtime
+        new_pipeline = FeaturePipeline.load(pipeline_path)
+        if not compatible_pipeline(new_pipeline):
+            print("⚠️ ETL feature pipeline was rebuilt (not appended to) - restart the service to refit")
+        elif new_pipeline.width > pipeline.width:
+            grow_pipeline(new_pipeline)
+
+def update_models_in_place(data_dir='data'):
+    """
+    Bring fitted models up to date with the ETL outputs without refitting:
+    widen them for appended category slots and partially fit the appended
+    rows. Returns False when a refit is needed instead (the scaling changed,
+    slots were not just appended, or rows were not just appended).
+    """
+    global pipeline, data_version, fitted_rows
+    new_pipeline = load_pipeline(data_dir)
+    if new_pipeline is None or not compatible_pipeline(new_pipeline):
+        return False
+    training_data = load_training_data(data_dir, start_row=fitted_rows)
+    if training_data is None or training_data[1].shape[1] != new_pipeline.width:
+        return False
+
+    if new_pipeline.width > pipeline.width:
+        grow_pipeline(new_pipeline)
+    else:
+        pipeline = new_pipeline  # Serving defaults may have moved with the new rows
+    _, contexts, profits = training_data
+    if len(profits):
+        decisions, rewards = historical_rewards(profits)
+        for model in models.values():
+            model.partial_fit(decisions=decisions, rewards=rewards, contexts=np.asarray(contexts))
+    fitted_rows += len(profits)
+    data_version = read_data_version(data_dir)
+    print(f"Updated {len(models)} pricing models in place with {len(profits)} new rows")
+    return True
+
+def open_decision_log(data_dir='data'):
+    """Open the embedded store that issued decisions and reported outcomes are logged to"""
+    global decision_log
+    decision_log = open_store(data_dir)
+    print(f"Logging decisions and outcomes to {decision_log.path}")
+
+def log_to_store(method, *args, **kwargs):
+    """Write to the decision log; a failed write is reported but never fails the request"""
+    if decision_log is None:
+        return
+    try:
+        getattr(decision_log, method)(*args, **kwargs)
+    except sqlite3.Error as e:
+        print(f"⚠️ Could not write to {decision_log.path}: {e}")
+
+def read_from_store(method, *args, default=None, **kwargs):
+    """Read from the decision log; returns default without a store or when the read fails"""
+    if decision_log is None:
+        return default
+    try:
+        return getattr(decision_log, method)(*args, **kwargs)
+    except sqlite3.Error as e:
+        print(f"⚠️ Could not read from {decision_log.path}: {e}")
+        return default
+
+def save_models_checkpoint(checkpoint_path):
+    """Persist the fitted models together with the feature pipeline they were fitted with"""
+    joblib.dump({
+        'models': models,
+        'pipeline': pipeline,
+        'feature_names': feature_names,
+        'data_version': data_version,
+        'fitted_rows': fitted_rows
+    }, checkpoint_path)
+
+def load_models_checkpoint(checkpoint_path):
+    """Restore fitted models and their feature pipeline from a checkpoint"""
+    global models, pipeline, feature_names, data_version, fitted_rows
+    checkpoint = joblib.load(checkpoint_path)
+    models = checkpoint['models']
+    pipeline = checkpoint.get('pipeline')
+    if pipeline is None:
+        # Checkpoints written before the pipeline existed hold the vocabulary (or encoder) and scaler
+        checkpoint_vocabulary = checkpoint.get('vocabulary')
+        if checkpoint_vocabulary is None:
+            checkpoint_vocabulary = CategoryVocabulary.from_encoder(checkpoint['encoder'], CATEGORICAL_FEATURES,
+                                                                    NUMERICAL_FEATURES)
+        pipeline = FeaturePipeline(checkpoint_vocabulary, checkpoint['scaler'],
+                                   FeaturePipeline.default_serving_values(LEGACY_DAYS_TO_SELL))
+    feature_names = checkpoint['feature_names']
+    data_version = checkpoint.get('data_version')
+    fitted_rows = checkpoint.get('fitted_rows', 0)
+    print(f"Loaded {len(models)} pricing models from checkpoint {checkpoint_path}")
+
+def unseen_due_for_check(unseen):
+    """True if any of these slotless categories has not been looked up in the last UNSEEN_RECHECK_SECONDS"""
+    now = time.monotonic()
+    due = [pair for pair in unseen if now - unseen_checked_at.get(pair, -UNSEEN_RECHECK_SECONDS) >= UNSEEN_RECHECK_SECONDS]
+    if len(unseen_checked_at) + len(due) > MAX_UNSEEN_CHECKED:
+        unseen_checked_at.clear()
+    for pair in due:
+        unseen_checked_at[pair] = now
+    return bool(due)
+
+def prepare_input_contexts(devices):
+    """Prepare contexts for a batch of devices with the ETL's feature pipeline"""
+    # Categories the ETL has added slots for since startup widen the models first;
+    # categories it has no slot for are only looked up again after a while
+    unseen = pipeline.unseen(devices)
+    if unseen and unseen_due_for_check(unseen):
+        sync_pipeline()
+    
+    # A single device skips the DataFrame entirely
+    if len(devices) == 1:
+        return pipeline.transform_device(devices[0])
+    return pipeline.transform_devices(devices)
+
 def prepare_input_context(device_info):
     """Prepare input context for model prediction using the same preprocessing as ETL"""
-    # Create a temporary DataFrame with the input device info
-    temp_df = pd.DataFrame([{
-        'market': device_info.get('market', 'Poland'),  # Default market
-        'model': device_info.get('Model', 'iPhone 11'),
-        'battery_health': device_info.get('Battery', 95),
-        'has_damage': device_info.get('Screen_Damage', 0) == 1 or device_info.get('Backglass_Damage', 0) == 1,
-        'days_to_sell': 14  # Default value for prediction
-    }])
-    
-    # Apply the same preprocessing as in ETL
-    categorical_features = ['market', 'model']
-    numerical_features = ['battery_health', 'days_to_sell']
-    
-    # Convert boolean to int
-    temp_df['has_damage_int'] = temp_df['has_damage'].astype(int)
-    numerical_features.append('has_damage_int')
-    
-    # Use the loaded encoder and scaler
-    encoded_categorical = encoder.transform(temp_df[categorical_features])
-    scaled_numerical = scaler.transform(temp_df[numerical_features])
-    
-    # Combine features
-    context = np.hstack([encoded_categorical, scaled_numerical])
-    
-    return context
+    return prepare_input_contexts([device_info])
+
+def predict_tiers(model_name, contexts):
+    """Predict pricing tiers for a batch of contexts with one model call"""
+    predictions = models[model_name].predict(contexts)
+    # MABWiser returns a scalar for a single context and a list otherwise
+    if len(contexts) == 1:
+        return [predictions]
+    return list(predictions)
 
 def calculate_dynamic_refurbishing_cost(estimated_market_price_lkr, screen_damage, backglass_damage):
     """Calculate dynamic refurbishing costs based on damage level"""
@@ -314,56 +568,28 @@ def calculate_updated_business_reward(selling_price_eur, acquisition_cost_eur, r
     profit = selling_price_eur - total_costs
     return profit
 
-@app.route('/recommend_price', methods=['POST'])
-def recommend():
-    """Enhanced recommendation with new_model_imminent, dynamic costs, and target acquisition price"""
-    data = request.get_json()
-    model_name = data.get('model', 'LinTS')
-    
-    if model_name not in models:
-        return jsonify({'error': f'Model {model_name} not available'}), 400
-    
-    # Extract new features
-    new_model_imminent = data.get('new_model_imminent', False)
-    screen_damage = data.get('Screen_Damage', 0)
-    backglass_damage = data.get('Backglass_Damage', 0)
-    
-    # Prepare input context using simplified preprocessing
-    context = prepare_input_context(data)
-    
-    # Get prediction from selected model
-    recommended_tier = models[model_name].predict(context)
-    
-    # Get market-specific pricing if market is specified
-    selected_market = data.get('market', 'poland')
-    market_profile = None
-    
-    # Find the market profile (case insensitive)
+def find_market_profile(market):
+    """Find the market profile for a market name (case insensitive)"""
     for market_name, profile in MARKET_PROFILES.items():
-        if market_name.lower() == selected_market.lower():
-            market_profile = profile
-            break
-    
-    # Estimate market price for this device with market adjustment
-    estimated_market_price_lkr = price_engine.estimate_market_price(data, market_profile)
-    estimated_market_price_eur = price_engine.convert_lkr_to_eur(estimated_market_price_lkr)
-    
-    # Calculate dynamic refurbishing costs
-    refurbishing_details = calculate_dynamic_refurbishing_cost(
-        estimated_market_price_lkr, screen_damage, backglass_damage
-    )
-    
-    # Calculate target buying price with penalties for risk factors
+        if market_name.lower() == str(market).lower():
+            return profile
+    return None
+
+def calculate_target_buying_percentage(device_info):
+    """Share of market value we should pay for a device, after risk penalties"""
     base_buying_percentage = 0.70  # Start with 70% of market value
     
     # Apply penalties for various risk factors
-    inventory_level = data.get('inventory_level', 'decent')
+    inventory_level = device_info.get('inventory_level', 'decent')
+    new_model_imminent = device_info.get('new_model_imminent', False)
+    screen_damage = device_info.get('Screen_Damage', 0)
+    backglass_damage = device_info.get('Backglass_Damage', 0)
     
     # Damage penalties (reduce buying price for damaged devices)
     damage_penalty = (screen_damage + backglass_damage) * 0.08  # 8% penalty per damage type
     
     # Low battery penalty
-    battery = data.get('Battery', 95)
+    battery = device_info.get('Battery', 95)
     if battery < 80:
         battery_penalty = (80 - battery) * 0.002  # 0.2% penalty per % below 80%
     else:
@@ -386,8 +612,58 @@ def recommend():
     
     # Calculate adjusted buying percentage
     adjusted_percentage = base_buying_percentage - damage_penalty - battery_penalty - inventory_penalty - new_model_penalty
-    adjusted_percentage = max(0.40, min(0.75, adjusted_percentage))  # Clamp between 40%-75%
+    return max(0.40, min(0.75, adjusted_percentage))  # Clamp between 40%-75%
+
+def get_market_segment(model):
+    """Simplified market segment based on the device model"""
+    model_lower = str(model).lower()
+    if 'pro max' in model_lower or '15' in model_lower:
+        return 'premium'
+    elif 'pro' in model_lower or '14' in model_lower or '13' in model_lower:
+        return 'high_end'
+    elif '12' in model_lower or '11' in model_lower:
+        return 'mid_range'
+    else:
+        return 'budget'
+
+def get_market_segments(model_series):
+    """Vectorized get_market_segment for a whole column of models"""
+    model_lower = model_series.astype(str).str.lower()
+    
+    def contains(*patterns):
+        matches = np.zeros(len(model_lower), dtype=bool)
+        for pattern in patterns:
+            matches |= model_lower.str.contains(pattern, regex=False).to_numpy()
+        return matches
+    
+    segments = np.select(
+        [contains('pro max', '15'), contains('pro', '14', '13'), contains('12', '11')],
+        ['premium', 'high_end', 'mid_range'],
+        default='budget'
+    )
+    return pd.Series(segments, index=model_series.index)
+
+def build_price_recommendation(data, model_name, recommended_tier, market_segment=None):
+    """Price a device for its target market once the model has picked a tier (batch callers pass the segment)"""
+    # Extract new features
+    new_model_imminent = data.get('new_model_imminent', False)
+    screen_damage = data.get('Screen_Damage', 0)
+    backglass_damage = data.get('Backglass_Damage', 0)
     
+    # Get market-specific pricing if market is specified
+    market_profile = find_market_profile(data.get('market', 'poland'))
+    
+    # Estimate market price for this device with market adjustment
+    estimated_market_price_lkr = price_engine.estimate_market_price(data, market_profile)
+    estimated_market_price_eur = price_engine.convert_lkr_to_eur(estimated_market_price_lkr)
+    
+    # Calculate dynamic refurbishing costs
+    refurbishing_details = calculate_dynamic_refurbishing_cost(
+        estimated_market_price_lkr, screen_damage, backglass_damage
+    )
+    
+    # Calculate target buying price with penalties for risk factors
+    adjusted_percentage = calculate_target_buying_percentage(data)
     target_buying_price_lkr = estimated_market_price_lkr * adjusted_percentage
     target_buying_price_eur = estimated_market_price_eur * adjusted_percentage
     
@@ -401,15 +677,8 @@ def recommend():
     recommended_option = price_options[recommended_tier]
     
     # Calculate simplified market segment based on model
-    model_lower = str(data.get('Model', 'iPhone 11')).lower()
-    if 'pro max' in model_lower or '15' in model_lower:
-        market_segment = 'premium'
-    elif 'pro' in model_lower or '14' in model_lower or '13' in model_lower:
-        market_segment = 'high_end'
-    elif '12' in model_lower or '11' in model_lower:
-        market_segment = 'mid_range'
-    else:
-        market_segment = 'budget'
+    if market_segment is None:
+        market_segment = get_market_segment(data.get('Model', 'iPhone 11'))
     
     # Calculate condition score
     battery = data.get('Battery', 95)
@@ -422,20 +691,7 @@ def recommend():
         'condition_tier': refurbishing_details['refurbishing_tier']
     }
     
-    decision_id = str(uuid.uuid4())
-    
-    active_decisions[decision_id] = {
-        'context': context,
-        'recommended_tier': recommended_tier,
-        'model': model_name,
-        'timestamp': datetime.now().isoformat(),
-        'input_data': data,
-        'estimated_market_price_lkr': estimated_market_price_lkr,
-        'refurbishing_cost_eur': refurbishing_details['refurbishing_cost_eur']
-    }
-    
-    return jsonify({
-        'decision_id': decision_id,
+    return {
         'recommended_tier': float(recommended_tier),
         'recommended_price_eur': recommended_option['price_eur'],
         'recommended_price_lkr': recommended_option['price_lkr'],
@@ -463,19 +719,131 @@ def recommend():
             'primary_currency': 'EUR',
             'conversion_rate': f"1 LKR = {CURRENCY_RATES['LKR_TO_EUR']} EUR"
         }
-    })
+    }
+
+def build_market_option(device_info, market_name, market_profile, recommended_tier):
+    """Net profit analysis for selling a device in one market at the model's tier"""
+    # Extract device characteristics for cost calculations
+    screen_damage = device_info.get('Screen_Damage', 0)
+    backglass_damage = device_info.get('Backglass_Damage', 0)
+    
+    # Calculate market-adjusted price using the price index
+    base_estimated_price_lkr = price_engine.estimate_market_price(device_info)
+    market_adjusted_price_lkr = price_engine.estimate_market_price(device_info, market_profile)
+    
+    # Calculate final selling price with tier adjustment
+    price_options = price_engine.calculate_recommended_prices(
+        market_adjusted_price_lkr, recommended_tier
+    )
+    recommended_option = price_options[recommended_tier]
+    final_selling_price_eur = recommended_option['price_eur']
+    
+    # Calculate all costs using same logic as single market
+    # 1. Target acquisition cost with same penalty logic as single market
+    base_estimated_price_eur = base_estimated_price_lkr * CURRENCY_RATES['LKR_TO_EUR']
+    adjusted_percentage = calculate_target_buying_percentage(device_info)
+    acquisition_cost_eur = base_estimated_price_eur * adjusted_percentage
+    
+    # 2. Dynamic refurbishing costs
+    refurbishing_details = calculate_dynamic_refurbishing_cost(
+        market_adjusted_price_lkr, screen_damage, backglass_damage
+    )
+    refurbishing_cost_eur = refurbishing_details['refurbishing_cost_eur']
+    
+    # 3. Market-specific logistics cost
+    logistics_cost_eur = market_profile['logistics_cost_eur']
+    
+    # 4. Operational costs (10% of selling price)
+    operational_cost_eur = final_selling_price_eur * 0.10
+    
+    # Calculate net profit
+    total_costs = acquisition_cost_eur + refurbishing_cost_eur + logistics_cost_eur + operational_cost_eur
+    net_profit_eur = final_selling_price_eur - total_costs
+    
+    return {
+        'market': market_name,
+        'market_identity': market_profile['identity'],
+        'price_index': market_profile['price_index'],
+        'recommended_tier': float(recommended_tier),
+        'pricing_strategy': recommended_option['strategy'],
+        'selling_price_eur': final_selling_price_eur,
+        'net_profit_eur': round(net_profit_eur, 2),
+        'cost_breakdown': {
+            'acquisition_cost_eur': round(acquisition_cost_eur, 2),
+            'refurbishing_cost_eur': refurbishing_cost_eur,
+            'logistics_cost_eur': logistics_cost_eur,
+            'operational_cost_eur': round(operational_cost_eur, 2),
+            'total_costs_eur': round(total_costs, 2)
+        },
+        'refurbishing_tier': refurbishing_details['refurbishing_tier'],
+        'market_adjusted_price_eur': round(market_adjusted_price_lkr * CURRENCY_RATES['LKR_TO_EUR'], 2)
+    }
+
+def prepare_market_contexts(devices):
+    """Contexts for every device in every market, one row per (device, market)"""
+    market_devices = []
+    for device_info in devices:
+        for market_name in MARKET_PROFILES:
+            market_device_info = device_info.copy()
+            market_device_info['market'] = market_name
+            market_devices.append(market_device_info)
+    return prepare_input_contexts(market_devices)
+
+def rank_markets(device_info, market_tiers):
+    """Market analysis for one device, sorted by net profit (descending)"""
+    market_results = [
+        build_market_option(device_info, market_name, market_profile, recommended_tier)
+        for (market_name, market_profile), recommended_tier in zip(MARKET_PROFILES.items(), market_tiers)
+    ]
+    market_results.sort(key=lambda x: x['net_profit_eur'], reverse=True)
+    return market_results
+
+@app.route('/recommend_price', methods=['POST'])
+@admission.limit('recommend_price')
+def recommend():
+    """Enhanced recommendation with new_model_imminent, dynamic costs, and target acquisition price"""
+    data = request.get_json()
+    model_name = data.get('model', 'LinTS')
+    
+    if model_name not in models:
+        return jsonify({'error': f'Model {model_name} not available'}), 400
+    
+    # Prepare input context using simplified preprocessing
+    context = prepare_input_context(data)
+    
+    # Get prediction from selected model
+    recommended_tier = models[model_name].predict(context)
+    
+    recommendation = build_price_recommendation(data, model_name, recommended_tier)
+    
+    decision_id = active_decisions.add(
+        context, recommended_tier, model_name, data,
+        estimated_market_value_eur=recommendation['estimated_market_value']['eur'],
+        selling_price_eur=recommendation['recommended_price_eur'],
+        acquisition_cost_eur=recommendation['target_acquisition_cost']['eur']
+    )
+    log_to_store(
+        'log_decision', decision_id, model_name, recommended_tier, data,
+        estimated_market_value_eur=recommendation['estimated_market_value']['eur'],
+        selling_price_eur=recommendation['recommended_price_eur'],
+        acquisition_cost_eur=recommendation['target_acquisition_cost']['eur'],
+        data_version=data_version
+    )
+    
+    return jsonify({'decision_id': decision_id, **recommendation})
 
 @app.route('/report_outcome', methods=['POST'])
+@admission.limit('report_outcome')
 def report():
     """Enhanced outcome reporting with evaluation metrics"""
     data = request.get_json()
     decision_id = data.get('decision_id')
     reward = data.get('reward')  # Expected to be in EUR now
     
-    if decision_id not in active_decisions:
+    decision = active_decisions.pop(decision_id)
+    if decision is None:
         return jsonify({'error': 'Decision ID not found'}), 404
     
-    decision = active_decisions.pop(decision_id)
     model_name = decision['model']
     
     # Convert EUR reward to LKR for internal calculations
@@ -488,16 +856,8 @@ def report():
         contexts=decision['context']
     )
     
-    # Store evaluation history
-    evaluation_entry = {
-        'timestamp': datetime.now().isoformat(),
-        'decision_id': decision_id,
-        'model': model_name,
-        'recommended_tier': float(decision['recommended_tier']),
-        'reward_eur': reward,
-        'reward_lkr': reward_lkr
-    }
-    evaluation_history.append(evaluation_entry)
+    # Append to the evaluation history (the store's outcome log)
+    log_to_store('log_outcome', decision_id, reward, reward_lkr)
     
     return jsonify({'status': 'success', 'model_updated': model_name})
 
@@ -507,12 +867,40 @@ def health():
     return jsonify({
         'status': 'healthy',
         'models_loaded': list(models.keys()),
+        'data_version': data_version,
         'currency': 'EUR',
         'total_decisions': len(active_decisions),
-        'evaluation_history_size': len(evaluation_history)
+        'evaluation_history_size': read_from_store('count_outcomes', default=0)
+    })
+
+@app.route('/evaluation_history', methods=['GET'])
+def evaluation_history():
+    """Reported outcomes with their model and tier, optionally between start and end and limited to the latest N"""
+    bounds = {}
+    for name in ('start', 'end'):
+        value = request.args.get(name) or None  # An empty parameter means no bound
+        if value is not None:
+            try:
+                bounds[name] = pd.Timestamp(value)
+            except ValueError:
+                return jsonify({'error': f'Invalid {name} {value!r}, expected a date or ISO timestamp'}), 400
+    evaluations = read_from_store(
+        'load_evaluations', start=bounds.get('start'), end=bounds.get('end'),
+        limit=request.args.get('limit', type=int), default=[]
+    )
+    return jsonify({'evaluations': evaluations, 'count': len(evaluations)})
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Admission control (queue depth, in-flight and shed counts) and cache metrics"""
+    return jsonify({
+        'admission_control': admission.metrics(),
+        'price_analysis_cache': price_analysis_cache.stats(),
+        'pending_decisions': active_decisions.memory_usage()
     })
 
 @app.route('/optimize_market_and_price', methods=['POST'])
+@admission.limit('optimize_market_and_price')
 def optimize_market_and_price():
     """Strategic endpoint to find the most profitable market and pricing combination"""
     device_info = request.get_json()
@@ -521,141 +909,45 @@ def optimize_market_and_price():
     if model_name not in models:
         return jsonify({'error': f'Model {model_name} not available'}), 400
     
-    # Extract device characteristics for cost calculations
-    screen_damage = device_info.get('Screen_Damage', 0)
-    backglass_damage = device_info.get('Backglass_Damage', 0)
-    battery_health = device_info.get('Battery', 95)
+    # Prepare contexts for every market and get the best tier for each in one call
+    contexts = prepare_market_contexts([device_info])
+    market_tiers = predict_tiers(model_name, contexts)
+    market_contexts = dict(zip(MARKET_PROFILES, contexts))
     
-    market_results = []
-    
-    # Loop through each market and analyze profitability
-    for market_name, market_profile in MARKET_PROFILES.items():
-        # Calculate market-adjusted price using the price index
-        base_estimated_price_lkr = price_engine.estimate_market_price(device_info)
-        market_adjusted_price_lkr = price_engine.estimate_market_price(device_info, market_profile)
-        
-        # Prepare context for this market
-        market_device_info = device_info.copy()
-        market_device_info['market'] = market_name
-        context = prepare_input_context(market_device_info)
-        
-        # Get the best tier for this device in this market
-        recommended_tier = models[model_name].predict(context)
-        
-        # Calculate final selling price with tier adjustment
-        price_options = price_engine.calculate_recommended_prices(
-            market_adjusted_price_lkr, recommended_tier
-        )
-        recommended_option = price_options[recommended_tier]
-        final_selling_price_eur = recommended_option['price_eur']
-        
-        # Calculate all costs using same logic as single market
-        # 1. Target acquisition cost with same penalty logic as single market
-        base_estimated_price_eur = base_estimated_price_lkr * CURRENCY_RATES['LKR_TO_EUR']
-        base_buying_percentage = 0.70  # Start with 70% of market value
-        
-        # Apply same penalties as single market
-        inventory_level = device_info.get('inventory_level', 'decent')
-        new_model_imminent = device_info.get('new_model_imminent', False)
-        
-        # Damage penalties (reduce buying price for damaged devices)
-        damage_penalty = (screen_damage + backglass_damage) * 0.08  # 8% penalty per damage type
-        
-        # Low battery penalty
-        if battery_health < 80:
-            battery_penalty = (80 - battery_health) * 0.002  # 0.2% penalty per % below 80%
-        else:
-            battery_penalty = 0
-        
-        # Inventory level adjustments
-        if inventory_level == 'high':
-            inventory_penalty = 0.05  # 5% penalty for high inventory
-        elif inventory_level == 'low':
-            inventory_penalty = -0.02  # 2% bonus for low inventory
-        else:
-            inventory_penalty = 0
-        
-        # New model imminent penalty
-        if new_model_imminent:
-            new_model_penalty = 0.10  # 10% penalty for imminent releases
-        else:
-            new_model_penalty = 0
-        
-        # Calculate adjusted buying percentage (same as single market)
-        adjusted_percentage = base_buying_percentage - damage_penalty - battery_penalty - inventory_penalty - new_model_penalty
-        adjusted_percentage = max(0.40, min(0.75, adjusted_percentage))  # Clamp between 40%-75%
-        
-        acquisition_cost_eur = base_estimated_price_eur * adjusted_percentage
-        
-        # 2. Dynamic refurbishing costs
-        refurbishing_details = calculate_dynamic_refurbishing_cost(
-            market_adjusted_price_lkr, screen_damage, backglass_damage
-        )
-        refurbishing_cost_eur = refurbishing_details['refurbishing_cost_eur']
-        
-        # 3. Market-specific logistics cost
-        logistics_cost_eur = market_profile['logistics_cost_eur']
-        
-        # 4. Operational costs (10% of selling price)
-        operational_cost_eur = final_selling_price_eur * 0.10
-        
-        # Calculate net profit
-        total_costs = acquisition_cost_eur + refurbishing_cost_eur + logistics_cost_eur + operational_cost_eur
-        net_profit_eur = final_selling_price_eur - total_costs
-        
-        # Store results for this market
-        market_result = {
-            'market': market_name,
-            'market_identity': market_profile['identity'],
-            'price_index': market_profile['price_index'],
-            'recommended_tier': float(recommended_tier),
-            'pricing_strategy': recommended_option['strategy'],
-            'selling_price_eur': final_selling_price_eur,
-            'net_profit_eur': round(net_profit_eur, 2),
-            'cost_breakdown': {
-                'acquisition_cost_eur': round(acquisition_cost_eur, 2),
-                'refurbishing_cost_eur': refurbishing_cost_eur,
-                'logistics_cost_eur': logistics_cost_eur,
-                'operational_cost_eur': round(operational_cost_eur, 2),
-                'total_costs_eur': round(total_costs, 2)
-            },
-            'refurbishing_tier': refurbishing_details['refurbishing_tier'],
-            'market_adjusted_price_eur': round(market_adjusted_price_lkr * CURRENCY_RATES['LKR_TO_EUR'], 2)
-        }
-        
-        market_results.append(market_result)
-    
-    # Sort markets by net profit (descending)
-    market_results.sort(key=lambda x: x['net_profit_eur'], reverse=True)
+    # Analyze profitability in each market, sorted by net profit (descending)
+    market_results = rank_markets(device_info, market_tiers)
     
     # Get the best option
     best_option = market_results[0] if market_results else None
     
-    # Generate decision_id for the best option to enable feedback
-    decision_id = str(uuid.uuid4())
+    decision_id = None
     
     if best_option:
-        # Store decision for feedback (using the best market's context)
-        best_market_device_info = device_info.copy()
-        best_market_device_info['market'] = best_option['market']
-        best_context = prepare_input_context(best_market_device_info)
+        # Store decision for feedback (using the best market's context); the
+        # store issues the decision_id that enables feedback
+        best_context = market_contexts[best_option['market']]
         
-        active_decisions[decision_id] = {
-            'context': best_context,
-            'recommended_tier': best_option['recommended_tier'],
-            'model': model_name,
-            'timestamp': datetime.now().isoformat(),
-            'input_data': device_info,
-            'is_multimarket': True,
-            'best_market': best_option['market'],
-            'selling_price_eur': best_option['selling_price_eur'],
-            'acquisition_cost_eur': best_option['cost_breakdown']['acquisition_cost_eur']
-        }
+        decision_id = active_decisions.add(
+            best_context, best_option['recommended_tier'], model_name, device_info,
+            market=best_option['market'],
+            estimated_market_value_eur=best_option['market_adjusted_price_eur'],
+            selling_price_eur=best_option['selling_price_eur'],
+            acquisition_cost_eur=best_option['cost_breakdown']['acquisition_cost_eur'],
+            is_multimarket=True
+        )
+        log_to_store(
+            'log_decision', decision_id, model_name, best_option['recommended_tier'], device_info,
+            market=best_option['market'],
+            estimated_market_value_eur=best_option['market_adjusted_price_eur'],
+            selling_price_eur=best_option['selling_price_eur'],
+            acquisition_cost_eur=best_option['cost_breakdown']['acquisition_cost_eur'],
+            data_version=data_version
+        )
         # Add decision_id to best_option
         best_option['decision_id'] = decision_id
     
     return jsonify({
-        'decision_id': decision_id if best_option else None,
+        'decision_id': decision_id,
         'device_info': device_info,
         'analysis_timestamp': datetime.now().isoformat(),
         'best_option': best_option,
@@ -675,36 +967,134 @@ def optimize_market_and_price():
         }
     })
 
+def score_device_chunk(devices, model_name, mode):
+    """Score a chunk of devices with one vectorized context build and predict call"""
+    if mode == 'optimize':
+        contexts = prepare_market_contexts(devices)
+        tiers = predict_tiers(model_name, contexts)
+        n_markets = len(MARKET_PROFILES)
+        results = []
+        for i, device_info in enumerate(devices):
+            market_results = rank_markets(device_info, tiers[i * n_markets:(i + 1) * n_markets])
+            results.append({
+                'best_option': market_results[0],
+                'market_analysis': market_results
+            })
+        return results
+    
+    tiers = predict_tiers(model_name, prepare_input_contexts(devices))
+    segments = get_market_segments(pd.Series([device_info.get('Model', 'iPhone 11') for device_info in devices]))
+    return [
+        build_price_recommendation(device_info, model_name, tier, segment)
+        for device_info, tier, segment in zip(devices, tiers, segments)
+    ]
+
+def score_devices_isolating_errors(devices, model_name, mode):
+    """
+    score_device_chunk, but if the chunk fails (e.g. a badly typed field) the
+    devices are scored one by one and each bad one gets {'error': ...} in place
+    """
+    try:
+        return score_device_chunk(devices, model_name, mode)
+    except Exception as e:
+        if len(devices) == 1:
+            return [{'error': f'Invalid device record: {e}'}]
+    return [score_devices_isolating_errors([device_info], model_name, mode)[0] for device_info in devices]
+
+@app.route('/score_devices_stream', methods=['POST'])
+@admission.limit('score_devices_stream')
+def score_devices_stream():
+    """
+    Stream prices for newline-delimited JSON devices (one device per line).
+    
+    Devices are scored in fixed-size chunks and results are streamed back as
+    NDJSON in input order, so memory stays constant regardless of file size.
+    Use ?mode=optimize for multi-market analysis and ?model= to pick the bandit.
+    Bulk results are not tracked for outcome reporting (no decision_id).
+    """
+    model_name = request.args.get('model', 'LinTS')
+    mode = request.args.get('mode', 'recommend')
+    chunk_size = request.args.get('chunk_size', STREAM_CHUNK_SIZE, type=int)
+    
+    if model_name not in models:
+        return jsonify({'error': f'Model {model_name} not available'}), 400
+    if mode not in ('recommend', 'optimize'):
+        return jsonify({'error': f'Unknown mode {mode}, use recommend or optimize'}), 400
+    chunk_size = max(1, min(chunk_size, MAX_STREAM_CHUNK_SIZE))
+    
+    def flush(chunk):
+        if not chunk:
+            return
+        results = score_devices_isolating_errors([device_info for _, device_info in chunk], model_name, mode)
+        for (line_number, device_info), result in zip(chunk, results):
+            result['line'] = line_number
+            if 'device_id' in device_info:
+                result['device_id'] = device_info['device_id']
+            yield json.dumps(result) + '\n'
+    
+    def generate():
+        chunk = []
+        for line_number, raw_line in enumerate(request.stream, start=1):
+            raw_line = raw_line.strip()
+            if not raw_line:
+                continue
+            try:
+                device_info = json.loads(raw_line)
+                if not isinstance(device_info, dict):
+                    raise ValueError('expected a JSON object per line')
+            except ValueError as e:
+                # Report bad lines in place and keep streaming the rest of the file
+                yield from flush(chunk)
+                chunk = []
+                yield json.dumps({'line': line_number, 'error': f'Invalid device record: {e}'}) + '\n'
+                continue
+            chunk.append((line_number, device_info))
+            if len(chunk) >= chunk_size:
+                yield from flush(chunk)
+                chunk = []
+        yield from flush(chunk)
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @app.route('/price_analysis', methods=['POST'])
+@admission.limit('price_analysis')
 def price_analysis():
-    """Analyze pricing for a device across all tiers"""
+    """Analyze pricing for a device across all tiers (memoized on the normalized spec)"""
     data = request.get_json()
     
-    # Estimate market price
-    estimated_market_price_lkr = price_engine.estimate_market_price(data)
-    
-    # Get all pricing options
-    price_options = {}
-    for tier in [0.9, 1.0, 1.1]:
-        prices = price_engine.calculate_recommended_prices(estimated_market_price_lkr, tier)
-        price_options.update(prices)
+    cache_key = normalize_device_spec(data)
+    catalog_version = pricing_catalog_version()
+    analysis = price_analysis_cache.get(cache_key, catalog_version) if cache_key else None
     
-    return jsonify({
-        'device_specs': data,
-        'estimated_market_value': {
-            'eur': price_engine.convert_lkr_to_eur(estimated_market_price_lkr),
-            'lkr': estimated_market_price_lkr
-        },
-        'pricing_analysis': price_options,
-        'currency_info': {
-            'primary_currency': 'EUR',
-            'conversion_rate': f"1 LKR = {CURRENCY_RATES['LKR_TO_EUR']} EUR"
+    if analysis is None:
+        # Estimate market price
+        estimated_market_price_lkr = price_engine.estimate_market_price(data)
+        
+        # One call already prices every tier; the 'recommended' flag matches the
+        # previous per-tier loop, whose last (1.1) pass used to win
+        price_options = price_engine.calculate_recommended_prices(
+            estimated_market_price_lkr, price_engine.tier_multipliers[-1]
+        )
+        
+        analysis = {
+            'estimated_market_value': {
+                'eur': price_engine.convert_lkr_to_eur(estimated_market_price_lkr),
+                'lkr': estimated_market_price_lkr
+            },
+            'pricing_analysis': price_options,
+            'currency_info': {
+                'primary_currency': 'EUR',
+                'conversion_rate': f"1 LKR = {CURRENCY_RATES['LKR_TO_EUR']} EUR"
+            }
         }
-    })
+        if cache_key:
+            price_analysis_cache.put(cache_key, catalog_version, analysis)
+    
+    return jsonify({'device_specs': data, **analysis})
 
 if __name__ == '__main__':
-    import time
     while not initialize_models():
         print("Waiting for data...")
         time.sleep(5)
-    app.run(host='0.0.0.0', port=5002)  # Different port to avoid conflicts
+    open_decision_log()
+    app.run(host='0.0.0.0', port=5002, threaded=True)  # Different port to avoid conflicts
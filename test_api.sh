@@ -61,9 +61,26 @@ curl -s -X POST \
   http://localhost:5002/report_outcome | jq '.'
 echo ""
 
+# Test 6: Admission Control Metrics (GET request)
+echo "6️⃣ Testing Admission Control Metrics (GET /metrics):"
+curl -s -X GET http://localhost:5002/metrics | jq '.admission_control.total_shed, .admission_control.queue_depth'
+echo ""
+
+# Test 7: Streaming NDJSON Scoring (POST request)
+echo "7️⃣ Testing Streaming Scoring (POST /score_devices_stream):"
+printf '%s\n' \
+  '{"device_id": "A1", "Model": "iPhone 13 Pro", "Battery": 95, "market": "poland"}' \
+  '{"device_id": "A2", "Model": "iPhone 12", "Battery": 78, "Screen_Damage": 1, "market": "greece"}' | \
+curl -s -X POST \
+  -H "Content-Type: application/x-ndjson" \
+  --data-binary @- \
+  "http://localhost:5002/score_devices_stream?mode=recommend" | jq -c '{device_id, recommended_price_eur}'
+echo ""
+
 echo "✅ API Testing Complete!"
 echo ""
 echo "💡 Notes:"
-echo "- Only /health supports GET requests"
+echo "- Only /health and /metrics support GET requests"
+echo "- Saturated endpoints answer 503 with a Retry-After header"
 echo "- All other endpoints require POST with JSON data"
 echo "- Use the Streamlit UI at http://localhost:8502 for interactive testing"
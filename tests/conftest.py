@@ -0,0 +1,94 @@
+"""Shared fixtures: small generated ETL sources, ETL runs in a scratch copy and a fitted model service"""
+
+import os
+import shutil
+import subprocess
+import sys
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from data_simulator import generate_transactions_vectorized  # noqa: E402
+
+SOURCE_ROWS = 1500
+PRICE_ROWS = 200
+END_DATE = datetime(2025, 6, 30)
+
+
+def synthetic_sales(num_records, seed=7, end_date=END_DATE):
+    """Transactions in the layout of data/synthetic_sales_data.csv"""
+    return generate_transactions_vectorized(num_records, np.random.default_rng(seed), end_date)
+
+
+def iphone_prices(num_records, seed=7):
+    """Historical price records in the layout of data/iphone_price_data.csv"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Model': rng.choice(['iPhone X', 'iPhone 11', 'iPhone 12 Pro', 'iPhone 13 Pro Max'], num_records),
+        'current_price(LKR)': rng.integers(20000, 160000, num_records),
+        'battery_health': rng.integers(70, 101, num_records),
+        'backglass_damages': rng.integers(0, 2, num_records),
+        'screen_damages': rng.choice(['undamaged', 'minor', 'major'], num_records)
+    })
+
+
+def run_etl(work_dir, *args):
+    """Run the scratch copy's etl_task.py with args; returns its output"""
+    result = subprocess.run([sys.executable, os.path.join(work_dir, 'etl_worker', 'etl_task.py'), *args],
+                            cwd=work_dir, capture_output=True, text=True)
+    assert result.returncode == 0, result.stdout + result.stderr
+    return result.stdout
+
+
+def make_etl_workdir(work_dir):
+    """Scratch checkout with the ETL code and freshly generated sources under work_dir/data"""
+    shutil.copytree(os.path.join(ROOT, 'etl_worker'), os.path.join(work_dir, 'etl_worker'),
+                    ignore=shutil.ignore_patterns('__pycache__'))
+    data_dir = os.path.join(work_dir, 'data')
+    os.makedirs(data_dir)
+    synthetic_sales(SOURCE_ROWS).to_csv(os.path.join(data_dir, 'synthetic_sales_data.csv'), index=False)
+    iphone_prices(PRICE_ROWS).to_csv(os.path.join(data_dir, 'iphone_price_data.csv'), index=False)
+    return str(work_dir)
+
+
+@pytest.fixture
+def etl_workdir(tmp_path):
+    """A scratch ETL checkout whose data/ holds only the generated sources"""
+    return make_etl_workdir(tmp_path)
+
+
+@pytest.fixture(scope='session')
+def etl_data_dir(tmp_path_factory):
+    """data/ of one full ETL run over the generated sources, shared by the model service tests"""
+    work_dir = make_etl_workdir(tmp_path_factory.mktemp('etl'))
+    run_etl(work_dir)
+    return os.path.join(work_dir, 'data')
+
+
+@pytest.fixture(scope='session')
+def pricing_app(etl_data_dir):
+    """The model service module with its bandits fitted on etl_data_dir"""
+    sys.path.insert(0, os.path.join(ROOT, 'ml_model'))
+    import price_recommendation_app
+    assert price_recommendation_app.initialize_models(etl_data_dir)
+    return price_recommendation_app
+
+
+@pytest.fixture
+def dashboard_data(etl_workdir, monkeypatch):
+    """The dashboard's analytics_data module reading etl_workdir/data (run the ETL there first)"""
+    sys.path.insert(0, os.path.join(ROOT, 'ui_app'))
+    import analytics_data
+    monkeypatch.setattr(analytics_data, 'data_path', lambda filename: os.path.join(etl_workdir, 'data', filename))
+    monkeypatch.setattr(analytics_data, 'DATA_VERSION_TTL', 0)
+    monkeypatch.setattr(analytics_data, '_store', None)
+    analytics_data.data_cache.clear()
+    yield analytics_data
+    if analytics_data._store is not None:
+        analytics_data._store.close()
+    analytics_data.data_cache.clear()
@@ -0,0 +1,115 @@
+"""Admission control under saturation: pricing requests are shed before outcome reports"""
+
+import os
+import sys
+import threading
+import time
+
+from flask import Flask
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'ml_model'))
+
+from admission_control import AdmissionController, PRIORITY_HIGH, PRIORITY_NORMAL  # noqa: E402
+
+
+def saturated_service(work_seconds):
+    """A small Flask app with one slow pricing route and one slower outcome route behind admission control"""
+    app = Flask(__name__)
+    admission = AdmissionController(global_limit=4, queue_limit=8, queue_timeout=0.01, high_priority_timeout=2.0)
+    admission.register('recommend_price', limit=4, priority=PRIORITY_NORMAL)
+    admission.register('report_outcome', limit=2, priority=PRIORITY_HIGH)
+
+    @app.route('/recommend_price', methods=['POST'])
+    @admission.limit('recommend_price')
+    def recommend():
+        time.sleep(work_seconds)
+        return {'status': 'ok'}
+
+    @app.route('/report_outcome', methods=['POST'])
+    @admission.limit('report_outcome')
+    def report():
+        time.sleep(work_seconds * 2)  # Model updates are slower than price lookups
+        return {'status': 'success'}
+
+    return app, admission
+
+
+def fire(app, path, count, statuses):
+    def send():
+        response = app.test_client().post(path, json={})
+        with lock:
+            statuses.append(response.status_code)
+
+    lock = threading.Lock()
+    threads = [threading.Thread(target=send) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def test_outcomes_admitted_while_pricing_is_shed():
+    app, admission = saturated_service(work_seconds=0.05)
+    price_statuses, outcome_statuses = [], []
+
+    # Saturate the service with pricing traffic, then report outcomes into it
+    threads = fire(app, '/recommend_price', 40, price_statuses)
+    time.sleep(0.01)
+    threads += fire(app, '/report_outcome', 4, outcome_statuses)
+    threads += fire(app, '/recommend_price', 40, price_statuses)
+    for thread in threads:
+        thread.join()
+
+    assert outcome_statuses == [200] * 4
+    assert 503 in price_statuses
+    routes = admission.metrics()['routes']
+    assert routes['report_outcome']['shed'] == 0
+    assert routes['recommend_price']['shed'] == price_statuses.count(503)
+
+
+def test_normal_priority_never_uses_reserved_queue_slots():
+    admission = AdmissionController(global_limit=1, queue_limit=4, queue_timeout=0.2, high_priority_timeout=0.2)
+    admission.register('recommend_price', limit=1, priority=PRIORITY_NORMAL)
+    admission.register('report_outcome', limit=1, priority=PRIORITY_HIGH)
+    assert admission.try_acquire('report_outcome')
+
+    # Two normal waiters fill the unreserved half of the queue; a third is shed at once
+    results = []
+    waiters = [threading.Thread(target=lambda: results.append(admission.try_acquire('recommend_price')))
+               for _ in range(2)]
+    for waiter in waiters:
+        waiter.start()
+    time.sleep(0.05)
+    assert admission.try_acquire('recommend_price') is False
+
+    # The reserved half still takes outcomes, which get the freed slot first
+    outcome = []
+    outcome_waiter = threading.Thread(target=lambda: outcome.append(admission.try_acquire('report_outcome')))
+    outcome_waiter.start()
+    time.sleep(0.05)
+    admission.release('report_outcome')
+    outcome_waiter.join()
+    for waiter in waiters:
+        waiter.join()
+
+    assert outcome == [True]
+    assert results == [False, False]
+
+
+def test_pricing_admitted_while_outcomes_wait_on_their_route_limit():
+    admission = AdmissionController(global_limit=8, queue_limit=4, queue_timeout=0.01, high_priority_timeout=1.0)
+    admission.register('recommend_price', limit=4, priority=PRIORITY_NORMAL)
+    admission.register('report_outcome', limit=1, priority=PRIORITY_HIGH)
+    assert admission.try_acquire('report_outcome')
+
+    # A second outcome waits on report_outcome's own limit while global slots are free
+    outcome = []
+    outcome_waiter = threading.Thread(target=lambda: outcome.append(admission.try_acquire('report_outcome')))
+    outcome_waiter.start()
+    time.sleep(0.05)
+    assert admission.metrics()['high_priority_queue_depth'] == 1
+    assert admission.try_acquire('recommend_price')
+    assert admission.routes['recommend_price']['shed'] == 0
+
+    admission.release('report_outcome')
+    outcome_waiter.join()
+    assert outcome == [True]
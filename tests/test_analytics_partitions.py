@@ -0,0 +1,56 @@
+"""Partitioned analytics store: year/month/market layout and filtered reads that match the CSV"""
+
+import os
+
+import pandas as pd
+
+from conftest import END_DATE, run_etl, synthetic_sales
+
+START, END = pd.Timestamp('2024-11-15'), pd.Timestamp('2025-03-10')
+MARKETS = ['poland', 'greece']
+
+
+def read_csv(work_dir):
+    return pd.read_csv(os.path.join(work_dir, 'data', 'analytics_data.csv'), parse_dates=['date'])
+
+
+def expected_rows(df, columns):
+    selected = df[(df['date'] >= START) & (df['date'] <= END) & df['market'].isin(MARKETS)]
+    return selected[columns].sort_values(columns).reset_index(drop=True)
+
+
+def test_partitions_follow_year_month_market(etl_workdir):
+    run_etl(etl_workdir)
+    dataset_path = os.path.join(etl_workdir, 'data', 'analytics_partitioned')
+    partitions = {
+        os.path.relpath(root, dataset_path): len(files)
+        for root, _, files in os.walk(dataset_path) if any(name.endswith('.parquet') for name in files)
+    }
+    csv = read_csv(etl_workdir)
+    expected = {f'year={date.year}/month={date.month}/market={market}'
+                for date, market in zip(csv['date'], csv['market'])}
+    assert set(partitions) == expected
+
+
+def test_filtered_reads_match_the_csv(etl_workdir, dashboard_data):
+    run_etl(etl_workdir)
+    assert dashboard_data._partitioned_dataset() is not None
+    columns = ['date', 'market', 'model', 'profit_eur']
+    loaded = dashboard_data.load_analytics_data(columns=columns, start_date=START, end_date=END, markets=MARKETS)
+    assert list(loaded.columns) == columns
+    pd.testing.assert_frame_equal(loaded.sort_values(columns).reset_index(drop=True).astype({'market': str}),
+                                  expected_rows(read_csv(etl_workdir), columns), check_dtype=False)
+
+
+def test_incremental_rows_land_in_partitions(etl_workdir, dashboard_data):
+    run_etl(etl_workdir)
+    new_sales = synthetic_sales(40, seed=3, end_date=END_DATE + pd.Timedelta(days=60))
+    new_sales.to_csv(os.path.join(etl_workdir, 'data', 'synthetic_sales_data.csv'), mode='a', header=False,
+                     index=False)
+    run_etl(etl_workdir, '--incremental')
+
+    columns = ['date', 'market', 'selling_price_eur']
+    loaded = dashboard_data.load_analytics_data(columns=columns, start_date=START, end_date=END, markets=MARKETS)
+    pd.testing.assert_frame_equal(loaded.sort_values(columns).reset_index(drop=True).astype({'market': str}),
+                                  expected_rows(read_csv(etl_workdir), columns), check_dtype=False)
+    assert len(dashboard_data.load_analytics_data(columns=['date'])) == len(read_csv(etl_workdir))
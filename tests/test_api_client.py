@@ -0,0 +1,112 @@
+"""Dashboard API client: safe retries of shed calls and per-request failures in post_all"""
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+import requests
+from flask import Flask, jsonify, request
+from werkzeug.serving import make_server
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'ui_app'))
+
+from api_client import ApiClient, CircuitBreaker, split_failures  # noqa: E402
+
+
+@pytest.fixture
+def api():
+    """A local API that sheds the first outcome report, and every /saturated call, with an admission-control 503"""
+    app = Flask(__name__)
+    calls = {'report_outcome': 0}
+
+    @app.route('/report_outcome', methods=['POST'])
+    def report_outcome():
+        calls['report_outcome'] += 1
+        if calls['report_outcome'] == 1:
+            response = jsonify({'error': 'Service saturated, please retry', 'retry_after_seconds': 0})
+            response.status_code = 503
+            response.headers['Retry-After'] = '0'
+            return response
+        return jsonify({'status': 'success'})
+
+    @app.route('/saturated', methods=['POST'])
+    def saturated():
+        response = jsonify({'error': 'Service saturated, please retry', 'retry_after_seconds': 0})
+        response.status_code = 503
+        response.headers['Retry-After'] = '0'
+        return response
+
+    @app.route('/recommend_price', methods=['POST'])
+    def recommend_price():
+        if request.get_json()['model'] == 'Slow':
+            time.sleep(1.0)  # Longer than the client's read timeout
+        return jsonify({'recommended_tier': 1.0})
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}', calls
+    server.shutdown()
+
+
+def test_admission_shed_is_retried_for_non_idempotent_calls(api):
+    base_url, calls = api
+    client = ApiClient(base_url)
+    response = client.post('/report_outcome', {'decision_id': 'x', 'reward': 1.0}, idempotent=False)
+    assert response.status_code == 200
+    assert calls['report_outcome'] == 2
+
+
+def test_post_all_returns_failures_per_key(api):
+    base_url, _ = api
+    client = ApiClient(base_url, max_retries=0, breaker=CircuitBreaker(threshold=100))
+    outcomes = client.post_all('/recommend_price', {
+        model: {'model': model} for model in ['LinTS', 'Slow', 'LinUCB']
+    }, timeout=0.3)
+    responses, failures = split_failures(outcomes)
+    assert sorted(responses) == ['LinTS', 'LinUCB']
+    assert responses['LinTS'].json() == {'recommended_tier': 1.0}
+    assert list(failures) == ['Slow']
+    assert isinstance(failures['Slow'], requests.exceptions.Timeout)
+
+
+def test_admission_sheds_do_not_open_the_breaker(api):
+    base_url, _ = api
+    breaker = CircuitBreaker(threshold=2)
+    client = ApiClient(base_url, max_retries=2, breaker=breaker)
+    for _ in range(3):
+        assert client.post('/saturated', {}).status_code == 503
+    assert breaker.state == 'closed' and breaker.failures == 0
+
+
+def open_breaker():
+    """A breaker that has just opened and lets its trial call through immediately"""
+    breaker = CircuitBreaker(threshold=1, reset_seconds=0)
+    breaker.record_failure()
+    return breaker
+
+
+def test_shed_trial_call_lets_the_next_call_probe(api):
+    base_url, _ = api
+    breaker = open_breaker()
+    client = ApiClient(base_url, max_retries=0, breaker=breaker)
+    assert client.post('/saturated', {}).status_code == 503
+    assert breaker.failures == 1
+    assert client.post('/report_outcome', {'decision_id': 'x', 'reward': 1.0}).status_code == 503
+    assert client.post('/report_outcome', {'decision_id': 'x', 'reward': 1.0}).status_code == 200
+    assert breaker.state == 'closed'
+
+
+@pytest.mark.parametrize('error', [requests.exceptions.InvalidURL, requests.exceptions.ChunkedEncodingError])
+def test_trial_call_errors_do_not_leave_the_breaker_stuck(monkeypatch, error):
+    breaker = open_breaker()
+    client = ApiClient('http://127.0.0.1:9', max_retries=0, breaker=breaker)
+
+    def fail(*args, **kwargs):
+        raise error('trial call failed')
+    monkeypatch.setattr(client.session, 'post', fail)
+    with pytest.raises(error):
+        client.post('/recommend_price', {})
+    assert breaker.allow()
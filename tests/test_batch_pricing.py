@@ -0,0 +1,43 @@
+"""Offline batch pricing: per-row errors and worker state"""
+
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'ml_model'))
+
+
+def test_malformed_rows_are_reported_not_fatal(pricing_app, etl_data_dir, tmp_path):
+    import batch_pricing
+    inventory = pd.DataFrame({
+        'device_id': ['a', 'b', 'c', 'd'],
+        'Model': ['iPhone 12', 'iPhone 13 Pro', 'iPhone 11', 'iPhone 14'],
+        'Battery': ['90', 'ninety', '85', '99'],
+        'Screen_Damage': [0, 1, 0, 0],
+        'Backglass_Damage': [0, 0, 1, 0],
+        'market': ['romania', 'Poland', 'greece', 'finland']
+    })
+    input_path = tmp_path / 'inventory.csv'
+    output_path = tmp_path / 'priced.parquet'
+    inventory.to_csv(input_path, index=False)
+
+    summary = batch_pricing.run_batch_pricing(str(input_path), str(output_path), data_dir=etl_data_dir,
+                                              chunk_size=3, workers=1)
+    priced = pd.read_parquet(output_path)
+    assert summary == {**summary, 'rows': 4, 'errors': 1}
+    assert priced['device_id'].tolist() == ['a', 'b', 'c', 'd']
+    failed = priced.set_index('device_id').loc['b']
+    assert failed['error'].startswith('Invalid device record')
+    assert pd.isna(failed['recommended_price_eur'])
+    assert priced.loc[priced['device_id'] != 'b', 'error'].isna().all()
+    assert (priced.loc[priced['device_id'] != 'b', 'recommended_price_eur'] > 0).all()
+
+
+def test_workers_look_for_pipeline_updates_in_the_data_dir(pricing_app, etl_data_dir):
+    import batch_pricing
+    state = batch_pricing.load_pricing_state(etl_data_dir, None)
+    pricing_app.models_data_dir, pricing_app.pipeline_mtime = 'data', None
+    batch_pricing._init_worker(state)
+    assert pricing_app.models_data_dir == etl_data_dir
+    assert pricing_app.pipeline_mtime == os.path.getmtime(os.path.join(etl_data_dir, 'feature_pipeline.joblib'))
@@ -0,0 +1,80 @@
+"""Pending decision store: add/pop round trip, stale ids, growth and bounded category codes"""
+
+import os
+import sys
+import uuid
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'ml_model'))
+
+from decision_store import MAX_NEW_DEVICE_MODELS, UNKNOWN, PendingDecisionStore  # noqa: E402
+
+DEVICE = {'Model': 'iPhone 13 Pro', 'market': 'Romania', 'inventory_level': 'low', 'Battery': 88,
+          'Screen_Damage': 1, 'Backglass_Damage': 0, 'new_model_imminent': True}
+
+
+def test_add_pop_round_trip():
+    store = PendingDecisionStore(initial_capacity=4)
+    context = np.arange(6, dtype=np.float64) / 7
+    decision_id = store.add(context, 1.1, 'LinTS', DEVICE, selling_price_eur=512.5, is_multimarket=True)
+    assert decision_id in store and len(store) == 1
+
+    decision = store.pop(decision_id)
+    assert np.allclose(decision['context'], context.reshape(1, -1), atol=1e-6)
+    assert (decision['recommended_tier'], decision['model'], decision['market']) == (1.1, 'LinTS', 'romania')
+    assert decision['input_data'] == {**DEVICE, 'market': 'romania', 'Battery': 88.0}
+    assert decision['selling_price_eur'] == 512.5 and decision['is_multimarket']
+    assert len(store) == 0
+
+
+def test_stale_forged_and_malformed_ids_are_rejected():
+    store = PendingDecisionStore(initial_capacity=4)
+    decision_id = store.add(np.zeros(3), 1.0, 'LinTS', DEVICE)
+    assert store.pop(decision_id) is not None
+    assert store.pop(decision_id) is None
+
+    # The freed slot is reused, but only under its new token
+    reused_id = store.add(np.zeros(3), 0.9, 'LinUCB', DEVICE)
+    assert store.pop(decision_id) is None
+    forged_id = str(uuid.UUID(int=uuid.UUID(reused_id).int ^ (1 << 100)))
+    assert store.pop(forged_id) is None
+    assert store.pop('not-a-uuid') is None
+    assert store.pop(reused_id)['model'] == 'LinUCB'
+
+
+def test_store_grows_past_its_initial_capacity():
+    store = PendingDecisionStore(initial_capacity=2)
+    ids = [store.add(np.full(3, i), 1.0, 'LinTS', {**DEVICE, 'Battery': i}) for i in range(9)]
+    assert store.capacity == 16 and len(store) == 9
+    assert [store.pop(decision_id)['input_data']['Battery'] for decision_id in ids] == list(range(9))
+
+
+def round_trip(store, **fields):
+    """Add a decision for DEVICE with fields overridden and pop it straight back"""
+    return store.pop(store.add(np.zeros(3), 1.0, 'LinTS', {**DEVICE, **fields}))
+
+
+def test_unknown_categories_share_one_code():
+    store = PendingDecisionStore(initial_capacity=4)
+    for i in range(40000):  # More markets than an int16 code could count
+        round_trip(store, market=f'market-{i}')
+    assert len(store.markets.values) == 6
+
+    decision = round_trip(store, market='atlantis', inventory_level='huge')
+    assert (decision['market'], decision['input_data']['inventory_level']) == (UNKNOWN, UNKNOWN)
+    assert round_trip(store, market=' POLAND ')['market'] == 'poland'
+
+
+def test_new_device_models_are_bounded():
+    store = PendingDecisionStore(initial_capacity=4)
+    assert round_trip(store, Model='iPhone 16')['input_data']['Model'] == 'iPhone 16'
+    for i in range(MAX_NEW_DEVICE_MODELS + 10):
+        round_trip(store, Model=f'Phone {i}')
+    assert round_trip(store, Model='Phone 9999')['input_data']['Model'] == UNKNOWN
+    assert round_trip(store, Model='iphone 12 pro')['input_data']['Model'] == 'iPhone 12 Pro'
+
+
+def test_damage_flags_are_clamped():
+    decision = round_trip(PendingDecisionStore(initial_capacity=4), Screen_Damage=3, Backglass_Damage=-1)
+    assert (decision['input_data']['Screen_Damage'], decision['input_data']['Backglass_Damage']) == (1, 0)
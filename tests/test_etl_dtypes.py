@@ -0,0 +1,54 @@
+"""Compact dtype plan: planned dtypes end to end, and values within a cent of float64"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+
+from conftest import ROOT, iphone_prices, run_etl, synthetic_sales
+
+sys.path.insert(0, os.path.join(ROOT, 'etl_worker'))
+
+import etl_task  # noqa: E402
+
+
+def assert_planned(df):
+    """Every column covered by the plan has its planned dtype"""
+    covered = [column for column in df.columns if column in etl_task.DTYPE_PLAN]
+    assert {column: str(df[column].dtype) for column in covered} == \
+        {column: etl_task.DTYPE_PLAN[column] for column in covered}
+
+
+def test_transformed_frame_follows_the_plan():
+    sales = synthetic_sales(400)
+    transformed = etl_task.transform_sources({
+        'synthetic_sales_data': etl_task.harmonize_synthetic_data(sales),
+        'iphone_price_data': etl_task.harmonize_original_data(iphone_prices(50))
+    })
+    assert_planned(transformed)
+    assert set(etl_task.DTYPE_PLAN) - set(transformed.columns) == {'has_damage_int'}
+
+    # float32 money keeps cents: compare with the same arithmetic in float64
+    np.testing.assert_allclose(transformed['profit_eur'].head(400), sales['profit_eur'], atol=0.005)
+    expected_vanilla = sales['selling_price_eur'] * 0.85 - sales['acquisition_cost_eur']
+    np.testing.assert_allclose(transformed['vanilla_profit_eur'].head(400), expected_vanilla, atol=0.01)
+
+
+def test_apply_dtype_plan_is_idempotent():
+    planned = etl_task.apply_dtype_plan(etl_task.harmonize_synthetic_data(synthetic_sales(50)))
+    assert etl_task.apply_dtype_plan(planned) is planned
+
+
+def test_outputs_read_back_with_the_plan(etl_workdir):
+    run_etl(etl_workdir)
+    data_dir = os.path.join(etl_workdir, 'data')
+    analytics = etl_task.read_analytics_csv(os.path.join(data_dir, 'analytics_data.csv'))
+    assert_planned(analytics)
+    assert ds.dataset(os.path.join(data_dir, 'analytics_data.parquet')).schema.remove_metadata() \
+        == etl_task.ANALYTICS_SCHEMA
+
+    parquet = pd.read_parquet(os.path.join(data_dir, 'analytics_data.parquet'))
+    np.testing.assert_allclose(parquet['selling_price_eur'], analytics['selling_price_eur'], atol=0.005)
+    assert len(parquet) == len(analytics) == 1700
@@ -0,0 +1,66 @@
+"""ETL manifest: unchanged inputs skip the run, changed inputs or missing outputs rerun it"""
+
+import json
+import os
+import sys
+
+from conftest import ROOT, run_etl, synthetic_sales
+
+sys.path.insert(0, os.path.join(ROOT, 'etl_worker'))
+
+import etl_manifest  # noqa: E402
+
+SKIPPED = 'nothing to do'
+
+
+def read_manifest(work_dir):
+    with open(os.path.join(work_dir, 'data', 'etl_manifest.json')) as f:
+        return json.load(f)
+
+
+def test_unchanged_inputs_are_skipped(etl_workdir):
+    run_etl(etl_workdir)
+    manifest = read_manifest(etl_workdir)
+    analytics_path = os.path.join(etl_workdir, 'data', 'analytics_data.csv')
+    written_at = os.stat(analytics_path).st_mtime_ns
+
+    assert SKIPPED in run_etl(etl_workdir)
+    # Touched but identical inputs hash the same
+    os.utime(os.path.join(etl_workdir, 'data', 'synthetic_sales_data.csv'))
+    assert SKIPPED in run_etl(etl_workdir)
+    assert os.stat(analytics_path).st_mtime_ns == written_at
+    assert read_manifest(etl_workdir)['version'] == manifest['version']
+
+
+def test_changed_input_or_missing_output_reruns(etl_workdir):
+    run_etl(etl_workdir)
+    first = read_manifest(etl_workdir)
+
+    sales_path = os.path.join(etl_workdir, 'data', 'synthetic_sales_data.csv')
+    synthetic_sales(1200, seed=8).to_csv(sales_path, index=False)
+    assert SKIPPED not in run_etl(etl_workdir)
+    second = read_manifest(etl_workdir)
+    assert second['version'] != first['version']
+    assert second['inputs']['synthetic_sales_data']['sha256'] != first['inputs']['synthetic_sales_data']['sha256']
+    assert second['row_counts']['synthetic_sales_data'] == 1200
+
+    os.remove(os.path.join(etl_workdir, 'data', 'scaler.joblib'))
+    assert SKIPPED not in run_etl(etl_workdir)
+    assert os.path.exists(os.path.join(etl_workdir, 'data', 'scaler.joblib'))
+    assert SKIPPED in run_etl(etl_workdir)
+    assert SKIPPED not in run_etl(etl_workdir, '--force')
+
+
+def test_fingerprint_reuses_hashes_of_unmodified_files(tmp_path, monkeypatch):
+    path = tmp_path / 'sales.csv'
+    path.write_text('date,model\n2025-01-01,iPhone 12\n')
+    inputs = {'sales': str(path)}
+    manifest = {'inputs': etl_manifest.input_fingerprint(inputs)}
+
+    hashed = []
+    monkeypatch.setattr(etl_manifest, 'path_sha256', lambda p: hashed.append(p) or 'rehashed')
+    assert etl_manifest.input_fingerprint(inputs, manifest) == manifest['inputs']
+    assert hashed == []
+
+    path.write_text('date,model\n2025-01-02,iPhone 13 Pro\n')
+    assert etl_manifest.input_fingerprint(inputs, manifest)['sales']['sha256'] == 'rehashed'
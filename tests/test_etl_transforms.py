@@ -0,0 +1,87 @@
+"""Vectorized transforms give the same results as the row-wise versions they replaced"""
+
+import itertools
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'ml_model'))
+sys.path.insert(0, os.path.join(ROOT, 'etl_worker'))
+
+import etl_task  # noqa: E402
+import price_recommendation_app as pricing  # noqa: E402
+
+MODELS = [
+    'iPhone 11', 'iPhone 11 Pro', 'iPhone 11 Pro Max', 'iPhone 12', 'iPhone 12 Mini', 'iPhone 12 Pro',
+    'iPhone 12 Pro Max', 'iPhone 13', 'iPhone 13 Mini', 'iPhone 13 Pro', 'iPhone 13 Pro Max',
+    'iPhone 14', 'iPhone 14 Plus', 'iPhone 14 Pro', 'iPhone 14 Pro Max', 'iPhone 15', 'iPhone 15 Pro',
+    'iPhone 15 Pro Max', 'iPhone X', 'iPhone XR', 'IPHONE 13 PRO', 'iPhone SE', None
+]
+MARKETS = ['romania', 'bulgaria', 'greece', 'poland', 'finland']
+PRICING_TIERS = [0.9, 1.0, 1.1]
+
+
+def row_vanilla_profit(row):
+    """The row-wise calculate_vanilla_profit applied with DataFrame.apply before vectorization"""
+    market_rate_multiplier = 1.0
+    baseline_selling_price = row['selling_price_eur'] * market_rate_multiplier
+    baseline_profit = baseline_selling_price - row['acquisition_cost_eur'] - (baseline_selling_price * 0.15)
+    return baseline_profit
+
+
+def row_market_segment(row):
+    """The row-wise market segmentation applied with DataFrame.apply before vectorization"""
+    model_lower = str(row['Model']).lower()
+    if 'pro max' in model_lower or '15' in model_lower:
+        return 'premium'
+    elif 'pro' in model_lower or '14' in model_lower or '13' in model_lower:
+        return 'high_end'
+    elif '12' in model_lower or '11' in model_lower:
+        return 'mid_range'
+    else:
+        return 'budget'
+
+
+@pytest.fixture
+def transactions():
+    """Every model x market x damage x pricing tier combination, with varied prices"""
+    rng = np.random.default_rng(7)
+    rows = list(itertools.product(MODELS, MARKETS, [False, True], PRICING_TIERS))
+    df = pd.DataFrame(rows, columns=['model', 'market', 'has_damage', 'pricing_tier'])
+    base_price = rng.uniform(150, 1200, len(df)).round(2)
+    df['selling_price_eur'] = (base_price * df['pricing_tier'] * np.where(df['has_damage'], 0.85, 1.0)).round(2)
+    df['acquisition_cost_eur'] = (base_price * rng.uniform(0.4, 0.75, len(df))).round(2)
+    return df
+
+
+def test_vanilla_profit_matches_row_wise(transactions):
+    expected = transactions.apply(row_vanilla_profit, axis=1)
+    pd.testing.assert_series_equal(etl_task.calculate_vanilla_profit(transactions), expected, check_names=False)
+
+    baseline = etl_task.add_vanilla_baseline(transactions.copy())
+    np.testing.assert_array_equal(baseline['vanilla_profit_eur'].to_numpy(), expected.to_numpy())
+
+
+def test_vanilla_profit_compact_dtypes_match_row_wise(transactions):
+    """On the ETL's float32 dtype plan the vectorized path stays in float32 (apply upcast rows), so match to a cent fraction"""
+    compact = transactions.astype({'selling_price_eur': 'float32', 'acquisition_cost_eur': 'float32'})
+    expected = compact.apply(row_vanilla_profit, axis=1)
+    np.testing.assert_allclose(etl_task.calculate_vanilla_profit(compact).to_numpy(), expected.to_numpy(), rtol=0, atol=1e-3)
+
+
+def test_market_segments_match_row_wise(transactions):
+    devices = transactions.rename(columns={'model': 'Model'})
+    expected = devices.apply(row_market_segment, axis=1)
+    pd.testing.assert_series_equal(pricing.get_market_segments(devices['Model']), expected, check_names=False)
+    assert set(expected) == {'premium', 'high_end', 'mid_range', 'budget'}
+
+
+def test_market_segments_match_scalar_segment():
+    models = pd.Series(MODELS, index=range(10, 10 + len(MODELS)))
+    segments = pricing.get_market_segments(models)
+    assert segments.index.equals(models.index)
+    assert segments.tolist() == [pricing.get_market_segment(model) for model in MODELS]
@@ -0,0 +1,49 @@
+"""/evaluation_history: outcomes logged to the store, read back by time range"""
+
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'ml_model'))
+
+from pricing_store import open_store  # noqa: E402
+
+DEVICE = {'Model': 'iPhone 12', 'Battery': 90, 'Screen_Damage': 0, 'Backglass_Damage': 0, 'market': 'romania'}
+
+
+@pytest.fixture
+def logging_app(pricing_app, tmp_path, monkeypatch):
+    """The model service logging to a fresh store"""
+    store = open_store(str(tmp_path))
+    monkeypatch.setattr(pricing_app, 'decision_log', store)
+    yield pricing_app
+    store.close()
+
+
+def test_reported_outcomes_are_read_back(logging_app):
+    client = logging_app.app.test_client()
+    decision_ids = []
+    for reward in [10.0, 20.0, 30.0]:
+        decision_id = client.post('/recommend_price', json={**DEVICE, 'model': 'LinTS'}).get_json()['decision_id']
+        assert client.post('/report_outcome', json={'decision_id': decision_id, 'reward': reward}).status_code == 200
+        decision_ids.append(decision_id)
+
+    history = client.get('/evaluation_history').get_json()
+    assert history['count'] == 3
+    assert [evaluation['decision_id'] for evaluation in history['evaluations']] == decision_ids
+    assert {evaluation['model'] for evaluation in history['evaluations']} == {'LinTS'}
+
+    latest = client.get('/evaluation_history', query_string={'limit': 2}).get_json()
+    assert [evaluation['reward_eur'] for evaluation in latest['evaluations']] == [20.0, 30.0]
+    tomorrow = (pd.Timestamp.now() + pd.Timedelta(days=1)).date().isoformat()
+    assert client.get('/evaluation_history', query_string={'start': tomorrow}).get_json()['count'] == 0
+    assert client.get('/evaluation_history', query_string={'start': '', 'end': tomorrow}).get_json()['count'] == 3
+
+
+@pytest.mark.parametrize('params', [{'start': 'garbage'}, {'end': '2025-13-45'}])
+def test_invalid_bounds_are_a_json_400(logging_app, params):
+    response = logging_app.app.test_client().get('/evaluation_history', query_string=params)
+    assert response.status_code == 400
+    assert 'Invalid' in response.get_json()['error']
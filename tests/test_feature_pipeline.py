@@ -0,0 +1,46 @@
+"""Serving payloads reach the same vocabulary slots as the ETL's training rows"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'ml_model'))
+
+from category_vocabulary import CategoryVocabulary  # noqa: E402
+from feature_pipeline import CATEGORICAL_FEATURES, NUMERICAL_FEATURES, FeaturePipeline  # noqa: E402
+
+
+def training_pipeline():
+    """A pipeline fitted on ETL-style rows (lowercase markets)"""
+    rows = pd.DataFrame({
+        'market': ['romania', 'bulgaria', 'poland', 'greece'],
+        'model': ['iPhone 11', 'iPhone 12', 'iPhone 13 Pro', 'iPhone 14'],
+        'battery_health': [90, 85, 97, 80],
+        'days_to_sell': [10, 14, 7, 21],
+        'has_damage_int': [0, 1, 0, 1]
+    })
+    encoder = OneHotEncoder(handle_unknown="ignore", sparse_output=False).fit(rows[CATEGORICAL_FEATURES])
+    scaler = StandardScaler().fit(rows[NUMERICAL_FEATURES])
+    vocabulary = CategoryVocabulary.from_encoder(encoder, CATEGORICAL_FEATURES, NUMERICAL_FEATURES)
+    return FeaturePipeline(vocabulary, scaler, FeaturePipeline.default_serving_values(12))
+
+
+def test_title_case_markets_are_not_unseen():
+    pipeline = training_pipeline()
+    devices = [{'Model': 'iPhone 12', 'market': 'Romania', 'Battery': 88},
+               {'Model': 'iPhone 11', 'market': 'BULGARIA', 'Battery': 92}]
+    assert pipeline.unseen(devices[:1]) == []
+    assert pipeline.unseen(devices) == []
+
+    lowercase = [dict(device, market=device['market'].lower()) for device in devices]
+    np.testing.assert_array_equal(pipeline.transform_device(devices[0]), pipeline.transform_device(lowercase[0]))
+    np.testing.assert_array_equal(pipeline.transform_devices(devices), pipeline.transform_devices(lowercase))
+
+
+def test_default_market_has_a_slot():
+    pipeline = training_pipeline()
+    assert pipeline.unseen([{'Model': 'iPhone 13 Pro'}]) == []
+    assert pipeline.transform_device({'Model': 'iPhone 13 Pro'})[0, :4].sum() == 1.0
@@ -0,0 +1,78 @@
+"""Vectorized feedback generator: same history shape and distributions as the loop version"""
+
+import json
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+import data_simulator
+
+NUM_DECISIONS = 3000
+
+
+@pytest.fixture(scope='module')
+def loop_and_vectorized():
+    data_simulator.np.random.seed(42)
+    data_simulator.random.seed(42)
+    loop = data_simulator.generate_ai_feedback_simulation(NUM_DECISIONS)
+    start_date = datetime.strptime(loop[0]['timestamp'], '%Y-%m-%d %H:%M:%S')
+    vectorized = data_simulator.generate_feedback_vectorized(np.arange(NUM_DECISIONS), NUM_DECISIONS,
+                                                             np.random.default_rng(42), start_date)
+    flat_loop = pd.DataFrame([{**{key: value for key, value in record.items() if key != 'features'},
+                               **record['features']} for record in loop])
+    return flat_loop, vectorized
+
+
+def test_same_records_layout(loop_and_vectorized):
+    loop, vectorized = loop_and_vectorized
+    assert list(vectorized.columns) == list(loop.columns)
+    # Ids and timestamps are deterministic, so they match exactly
+    assert vectorized['decision_id'].tolist() == loop['decision_id'].tolist()
+    assert vectorized['timestamp'].tolist() == loop['timestamp'].tolist()
+
+
+@pytest.mark.parametrize('phase', ['early', 'late'])
+def test_rewards_and_tiers_match_per_learning_phase(loop_and_vectorized, phase):
+    loop, vectorized = loop_and_vectorized
+    # learning_factor = i / 200 is below 0.3 (random tiers, lower rewards) for the first 60 decisions
+    indices = np.arange(60) if phase == 'early' else np.arange(60, NUM_DECISIONS)
+    base_reward_mean = 50 if phase == 'early' else 80
+    expected = np.mean(base_reward_mean * (1 + np.minimum(1.0, indices / 200) * 0.5))
+    for rewards in [loop['reward'].iloc[indices], vectorized['reward'].iloc[indices]]:
+        # Within four standard errors of the mean both generators are drawn from
+        assert abs(rewards.mean() - expected) < 4 * rewards.std() / np.sqrt(len(rewards))
+    if phase == 'late':
+        loop_share = loop['tier'].iloc[indices].value_counts(normalize=True)
+        vectorized_share = vectorized['tier'].iloc[indices].value_counts(normalize=True)
+        assert (loop_share - vectorized_share).abs().max() < 0.04
+
+
+@pytest.mark.parametrize('column', ['sale_outcome', 'Model', 'market', 'inventory_level', 'Backglass_Damage',
+                                    'Screen_Damage', 'new_model_imminent'])
+def test_feature_frequencies_match(loop_and_vectorized, column):
+    loop, vectorized = loop_and_vectorized
+    loop_share = loop[column].value_counts(normalize=True)
+    vectorized_share = vectorized[column].value_counts(normalize=True)
+    assert set(loop_share.index) == set(vectorized_share.index)
+    assert (loop_share - vectorized_share).abs().max() < 0.04
+
+
+def test_streamed_events_in_both_formats(tmp_path):
+    jsonl_path, parquet_path = str(tmp_path / 'events.jsonl'), str(tmp_path / 'events.parquet')
+    total_reward = data_simulator.write_feedback_events(1000, jsonl_path, seed=1, chunk_rows=300)
+    with open(jsonl_path) as f:
+        records = [json.loads(line) for line in f]
+    assert len(records) == 1000
+    assert set(records[0]) == {'timestamp', 'decision_id', 'tier', 'reward', 'sale_outcome', 'features'}
+    assert set(records[0]['features']) == set(data_simulator.FEEDBACK_FEATURES)
+    assert sum(record['reward'] for record in records) == pytest.approx(total_reward)
+
+    data_simulator.write_feedback_events(1000, parquet_path, seed=1, chunk_rows=300)
+    parquet = pq.ParquetFile(parquet_path)
+    assert parquet.metadata.num_row_groups == 4 and parquet.metadata.num_rows == 1000
+    # Same seed and chunking, same events in either format
+    assert parquet.read().to_pandas()['reward'].sum() == pytest.approx(total_reward)
+    assert datetime.now() - datetime.strptime(records[-1]['timestamp'], '%Y-%m-%d %H:%M:%S') < timedelta(days=2)
@@ -0,0 +1,71 @@
+"""Dashboard data cache: invalidation on a new data version, private copies and a memoized version check"""
+
+import json
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'ui_app'))
+
+import analytics_data  # noqa: E402
+from frame_cache import FrameCache  # noqa: E402
+
+
+def counting_loader(cache, version):
+    """A cached loader returning a small frame, and the list its calls are recorded in"""
+    calls = []
+
+    @cache.cached(lambda: version['value'])
+    def load(columns=None):
+        calls.append(columns)
+        return pd.DataFrame({'profit_eur': [1.0, 2.0], 'market': ['poland', 'greece']})
+
+    return load, calls
+
+
+def test_version_change_invalidates_entries():
+    cache = FrameCache(max_bytes=2 ** 20)
+    version = {'value': 'v1'}
+    load, calls = counting_loader(cache, version)
+    load(columns=['profit_eur'])
+    load(columns=['profit_eur'])
+    load(columns=('profit_eur',))  # Lists and tuples are the same key
+    assert len(calls) == 1 and cache.stats()['hits'] == 2
+
+    version['value'] = 'v2'
+    load(columns=['profit_eur'])
+    assert len(calls) == 2
+    assert cache.stats()['version'] == 'v2' and cache.stats()['entries'] == 1
+
+
+def test_callers_cannot_change_cached_values():
+    cache = FrameCache(max_bytes=2 ** 20)
+    load, _ = counting_loader(cache, {'value': 'v1'})
+    first = load()
+    first.loc[0, 'profit_eur'] = -100.0
+    first['extra'] = 1
+    assert load().equals(pd.DataFrame({'profit_eur': [1.0, 2.0], 'market': ['poland', 'greece']}))
+
+    @cache.cached(lambda: 'v1')
+    def summary():
+        return {'transactions': 2, 'markets': ['poland']}
+
+    summary()['markets'].append('greece')
+    assert summary() == {'transactions': 2, 'markets': ['poland']}
+
+
+def test_data_version_is_memoized(tmp_path, monkeypatch):
+    manifest_path = tmp_path / 'etl_manifest.json'
+    manifest_path.write_text(json.dumps({'version': 'v1'}))
+    monkeypatch.setattr(analytics_data, 'data_path', lambda filename: str(tmp_path / filename))
+    monkeypatch.setattr(analytics_data, '_version_checked', (float('-inf'), None, None))
+    monkeypatch.setattr(analytics_data, 'DATA_VERSION_TTL', 60)
+    assert analytics_data.data_version() == 'v1'
+
+    manifest_path.write_text(json.dumps({'version': 'v2'}))
+    os.utime(manifest_path, (1, 1))
+    assert analytics_data.data_version() == 'v1'  # Within the TTL
+
+    monkeypatch.setattr(analytics_data, 'DATA_VERSION_TTL', 0)
+    assert analytics_data.data_version() == 'v2'
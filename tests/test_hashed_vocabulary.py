@@ -0,0 +1,70 @@
+"""Hashed category columns: a fixed context width however many models and markets appear"""
+
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+from conftest import ROOT, run_etl, synthetic_sales
+
+sys.path.insert(0, os.path.join(ROOT, 'ml_model'))
+
+from category_vocabulary import CategoryVocabulary, HashedVocabulary  # noqa: E402
+from feature_pipeline import CATEGORICAL_FEATURES, NUMERICAL_FEATURES, FeaturePipeline  # noqa: E402
+
+HASH_WIDTH = 16
+
+
+def hashed_pipeline():
+    rows = pd.DataFrame({'battery_health': [90, 85, 97, 80], 'days_to_sell': [10, 14, 7, 21],
+                         'has_damage_int': [0, 1, 0, 1]})
+    vocabulary = HashedVocabulary(CATEGORICAL_FEATURES, NUMERICAL_FEATURES, HASH_WIDTH)
+    return FeaturePipeline(vocabulary, StandardScaler().fit(rows), FeaturePipeline.default_serving_values(12))
+
+
+def test_width_is_fixed_for_any_catalog():
+    pipeline = hashed_pipeline()
+    devices = [{'Model': f'Phone {i}', 'market': market, 'Battery': 80 + i % 20}
+               for i in range(500) for market in ['romania', 'atlantis']]
+    assert pipeline.unseen(devices) == []
+    assert pipeline.vocabulary.extend(pd.DataFrame({'model': ['Phone 9999'], 'market': ['mars']})) == []
+
+    contexts = pipeline.transform_devices(devices)
+    assert contexts.shape == (len(devices), HASH_WIDTH + len(NUMERICAL_FEATURES))
+    # One signed unit per categorical feature, in the hashed columns only
+    hashed = contexts[:, :HASH_WIDTH]
+    assert set(np.unique(hashed)) <= {-2.0, -1.0, 0.0, 1.0, 2.0}
+    np.testing.assert_array_equal(np.abs(hashed).sum(axis=1) % 2, 0)
+    np.testing.assert_array_equal(pipeline.transform_device(devices[7]), contexts[7:8])
+
+
+def test_hashes_are_stable_across_instances(tmp_path):
+    first = HashedVocabulary(CATEGORICAL_FEATURES, NUMERICAL_FEATURES, HASH_WIDTH)
+    path = str(tmp_path / 'category_vocabulary.json')
+    first.save(path)
+    loaded = CategoryVocabulary.load(path)
+    assert isinstance(loaded, HashedVocabulary) and loaded.extends(first)
+    for category in ['iPhone 12', 'iPhone 16 Pro', 'romania']:
+        assert loaded.encode_one('model', category) == first.encode_one('model', category)
+    assert not loaded.extends(HashedVocabulary(CATEGORICAL_FEATURES, NUMERICAL_FEATURES, HASH_WIDTH * 2))
+
+
+def test_etl_hashed_mode_keeps_the_width(etl_workdir):
+    run_etl(etl_workdir, '--hash-width', '8')
+    data_dir = os.path.join(etl_workdir, 'data')
+    with open(os.path.join(data_dir, 'category_vocabulary.json')) as f:
+        assert json.load(f)['hash_width'] == 8
+    columns = list(pd.read_csv(os.path.join(data_dir, 'processed_ml_data.csv'), nrows=0).columns)
+    assert columns[:8] == [f'hash_{column}' for column in range(8)]
+
+    # New models in an incremental run still land in the same 8 columns
+    new_sales = synthetic_sales(30, seed=4)
+    new_sales['model'] = 'iPhone 16 Pro'
+    new_sales.to_csv(os.path.join(data_dir, 'synthetic_sales_data.csv'), mode='a', header=False, index=False)
+    run_etl(etl_workdir, '--incremental')
+    ml_df = pd.read_csv(os.path.join(data_dir, 'processed_ml_data.csv'))
+    assert list(ml_df.columns) == columns and len(ml_df) == 1730
+    assert not [name for name in os.listdir(data_dir) if name.startswith('processed_ml_data.w')]
@@ -0,0 +1,46 @@
+"""/price_analysis memoization: repeat specs are served from cache, rate changes invalidate it"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'ml_model'))
+
+from result_cache import VersionedLRUCache  # noqa: E402
+
+DEVICE = {'Model': 'iPhone 12', 'Battery': 90, 'Screen_Damage': 0, 'Backglass_Damage': 0}
+
+
+def analyse(pricing_app, device):
+    response = pricing_app.app.test_client().post('/price_analysis', json=device)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_repeat_specs_hit_the_cache(pricing_app, monkeypatch):
+    monkeypatch.setattr(pricing_app, 'price_analysis_cache', VersionedLRUCache(maxsize=10))
+    first = analyse(pricing_app, DEVICE)
+    second = analyse(pricing_app, {**DEVICE, 'Model': ' iphone 12 ', 'Battery': '90'})
+    stats = pricing_app.price_analysis_cache.stats()
+    assert (stats['misses'], stats['hits'], stats['size']) == (1, 1, 1)
+    assert second['pricing_analysis'] == first['pricing_analysis']
+
+
+def test_rate_change_invalidates_cached_analyses(pricing_app, monkeypatch):
+    monkeypatch.setattr(pricing_app, 'price_analysis_cache', VersionedLRUCache(maxsize=10))
+    before = analyse(pricing_app, DEVICE)
+    monkeypatch.setitem(pricing_app.CURRENCY_RATES, 'LKR_TO_EUR', pricing_app.CURRENCY_RATES['LKR_TO_EUR'] * 2)
+    after = analyse(pricing_app, DEVICE)
+    assert pricing_app.price_analysis_cache.stats()['hits'] == 0
+    assert after['estimated_market_value']['lkr'] == before['estimated_market_value']['lkr']
+    assert after['estimated_market_value']['eur'] > before['estimated_market_value']['eur']
+
+
+def test_lru_evicts_least_recently_used():
+    cache = VersionedLRUCache(maxsize=2)
+    cache.put('a', 1, {'v': 'a'})
+    cache.put('b', 1, {'v': 'b'})
+    assert cache.get('a', 1) == {'v': 'a'}
+    cache.put('c', 1, {'v': 'c'})
+    assert cache.get('b', 1) is None
+    assert cache.get('a', 1) == {'v': 'a'}
+    assert cache.stats()['evictions'] == 1
@@ -0,0 +1,122 @@
+"""Embedded store: transactions as the system of record, queried in SQL"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from conftest import ROOT, run_etl, synthetic_sales
+
+sys.path.insert(0, os.path.join(ROOT, 'etl_worker'))
+
+from analytics_rollups import ROLLUP_DIMENSIONS, rollup_transactions  # noqa: E402
+from pricing_store import PricingStore, open_store  # noqa: E402
+
+
+def analytics_rows(num_records=500, seed=7):
+    df = synthetic_sales(num_records, seed=seed)
+    df['date'] = pd.to_datetime(df['date'])
+    df['revenue_eur'] = df['selling_price_eur']
+    df['vanilla_profit_eur'] = df['selling_price_eur'] * 0.85 - df['acquisition_cost_eur']
+    df['profit_margin'] = df['profit_eur'] / df['selling_price_eur']
+    return df
+
+
+def sorted_rollup(rollup):
+    return rollup.sort_values(ROLLUP_DIMENSIONS).reset_index(drop=True)
+
+
+def test_sql_rollups_and_totals_match_pandas(tmp_path):
+    df = analytics_rows()
+    store = PricingStore(str(tmp_path / 'store.db'))
+    assert store.transactions_updated_at() is None
+    assert store.write_transactions(df) == len(df)
+
+    start, markets = pd.Timestamp('2025-01-01'), ['poland', 'finland']
+    selected = df[(df['date'] >= start) & df['market'].isin(markets)]
+    for freq in ['D', 'M']:
+        queried = store.query_rollup(freq=freq, start_date=start, markets=markets)
+        expected = rollup_transactions(selected, freq=freq)
+        pd.testing.assert_frame_equal(sorted_rollup(queried)[expected.columns], sorted_rollup(expected),
+                                      check_dtype=False, rtol=1e-9)
+
+    totals = store.query_totals(['profit_eur'], start_date=start, markets=markets)
+    assert totals['row_count'] == len(selected)
+    np.testing.assert_allclose(totals['profit_eur_sum'], selected['profit_eur'].sum())
+    np.testing.assert_allclose(totals['profit_eur_mean'], selected['profit_eur'].mean())
+
+    sample = store.sample_transactions(['profit_eur'], 50)
+    assert len(sample) == 50 and sample['profit_eur'].isin(df['profit_eur']).all()
+    store.close()
+
+
+def test_replace_drops_earlier_transactions(tmp_path):
+    store = PricingStore(str(tmp_path / 'store.db'))
+    store.write_transactions(analytics_rows(100))
+    store.write_transactions(analytics_rows(30, seed=8))
+    assert store.query_totals([])['row_count'] == 130
+    store.write_transactions(analytics_rows(40, seed=9), replace=True)
+    assert store.query_totals([])['row_count'] == 40
+    store.close()
+
+
+def test_etl_keeps_the_store_in_step_with_its_outputs(etl_workdir):
+    run_etl(etl_workdir)
+    data_dir = os.path.join(etl_workdir, 'data')
+    analytics = pd.read_csv(os.path.join(data_dir, 'analytics_data.csv'))
+    store = open_store(data_dir, create=False)
+    totals = store.query_totals(['selling_price_eur'])
+    assert totals['row_count'] == len(analytics)
+    np.testing.assert_allclose(totals['selling_price_eur_sum'], analytics['selling_price_eur'].sum(), rtol=1e-6)
+    assert store.transactions_updated_at() >= os.path.getmtime(os.path.join(data_dir, 'analytics_data.csv'))
+    store.close()
+    assert open_store(str(etl_workdir), create=False) is None
+
+
+def feedback_record(decision_id, timestamp, reward=10.0):
+    return {'timestamp': timestamp, 'decision_id': decision_id, 'tier': 1.0, 'reward': reward,
+            'sale_outcome': 1, 'features': {'market': 'poland'}}
+
+
+def test_feedback_is_appended_and_read_by_time_range(tmp_path):
+    store = PricingStore(str(tmp_path / 'store.db'))
+    store.record_feedback([feedback_record(f'd{day}', f'2025-06-{day:02d} 12:00:00') for day in range(1, 11)])
+    # Stored decisions are kept: a replayed or regenerated record does not overwrite them
+    store.record_feedback([feedback_record('d3', '2025-06-03 12:00:00', reward=-1.0),
+                           feedback_record('d11', '2025-06-11 12:00:00')], source='simulator')
+    assert store.count_feedback() == 11
+    assert store.get_feedback('d3')['reward'] == 10.0
+    assert store.get_feedback('d11')['features'] == {'market': 'poland'}
+
+    ids = lambda records: [record['decision_id'] for record in records]  # noqa: E731
+    assert ids(store.load_feedback()) == [f'd{day}' for day in range(1, 12)]
+    assert ids(store.load_feedback(start='2025-06-04', end='2025-06-06 12:00:00')) == ['d4', 'd5', 'd6']
+    assert ids(store.load_feedback(end=pd.Timestamp('2025-06-02 12:00:00'))) == ['d1', 'd2']
+    assert ids(store.load_feedback(limit=3)) == ['d9', 'd10', 'd11']
+    assert ids(store.load_feedback(start='2025-06-02', limit=2)) == ['d10', 'd11']
+    assert store.load_feedback(start='2025-07-01') == []
+    store.close()
+
+
+def test_outcomes_are_read_by_time_range_with_their_decision(tmp_path, monkeypatch):
+    import pricing_store
+    store = PricingStore(str(tmp_path / 'store.db'))
+    clock = iter(pd.date_range('2025-06-01', periods=20, freq='h'))
+    monkeypatch.setattr(pricing_store, '_now', lambda: next(clock).isoformat())
+    for i in range(5):
+        store.log_decision(f'd{i}', 'LinTS', 1.0 + i / 10, {'Model': 'iPhone 12', 'market': 'Poland'})
+    for i in range(5):
+        store.log_outcome(f'd{i}', reward_eur=float(i), reward_lkr=float(i) * 350)
+    # Outcomes are stamped 05:00..09:00; a repeated report replaces the earlier one
+    store.log_outcome('d0', reward_eur=7.0, reward_lkr=2450.0)
+    assert store.count_outcomes() == 5
+
+    evaluations = store.load_evaluations()
+    assert [row['decision_id'] for row in evaluations] == ['d1', 'd2', 'd3', 'd4', 'd0']
+    assert evaluations[-1] == {**evaluations[-1], 'model': 'LinTS', 'recommended_tier': 1.0, 'reward_eur': 7.0}
+    window = store.load_evaluations(start='2025-06-01 06:00', end='2025-06-01 08:00')
+    assert [row['decision_id'] for row in window] == ['d1', 'd2', 'd3']
+    assert [row['decision_id'] for row in store.load_evaluations(limit=2)] == ['d4', 'd0']
+    assert store.load_evaluations(end='2025-06-01 04:59') == []
+    store.close()
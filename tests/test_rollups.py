@@ -0,0 +1,66 @@
+"""Rollup cubes: chunked rollups add up to the whole, and the ETL's tables match the raw rows"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from conftest import END_DATE, ROOT, run_etl, synthetic_sales
+
+sys.path.insert(0, os.path.join(ROOT, 'etl_worker'))
+
+from analytics_rollups import ROLLUP_DIMENSIONS, combine_rollups, rollup_transactions, summarize_rollup  # noqa: E402
+
+
+def sorted_rollup(rollup):
+    return rollup.sort_values(ROLLUP_DIMENSIONS).reset_index(drop=True)
+
+
+def read_data(work_dir, name):
+    path = os.path.join(work_dir, 'data', name)
+    return pd.read_parquet(path) if name.endswith('.parquet') else pd.read_csv(path, parse_dates=['date'])
+
+
+def transactions():
+    df = synthetic_sales(600)
+    df['date'] = pd.to_datetime(df['date'])
+    df['revenue_eur'] = df['selling_price_eur']
+    df['profit_margin'] = df['profit_eur'] / df['selling_price_eur']
+    df['vanilla_profit_eur'] = df['profit_eur'] * 0.9
+    return df
+
+
+def test_chunk_rollups_add_up_to_the_whole():
+    df = transactions()
+    chunks = [rollup_transactions(chunk) for chunk in (df.iloc[start:start + 150] for start in range(0, len(df), 150))]
+    pd.testing.assert_frame_equal(sorted_rollup(combine_rollups(chunks)), sorted_rollup(rollup_transactions(df)))
+    pd.testing.assert_frame_equal(sorted_rollup(combine_rollups(chunks, freq='M')),
+                                  sorted_rollup(rollup_transactions(df, freq='M')))
+
+
+def test_summary_means_match_the_raw_rows():
+    df = transactions()
+    summary = summarize_rollup(rollup_transactions(df), by='market')
+    expected = df.groupby('market')[['profit_eur', 'days_to_sell']].mean()
+    np.testing.assert_allclose(summary['avg_profit_eur'], expected['profit_eur'].loc[summary.index])
+    np.testing.assert_allclose(summary['avg_days_to_sell'], expected['days_to_sell'].loc[summary.index])
+    assert summary['units'].sum() == len(df)
+
+
+def test_etl_rollups_match_the_analytics_rows(etl_workdir):
+    run_etl(etl_workdir)
+    new_sales = synthetic_sales(50, seed=5, end_date=END_DATE + pd.Timedelta(days=45))
+    new_sales.to_csv(os.path.join(etl_workdir, 'data', 'synthetic_sales_data.csv'), mode='a', header=False,
+                     index=False)
+    run_etl(etl_workdir, '--incremental')
+
+    analytics = read_data(etl_workdir, 'analytics_data.csv')
+    daily = read_data(etl_workdir, 'analytics_rollup_daily.parquet')
+    monthly = read_data(etl_workdir, 'analytics_rollup_monthly.parquet')
+    for rollup, freq in [(daily, 'D'), (monthly, 'M')]:
+        pd.testing.assert_frame_equal(sorted_rollup(rollup), sorted_rollup(rollup_transactions(analytics, freq=freq)),
+                                      check_dtype=False, check_categorical=False, rtol=1e-6)
+
+    sample = read_data(etl_workdir, 'analytics_sample.parquet')
+    assert len(sample) == len(analytics)  # Below SAMPLE_ROWS_PER_MONTH, every row is kept
@@ -0,0 +1,48 @@
+"""Streaming NDJSON scoring: results in input order, bad lines reported in place"""
+
+import json
+
+
+def stream(pricing_app, lines, **params):
+    client = pricing_app.app.test_client()
+    response = client.post('/score_devices_stream', query_string=params,
+                           data='\n'.join(lines) + '\n', content_type='application/x-ndjson')
+    assert response.status_code == 200
+    results = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    response.close()  # Streamed responses hold their admission slot until closed
+    return results
+
+
+def device(**fields):
+    return json.dumps({'Model': 'iPhone 12', 'Battery': 90, 'Screen_Damage': 0, 'Backglass_Damage': 0,
+                       'market': 'romania', **fields})
+
+
+def test_results_follow_input_lines(pricing_app):
+    lines = [device(device_id=f'd{i}', Battery=80 + i) for i in range(7)]
+    results = stream(pricing_app, lines, chunk_size=3)
+    assert [result['line'] for result in results] == list(range(1, 8))
+    assert [result['device_id'] for result in results] == [f'd{i}' for i in range(7)]
+    assert all('recommended_price_eur' in result and 'error' not in result for result in results)
+
+
+def test_bad_lines_are_reported_per_line(pricing_app):
+    lines = [
+        device(device_id='ok-1'),
+        '{not json',
+        '[1, 2]',
+        device(device_id='bad-battery', Battery='ninety'),
+        device(device_id='ok-2'),
+    ]
+    results = stream(pricing_app, lines, chunk_size=4)
+    assert [result['line'] for result in results] == [1, 2, 3, 4, 5]
+    assert 'error' not in results[0] and 'error' not in results[4]
+    assert results[1]['error'].startswith('Invalid device record')
+    assert results[2]['error'].startswith('Invalid device record')
+    assert results[3]['error'].startswith('Invalid device record')
+    assert results[3]['device_id'] == 'bad-battery'
+
+
+def test_unknown_mode_is_rejected(pricing_app):
+    response = pricing_app.app.test_client().post('/score_devices_stream?mode=bogus', data=device())
+    assert response.status_code == 400
@@ -0,0 +1,50 @@
+"""Shared feature pipeline: the ETL's saved pipeline rebuilds its training rows, each prepared once"""
+
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from conftest import ROOT, run_etl, synthetic_sales
+
+sys.path.insert(0, os.path.join(ROOT, 'ml_model'))
+
+from feature_pipeline import FeaturePipeline  # noqa: E402
+
+
+def stage_rows(work_dir, stage):
+    with open(os.path.join(work_dir, 'data', 'etl_run_report.jsonl')) as f:
+        report = json.loads(f.readlines()[-1])
+    return sum(entry['rows'] for entry in report['stages'] if entry['stage'].split('/')[-1] == stage)
+
+
+def test_saved_pipeline_reproduces_training_contexts(etl_workdir):
+    run_etl(etl_workdir)
+    data_dir = os.path.join(etl_workdir, 'data')
+    pipeline = FeaturePipeline.load(os.path.join(data_dir, 'feature_pipeline.joblib'))
+    analytics = pd.read_csv(os.path.join(data_dir, 'analytics_data.csv'))
+    ml_df = pd.read_csv(os.path.join(data_dir, 'processed_ml_data.csv'))
+
+    contexts = pipeline.transform(FeaturePipeline.raw_features(analytics))
+    np.testing.assert_allclose(contexts, ml_df[pipeline.feature_names()].to_numpy(), atol=1e-9)
+
+    # A serving payload for a training row gets the same context, apart from days_to_sell (an outcome)
+    row = analytics.iloc[3]
+    device = {'Model': row['model'], 'market': row['market'].title(), 'Battery': int(row['battery_health']),
+              'Screen_Damage': int(row['has_damage'])}
+    served = pipeline.transform_device(device)[0]
+    days_column = pipeline.feature_names().index('days_to_sell')
+    assert np.allclose(np.delete(served, days_column), np.delete(contexts[3], days_column))
+
+
+def test_ml_features_are_prepared_once_per_row(etl_workdir):
+    run_etl(etl_workdir)
+    assert stage_rows(etl_workdir, 'ml_features') == 1700
+
+    new_sales = synthetic_sales(25, seed=6)
+    new_sales.to_csv(os.path.join(etl_workdir, 'data', 'synthetic_sales_data.csv'), mode='a', header=False,
+                     index=False)
+    run_etl(etl_workdir, '--incremental')
+    assert stage_rows(etl_workdir, 'ml_features') == 25
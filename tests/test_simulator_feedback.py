@@ -0,0 +1,60 @@
+"""The simulators append their feedback to the shared store instead of rewriting JSON files"""
+
+import os
+import shutil
+import subprocess
+import sys
+
+from conftest import ROOT
+
+sys.path.insert(0, os.path.join(ROOT, 'etl_worker'))
+
+from pricing_store import open_store  # noqa: E402
+
+
+def checkout(work_dir, *paths):
+    """Scratch copy of the given root files and directories, with an empty data/"""
+    for path in paths:
+        source = os.path.join(ROOT, path)
+        if os.path.isdir(source):
+            shutil.copytree(source, os.path.join(work_dir, path), ignore=shutil.ignore_patterns('__pycache__'))
+        else:
+            shutil.copy(source, work_dir)
+    os.makedirs(os.path.join(work_dir, 'data'))
+    return str(work_dir)
+
+
+def run_python(work_dir, code):
+    result = subprocess.run([sys.executable, '-c', code], cwd=work_dir, capture_output=True, text=True)
+    assert result.returncode == 0, result.stdout + result.stderr
+    return result.stdout
+
+
+def stored_feedback(work_dir):
+    store = open_store(os.path.join(work_dir, 'data'), create=False)
+    assert store is not None
+    try:
+        return store.load_feedback()
+    finally:
+        store.close()
+
+
+def test_data_simulator_appends_feedback_to_the_store(tmp_path):
+    work_dir = checkout(tmp_path, 'data_simulator.py', 'etl_worker')
+    run_python(work_dir, 'import data_simulator; data_simulator.main(200)')
+    feedback = stored_feedback(work_dir)
+    assert len(feedback) == 500
+    assert not os.path.exists(os.path.join(work_dir, 'data', 'ai_feedback_history.json'))
+
+    # A second run regenerates the same decision ids; the stored ones are kept
+    run_python(work_dir, 'import data_simulator; data_simulator.main(200)')
+    assert stored_feedback(work_dir) == feedback
+
+
+def test_root_feedback_simulator_seeds_the_store(tmp_path):
+    work_dir = checkout(tmp_path, 'feedback_simulator.py', 'ui_app')
+    output = run_python(work_dir, 'from feedback_simulator import load_or_create_feedback_history as load; '
+                                  'print(len(load()))')
+    assert output.strip().splitlines()[-1] == '50'
+    assert len(stored_feedback(work_dir)) == 50
+    assert os.listdir(os.path.join(work_dir, 'data')) == ['pricing_store.db']
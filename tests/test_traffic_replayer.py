@@ -0,0 +1,87 @@
+"""Traffic replayer: open-loop sends at the target rate, shed outcome reports are resent"""
+
+import asyncio
+import itertools
+import threading
+
+import pytest
+from flask import Flask, jsonify, request
+from werkzeug.serving import make_server
+
+from traffic_replayer import TrafficReplayer
+
+
+@pytest.fixture
+def pricing_api():
+    """A stub pricing API whose admission control sheds every third outcome report"""
+    app = Flask(__name__)
+    ids = itertools.count()
+    calls = {'recommend_price': 0, 'optimize_market_and_price': 0, 'report_outcome': 0}
+    lock = threading.Lock()
+
+    def count(route):
+        with lock:
+            calls[route] += 1
+            return calls[route]
+
+    @app.route('/recommend_price', methods=['POST'])
+    def recommend_price():
+        count('recommend_price')
+        return jsonify({'decision_id': f'd{next(ids)}', 'recommended_tier': 1.0,
+                        'estimated_market_value': {'eur': 400.0}})
+
+    @app.route('/optimize_market_and_price', methods=['POST'])
+    def optimize():
+        count('optimize_market_and_price')
+        return jsonify({'decision_id': f'd{next(ids)}',
+                        'best_option': {'recommended_tier': 0.9, 'market_adjusted_price_eur': 380.0, 'market': 'Poland'}})
+
+    @app.route('/report_outcome', methods=['POST'])
+    def report_outcome():
+        if count('report_outcome') % 3 == 0:
+            response = jsonify({'error': 'Service saturated, please retry'})
+            response.status_code = 503
+            response.headers['Retry-After'] = '0.01'
+            return response
+        assert 'reward' in request.get_json()
+        return jsonify({'status': 'success'})
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}', calls
+    server.shutdown()
+
+
+def replay(base_url, **options):
+    replayer = TrafficReplayer(base_url, **{'qps': 40, 'duration': 1.0, 'outcome_delay': 0.05, **options})
+    elapsed = asyncio.run(replayer.run())
+    return replayer.report(elapsed)
+
+
+def test_every_decision_gets_its_outcome_reported(pricing_api):
+    base_url, calls = pricing_api
+    report = replay(base_url, optimize_share=0.3)
+
+    assert calls['recommend_price'] + calls['optimize_market_and_price'] == 40
+    assert calls['optimize_market_and_price'] > 0
+    assert report['outcomes']['reported'] == 40 and report['outcomes']['lost'] == 0
+    assert report['outcomes']['resent'] == calls['report_outcome'] - 40 > 0
+    assert report['endpoints']['/report_outcome']['statuses']['503'] == report['outcomes']['resent']
+    assert sum(window['outcomes'] for window in report['learning_curve']) == 40
+    assert report['achieved_qps'] == pytest.approx(40, rel=0.25)
+
+
+def test_outcomes_still_shed_after_the_retries_are_lost(pricing_api):
+    base_url, calls = pricing_api
+    report = replay(base_url, outcome_retries=0)
+    assert report['outcomes']['resent'] == 0
+    assert report['outcomes']['lost'] == calls['report_outcome'] // 3
+    assert report['outcomes']['reported'] + report['outcomes']['lost'] == 40
+
+
+def test_unreported_decisions_send_no_outcomes(pricing_api):
+    base_url, calls = pricing_api
+    report = replay(base_url, report_fraction=0.0)
+    assert calls['report_outcome'] == 0 and report['outcomes']['reported'] == 0
+    assert sum(window['requests'] for window in report['learning_curve']) == 40
@@ -0,0 +1,70 @@
+"""Vectorized transaction simulator: same distributions and pricing rules as the loop version"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_simulator
+from conftest import END_DATE
+
+
+@pytest.fixture(scope='module')
+def loop_and_vectorized():
+    data_simulator.np.random.seed(42)
+    data_simulator.random.seed(42)
+    loop = data_simulator.generate_simulated_transactions(4000)
+    vectorized = data_simulator.generate_transactions_vectorized(20000, np.random.default_rng(42), END_DATE)
+    return loop, vectorized
+
+
+def test_same_columns(loop_and_vectorized):
+    loop, vectorized = loop_and_vectorized
+    assert list(vectorized.columns) == list(loop.columns)
+    for column in loop.columns:
+        assert pd.api.types.is_numeric_dtype(vectorized[column]) == pd.api.types.is_numeric_dtype(loop[column]), column
+
+
+@pytest.mark.parametrize('column', ['model', 'market', 'inventory_level', 'pricing_tier', 'has_damage',
+                                    'refurbishing_tier', 'new_model_imminent'])
+def test_category_frequencies_match(loop_and_vectorized, column):
+    loop, vectorized = loop_and_vectorized
+    loop_share = loop[column].value_counts(normalize=True)
+    vectorized_share = vectorized[column].value_counts(normalize=True)
+    assert set(loop_share.index) == set(vectorized_share.index)
+    assert (loop_share - vectorized_share).abs().max() < 0.03
+
+
+@pytest.mark.parametrize('column', ['battery_health', 'selling_price_eur', 'profit_eur', 'days_to_sell',
+                                    'vanilla_profit_eur'])
+def test_numeric_moments_match(loop_and_vectorized, column):
+    loop, vectorized = loop_and_vectorized
+    assert vectorized[column].mean() == pytest.approx(loop[column].mean(), rel=0.03)
+    assert vectorized[column].std() == pytest.approx(loop[column].std(), rel=0.08)
+
+
+def test_vectorized_rows_follow_the_pricing_rules(loop_and_vectorized):
+    _, df = loop_and_vectorized
+    price = np.array([data_simulator.BASE_PRICES[model] * data_simulator.MARKET_MULTIPLIERS[market]
+                      for model, market in zip(df['model'], df['market'])]) * df['pricing_tier']
+    price *= np.where(df['battery_health'] < 80, 0.95, 1.0) * np.where(df['has_damage'], 0.88, 1.0)
+    price *= np.where(df['new_model_imminent'], 0.92, 1.0) * np.where(df['inventory_level'] == 'high', 0.96, 1.0)
+    np.testing.assert_allclose(df['selling_price_eur'], price.round(2), atol=0.006)
+    assert df['battery_health'].between(60, 100).all() and (df['days_to_sell'] >= 1).all()
+    dates = pd.to_datetime(df['date'])
+    assert dates.max() <= END_DATE and dates.min() >= END_DATE - pd.Timedelta(days=540)
+
+
+def test_partitioned_output_does_not_depend_on_workers(tmp_path):
+    outputs = {}
+    for workers in [1, 2]:
+        output_dir = str(tmp_path / f'workers{workers}')
+        totals = data_simulator.generate_partitioned_transactions(2500, output_dir, workers=workers, seed=3,
+                                                                  shard_rows=1000, chunk_rows=400)
+        assert totals['rows'] == 2500
+        outputs[workers] = pd.concat([pd.read_csv(os.path.join(output_dir, name))
+                                      for name in sorted(os.listdir(output_dir))], ignore_index=True)
+    assert len(os.listdir(str(tmp_path / 'workers1'))) == 8  # 3 shards of 1000, 1000, 500 rows in 400-row parts
+    # Dates depend on the run's clock, everything else only on the seed
+    pd.testing.assert_frame_equal(outputs[1].drop(columns='date'), outputs[2].drop(columns='date'))
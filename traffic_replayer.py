@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Closed-loop traffic replayer for the pricing API.
+
+Drives the whole learn loop under load instead of single curl calls:
+
+1. draws devices from the data_simulator transaction distributions
+2. requests a price from /recommend_price (or /optimize_market_and_price for
+   a share of the traffic) at a fixed target QPS
+3. after a configurable delay, samples the sale outcome with the same reward
+   model as calculate_business_reward() and reports it to /report_outcome,
+   resending reports the API's admission control shed (503 with Retry-After)
+   after the advertised delay, as a real client would
+
+Arrivals are open-loop: requests are scheduled at fixed intervals whether or
+not earlier ones have returned, and latency is measured from the scheduled
+send time, so a slow server shows up as latency instead of a lower request
+rate, and the achieved QPS covers the price request schedule only (not the
+outcome tail). Latency percentiles, error and shed (503) rates, outcome
+resends and losses and per-window learning curves (mean reward, tier mix) are
+written to a JSON results file.
+
+Usage:
+    python traffic_replayer.py --qps 50 --duration 120 --outcome-delay 5
+"""
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+from data_simulator import generate_transactions_vectorized
+
+TIERS = [0.9, 1.0, 1.1]
+
+
+def sample_devices(num_devices, rng):
+    """API payloads drawn from the simulated transaction distributions"""
+    df = generate_transactions_vectorized(num_devices, rng)
+    return [{
+        'Model': model,
+        'Battery': int(battery),
+        'Screen_Damage': int(screen_damage),
+        'Backglass_Damage': int(backglass_damage),
+        'market': market,
+        'inventory_level': inventory_level,
+        'new_model_imminent': bool(new_model_imminent)
+    } for model, battery, screen_damage, backglass_damage, market, inventory_level, new_model_imminent in zip(
+        df['model'], df['battery_health'], df['has_screen_damage'], df['has_backglass_damage'],
+        df['market'], df['inventory_level'], df['new_model_imminent']
+    )]
+
+
+def sample_reward(price_tier, base_price, context, rng):
+    """Sampled EUR profit of a decision, following calculate_business_reward()"""
+    battery_health = context.get('Battery', 95)
+    damage_penalty = context.get('Backglass_Damage', 0) + context.get('Screen_Damage', 0)
+    inventory = context.get('inventory_level', 'decent')
+
+    base_margins = {0.9: 0.12, 1.0: 0.22, 1.1: 0.32}
+    profit_margin = max(0.05, base_margins.get(price_tier, 0.22) + rng.uniform(-0.05, 0.05))
+
+    base_probs = {0.9: 0.75, 1.0: 0.60, 1.1: 0.45}
+    sale_prob = max(0.2, min(0.95, base_probs.get(price_tier, 0.60) + rng.uniform(-0.15, 0.15)))
+    sale_prob *= (battery_health / 100) * (1 - damage_penalty * 0.3)
+    if inventory == 'high':
+        sale_prob *= 1.15
+    elif inventory == 'low':
+        sale_prob *= 0.85
+    if context.get('new_model_imminent', False):
+        sale_prob *= 0.75
+
+    expected_profit = sale_prob * base_price * price_tier * profit_margin
+    expected_profit *= (1 + rng.uniform(-0.1, 0.1))
+    return max(0.0, expected_profit)
+
+
+def percentiles(latencies):
+    """Latency summary in milliseconds"""
+    if not latencies:
+        return {}
+    values = np.asarray(latencies) * 1000
+    return {
+        'p50_ms': round(float(np.percentile(values, 50)), 2),
+        'p90_ms': round(float(np.percentile(values, 90)), 2),
+        'p99_ms': round(float(np.percentile(values, 99)), 2),
+        'max_ms': round(float(values.max()), 2),
+        'mean_ms': round(float(values.mean()), 2)
+    }
+
+
+class LoadResults:
+    """Per-endpoint latencies and status counts plus per-window learning curves"""
+
+    def __init__(self, window_seconds):
+        self.window_seconds = window_seconds
+        self.endpoints = {}
+        self.windows = {}
+        self.outcomes = {'reported': 0, 'resent': 0, 'lost': 0}
+
+    def _window(self, elapsed):
+        index = int(elapsed // self.window_seconds)
+        if index not in self.windows:
+            self.windows[index] = {'requests': 0, 'errors': 0, 'latencies': [], 'tiers': [], 'rewards': []}
+        return self.windows[index]
+
+    def record_request(self, endpoint, elapsed, latency, status):
+        stats = self.endpoints.setdefault(endpoint, {'latencies': [], 'statuses': {}})
+        stats['latencies'].append(latency)
+        stats['statuses'][str(status)] = stats['statuses'].get(str(status), 0) + 1
+        window = self._window(elapsed)
+        window['requests'] += 1
+        window['latencies'].append(latency)
+        if status != 200:
+            window['errors'] += 1
+
+    def record_decision(self, elapsed, tier):
+        self._window(elapsed)['tiers'].append(tier)
+
+    def record_outcome(self, elapsed, reward):
+        self._window(elapsed)['rewards'].append(reward)
+        self.outcomes['reported'] += 1
+
+    def record_outcome_resend(self):
+        self.outcomes['resent'] += 1
+
+    def record_outcome_lost(self):
+        self.outcomes['lost'] += 1
+
+    def endpoint_summary(self):
+        summary = {}
+        for endpoint, stats in self.endpoints.items():
+            count = len(stats['latencies'])
+            ok = stats['statuses'].get('200', 0)
+            shed = stats['statuses'].get('503', 0)
+            summary[endpoint] = {
+                'requests': count,
+                'error_rate': round(1 - ok / count, 4),
+                'shed_rate': round(shed / count, 4),
+                'statuses': stats['statuses'],
+                'latency': percentiles(stats['latencies'])
+            }
+        return summary
+
+    def learning_curve(self):
+        curve = []
+        reward_sum, reward_count = 0.0, 0
+        for index in sorted(self.windows):
+            window = self.windows[index]
+            reward_sum += sum(window['rewards'])
+            reward_count += len(window['rewards'])
+            tiers = window['tiers']
+            curve.append({
+                'window_start_s': index * self.window_seconds,
+                'requests': window['requests'],
+                'error_rate': round(window['errors'] / window['requests'], 4) if window['requests'] else 0.0,
+                'p50_ms': percentiles(window['latencies']).get('p50_ms'),
+                'outcomes': len(window['rewards']),
+                'mean_reward_eur': round(float(np.mean(window['rewards'])), 2) if window['rewards'] else None,
+                'cumulative_mean_reward_eur': round(reward_sum / reward_count, 2) if reward_count else None,
+                'tier_share': {str(tier): round(tiers.count(tier) / len(tiers), 3) for tier in TIERS} if tiers else {}
+            })
+        return curve
+
+
+class TrafficReplayer:
+    """Open-loop load against the pricing API with delayed outcome reports"""
+
+    def __init__(self, base_url, qps, duration, outcome_delay, optimize_share=0.0, report_fraction=1.0,
+                 model_name='LinTS', max_in_flight=64, timeout=10.0, window_seconds=10.0, seed=42,
+                 outcome_retries=5):
+        self.base_url = base_url.rstrip('/')
+        self.qps = qps
+        self.duration = duration
+        self.outcome_delay = outcome_delay
+        self.optimize_share = optimize_share
+        self.report_fraction = report_fraction
+        self.model_name = model_name
+        self.timeout = timeout
+        self.outcome_retries = outcome_retries
+        self.rng = np.random.default_rng(seed)
+        self.devices = sample_devices(max(1, int(qps * duration)), self.rng)
+        self.results = LoadResults(window_seconds)
+        # Blocking HTTP calls run on a thread pool, one keep-alive session per thread
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight)
+        self._sessions = threading.local()
+        self.started = None
+        self.first_send = None
+        self.last_send = None
+
+    def _post(self, path, payload):
+        session = getattr(self._sessions, 'session', None)
+        if session is None:
+            session = self._sessions.session = requests.Session()
+        try:
+            response = session.post(f'{self.base_url}{path}', json=payload, timeout=self.timeout)
+            body = response.json() if response.status_code == 200 else None
+            # Admission control sheds before the route runs and says when to come back
+            retry_after = response.headers.get('Retry-After') if response.status_code == 503 else None
+            return response.status_code, body, float(retry_after) if retry_after is not None else None
+        except (requests.RequestException, ValueError):
+            return 0, None, None  # Connection error, timeout or unparseable body
+
+    async def post(self, path, payload, scheduled_at=None):
+        """
+        POST in the thread pool; latency counts from scheduled_at (default: now).
+        Returns (status, body, retry_after seconds of an admission-shed 503 or None).
+        """
+        scheduled_at = scheduled_at if scheduled_at is not None else time.perf_counter()
+        status, body, retry_after = await asyncio.get_running_loop().run_in_executor(
+            self.executor, self._post, path, payload)
+        latency = time.perf_counter() - scheduled_at
+        self.results.record_request(path, scheduled_at - self.started, latency, status)
+        return status, body, retry_after
+
+    async def report_outcome(self, decision_id, reward):
+        """Report an outcome, resending it after Retry-After while admission control sheds it"""
+        payload = {'decision_id': decision_id, 'reward': reward}
+        status, _, retry_after = await self.post('/report_outcome', payload)
+        for _ in range(self.outcome_retries):
+            if retry_after is None:
+                break
+            self.results.record_outcome_resend()
+            # Jittered so shed reports do not all come back in the same instant
+            await asyncio.sleep(retry_after * (1 + self.rng.random()))
+            status, _, retry_after = await self.post('/report_outcome', payload)
+        if status == 200:
+            self.results.record_outcome(time.perf_counter() - self.started, reward)
+        else:
+            self.results.record_outcome_lost()
+
+    async def decision(self, device, scheduled_at):
+        """One price request and, after the outcome delay, its outcome report"""
+        payload = {**device, 'model': self.model_name}
+        if self.rng.random() < self.optimize_share:
+            status, body, _ = await self.post('/optimize_market_and_price', payload, scheduled_at)
+            option = (body or {}).get('best_option') or {}
+            tier, base_price = option.get('recommended_tier'), option.get('market_adjusted_price_eur')
+            context = {**device, 'market': option.get('market', device['market'])}
+        else:
+            status, body, _ = await self.post('/recommend_price', payload, scheduled_at)
+            tier = (body or {}).get('recommended_tier')
+            base_price = ((body or {}).get('estimated_market_value') or {}).get('eur')
+            context = device
+        decision_id = (body or {}).get('decision_id')
+        if status != 200 or decision_id is None or tier is None:
+            return
+        self.results.record_decision(scheduled_at - self.started, float(tier))
+
+        if self.rng.random() >= self.report_fraction:
+            return  # Never reported, as for devices that are never sold
+        await asyncio.sleep(self.rng.exponential(self.outcome_delay) if self.outcome_delay > 0 else 0)
+        reward = round(sample_reward(float(tier), float(base_price or 0), context, self.rng), 2)
+        await self.report_outcome(decision_id, reward)
+
+    async def run(self):
+        self.started = time.perf_counter()
+        tasks = []
+        for i, device in enumerate(self.devices):
+            scheduled_at = self.started + i / self.qps
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.last_send = time.perf_counter()
+            if self.first_send is None:
+                self.first_send = self.last_send
+            tasks.append(asyncio.create_task(self.decision(device, scheduled_at)))
+            if (i + 1) % max(1, int(self.qps * 10)) == 0:
+                print(f"  {i + 1:,} / {len(self.devices):,} requests sent")
+        # Let in-flight requests and pending outcome reports finish
+        await asyncio.gather(*tasks)
+        self.executor.shutdown()
+        return time.perf_counter() - self.started
+
+    def achieved_qps(self):
+        """Price requests per second between the first and the last scheduled send"""
+        send_window = (self.last_send or 0) - (self.first_send or 0)
+        if send_window <= 0:
+            return None
+        return round((len(self.devices) - 1) / send_window, 2)
+
+    def report(self, elapsed):
+        return {
+            'config': {
+                'base_url': self.base_url,
+                'target_qps': self.qps,
+                'duration_s': self.duration,
+                'outcome_delay_s': self.outcome_delay,
+                'optimize_share': self.optimize_share,
+                'report_fraction': self.report_fraction,
+                'model': self.model_name,
+                'outcome_retries': self.outcome_retries
+            },
+            'elapsed_s': round(elapsed, 2),
+            'achieved_qps': self.achieved_qps(),
+            'endpoints': self.results.endpoint_summary(),
+            'outcomes': self.results.outcomes,
+            'learning_curve': self.results.learning_curve()
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Closed-loop load test of the pricing API")
+    parser.add_argument('--url', default='http://localhost:5002', help="Pricing API base URL")
+    parser.add_argument('--qps', type=float, default=20.0, help="Target price requests per second")
+    parser.add_argument('--duration', type=float, default=60.0, help="Seconds of price request traffic")
+    parser.add_argument('--outcome-delay', type=float, default=5.0,
+                        help="Mean seconds between a decision and its outcome report (exponentially distributed)")
+    parser.add_argument('--optimize-share', type=float, default=0.0,
+                        help="Share of requests sent to /optimize_market_and_price instead of /recommend_price")
+    parser.add_argument('--report-fraction', type=float, default=1.0, help="Share of decisions whose outcome is reported")
+    parser.add_argument('--outcome-retries', type=int, default=5,
+                        help="Times an outcome report shed with 503 is resent after its Retry-After delay")
+    parser.add_argument('--model', default='LinTS', choices=['LinTS', 'LinUCB', 'EpsilonGreedy'])
+    parser.add_argument('--max-in-flight', type=int, default=64, help="Concurrent HTTP requests")
+    parser.add_argument('--window', type=float, default=10.0, help="Seconds per learning curve window")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--results', default='load_test_results.json', help="JSON file to write the results to")
+    args = parser.parse_args()
+
+    replayer = TrafficReplayer(
+        args.url, args.qps, args.duration, args.outcome_delay, optimize_share=args.optimize_share,
+        report_fraction=args.report_fraction, model_name=args.model, max_in_flight=args.max_in_flight,
+        window_seconds=args.window, seed=args.seed, outcome_retries=args.outcome_retries
+    )
+    print(f"🚦 Replaying {len(replayer.devices):,} decisions at {args.qps:g} QPS against {args.url}...")
+    elapsed = asyncio.run(replayer.run())
+    results = replayer.report(elapsed)
+    with open(args.results, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    for endpoint, stats in results['endpoints'].items():
+        latency = stats['latency']
+        print(f"📊 {endpoint}: {stats['requests']:,} requests, error rate {stats['error_rate']:.2%} "
+              f"(shed {stats['shed_rate']:.2%}), p50 {latency.get('p50_ms')} ms, p99 {latency.get('p99_ms')} ms")
+    outcomes = results['outcomes']
+    print(f"📬 Outcomes: {outcomes['reported']:,} reported, {outcomes['resent']:,} resends, {outcomes['lost']:,} lost; "
+          f"achieved {results['achieved_qps']} QPS")
+    curve = [window for window in results['learning_curve'] if window['cumulative_mean_reward_eur'] is not None]
+    if curve:
+        print(f"📈 Cumulative mean reward: €{curve[0]['cumulative_mean_reward_eur']} (first window) -> "
+              f"€{curve[-1]['cumulative_mean_reward_eur']} (last window)")
+    print(f"✅ Results written to {args.results}")
+
+
+if __name__ == "__main__":
+    main()
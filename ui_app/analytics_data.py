@@ -0,0 +1,312 @@
+"""
+Loading of the ETL's analytics dataset for the dashboard tabs.
+
+Sources are tried in this order, skipping any that are older than
+analytics_data.csv (e.g. after running data_simulator.py):
+
+1. analytics_partitioned/ - year=/month=/market= partitions; date range and
+   market filters prune partitions before any file is read
+2. analytics_data.parquet - typed part files (one per ETL run), read with column pruning
+3. analytics_data.csv
+
+Dashboards should prefer load_rollup() and load_analytics_sample(), which read
+the ETL's pre-aggregated tables and stay the same size as history grows.
+Aggregates the ETL does not materialize (baseline totals, feedback history)
+are queried from the embedded store, pricing_store.db (see pricing_store).
+
+Loaded data is cached process-wide per data_version() (see frame_cache), so
+Streamlit reruns and other sessions reuse parsed frames until the ETL writes
+new outputs. The cache's memory budget is UI_CACHE_MAX_MB (default 512). The
+version itself is rechecked at most every UI_DATA_VERSION_TTL seconds
+(default 1), and the manifest is only re-parsed when its mtime changes.
+Feedback history is not cached; it changes with every recorded outcome.
+"""
+
+import json
+import os
+import time
+
+import pandas as pd
+
+from analytics_rollups import rollup_transactions
+from frame_cache import FrameCache
+from pricing_store import STORE_FILENAME, PricingStore
+
+FALLBACK_SAMPLE_ROWS = 5000
+
+PARTITION_SCHEMA_FIELDS = [('year', 'int32'), ('month', 'int32'), ('market', 'string')]
+
+_store = None
+
+DATA_VERSION_TTL = float(os.environ.get('UI_DATA_VERSION_TTL', 1.0))
+# (checked at, manifest mtime or None, version) of the last data_version() check
+_version_checked = (float('-inf'), None, None)
+
+data_cache = FrameCache(max_bytes=int(float(os.environ.get('UI_CACHE_MAX_MB', 512)) * 2 ** 20))
+
+
+def data_path(filename):
+    """Path of a shared data file in the container or the local checkout"""
+    container_path = os.path.join('/app/data', filename)
+    if os.path.exists(container_path) or os.path.isdir('/app/data'):
+        return container_path
+    return os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', filename)
+
+
+def data_version():
+    """
+    Version of the data on disk, for keying caches: the ETL manifest version,
+    or the CSV's modification time if no manifest has been written.
+    Every loader call asks for it, so the answer is reused for DATA_VERSION_TTL seconds.
+    """
+    global _version_checked
+    checked_at, manifest_mtime, version = _version_checked
+    now = time.monotonic()
+    if now - checked_at < DATA_VERSION_TTL:
+        return version
+
+    manifest_path = data_path('etl_manifest.json')
+    csv_path = data_path('analytics_data.csv')
+    if os.path.exists(manifest_path) and _is_fresh(manifest_path):
+        mtime = os.path.getmtime(manifest_path)
+        if mtime != manifest_mtime:
+            with open(manifest_path, 'r') as f:
+                version = json.load(f).get('version')
+        _version_checked = (now, mtime, version)
+        return version
+    version = f"mtime-{os.path.getmtime(csv_path)}" if os.path.exists(csv_path) else None
+    _version_checked = (now, None, version)
+    return version
+
+
+def cache_stats():
+    """Statistics of the loaded data cache"""
+    return data_cache.stats()
+
+
+def _is_fresh(path, marker=None):
+    """True if path exists and is at least as new as the CSV export"""
+    marker = marker or path
+    if not os.path.exists(marker):
+        return False
+    csv_path = data_path('analytics_data.csv')
+    return not os.path.exists(csv_path) or os.path.getmtime(marker) >= os.path.getmtime(csv_path)
+
+
+def pricing_store(create=False):
+    """The embedded store (one connection per process), or None before the ETL has created it unless create"""
+    global _store
+    if _store is None:
+        path = data_path(STORE_FILENAME)
+        if not create and not os.path.exists(path):
+            return None
+        _store = PricingStore(path)
+    return _store
+
+
+def _transactions_store():
+    """The store if its transactions are at least as new as the CSV export, else None"""
+    store = pricing_store()
+    if store is None:
+        return None
+    updated_at = store.transactions_updated_at()
+    csv_path = data_path('analytics_data.csv')
+    if updated_at is None or (os.path.exists(csv_path) and updated_at < os.path.getmtime(csv_path)):
+        return None
+    return store
+
+
+def _partitioned_dataset():
+    """The partitioned analytics dataset, or None if it is missing or stale"""
+    dataset_path = data_path('analytics_partitioned')
+    if not _is_fresh(dataset_path, marker=os.path.join(dataset_path, '_SUCCESS')):
+        return None
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    partitioning = ds.partitioning(
+        pa.schema([(name, pa.type_for_alias(type_name)) for name, type_name in PARTITION_SCHEMA_FIELDS]),
+        flavor='hive'
+    )
+    return ds.dataset(dataset_path, format='parquet', partitioning=partitioning)
+
+
+def _partition_filter(start_date=None, end_date=None, markets=None):
+    """Arrow filter on the partition keys (for pruning) and on the exact date bounds"""
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    year, month, date = ds.field('year'), ds.field('month'), ds.field('date')
+    expression = None
+
+    def combine(condition):
+        return condition if expression is None else expression & condition
+
+    if start_date is not None:
+        start_date = pd.Timestamp(start_date)
+        expression = combine((year > start_date.year) | ((year == start_date.year) & (month >= start_date.month)))
+        expression = combine(date >= pa.scalar(start_date.to_pydatetime(), type=pa.timestamp('ms')))
+    if end_date is not None:
+        end_date = pd.Timestamp(end_date)
+        expression = combine((year < end_date.year) | ((year == end_date.year) & (month <= end_date.month)))
+        expression = combine(date <= pa.scalar(end_date.to_pydatetime(), type=pa.timestamp('ms')))
+    if markets:
+        expression = combine(ds.field('market').isin(list(markets)))
+    return expression
+
+
+def _filter_frame(df, start_date=None, end_date=None, markets=None):
+    """Same filters as _partition_filter, applied to an in-memory frame"""
+    if start_date is not None:
+        df = df[df['date'] >= pd.Timestamp(start_date)]
+    if end_date is not None:
+        df = df[df['date'] <= pd.Timestamp(end_date)]
+    if markets:
+        df = df[df['market'].isin(list(markets))]
+    return df.reset_index(drop=True)
+
+
+@data_cache.cached(data_version)
+def load_analytics_data(columns=None, start_date=None, end_date=None, markets=None):
+    """
+    Load the analytics dataset, optionally only some columns (missing ones are
+    skipped), rows dated within [start_date, end_date] and the given markets.
+    """
+    filter_columns = ['date'] if start_date is not None or end_date is not None else []
+    filter_columns += ['market'] if markets else []
+
+    dataset = _partitioned_dataset()
+    if dataset is not None:
+        if columns is not None:
+            columns = [column for column in columns if column in dataset.schema.names]
+        table = dataset.to_table(columns=columns, filter=_partition_filter(start_date, end_date, markets))
+        return table.to_pandas()
+
+    parquet_path = data_path('analytics_data.parquet')
+    read_columns = None if columns is None else list(dict.fromkeys(columns + filter_columns))
+    if _is_fresh(parquet_path):
+        if read_columns is not None:
+            import pyarrow.dataset as ds
+            available = set(ds.dataset(parquet_path).schema.names)
+            read_columns = [column for column in read_columns if column in available]
+        df = pd.read_parquet(parquet_path, columns=read_columns)
+    else:
+        usecols = None if read_columns is None else (lambda column: column in read_columns)
+        df = pd.read_csv(data_path('analytics_data.csv'), usecols=usecols)
+        if 'date' in df.columns:
+            df['date'] = pd.to_datetime(df['date'])
+
+    df = _filter_frame(df, start_date, end_date, markets)
+    if columns is not None:
+        df = df[[column for column in columns if column in df.columns]]
+    return df
+
+
+@data_cache.cached(data_version)
+def latest_analytics_date():
+    """Most recent transaction date, read from the newest partition only when partitions exist"""
+    dataset = _partitioned_dataset()
+    if dataset is not None:
+        import pyarrow.compute as pc
+        import pyarrow.dataset as ds
+        dataset_path = data_path('analytics_partitioned')
+        years = [int(name.split('=', 1)[1]) for name in os.listdir(dataset_path) if name.startswith('year=')]
+        if years:
+            latest_year = max(years)
+            year_path = os.path.join(dataset_path, f'year={latest_year}')
+            latest_month = max(int(name.split('=', 1)[1]) for name in os.listdir(year_path) if name.startswith('month='))
+            table = dataset.to_table(
+                columns=['date'],
+                filter=(ds.field('year') == latest_year) & (ds.field('month') == latest_month)
+            )
+            return pd.Timestamp(pc.max(table.column('date')).as_py())
+
+    return load_analytics_data(columns=['date'])['date'].max()
+
+
+@data_cache.cached(data_version)
+def earliest_analytics_date():
+    """First transaction date, from the period column of the daily rollup when it exists"""
+    rollup_path = data_path('analytics_rollup_daily.parquet')
+    if _is_fresh(rollup_path):
+        return pd.read_parquet(rollup_path, columns=['period'])['period'].min()
+
+    return load_analytics_data(columns=['date'])['date'].min()
+
+
+@data_cache.cached(data_version)
+def load_rollup(start_date=None):
+    """
+    Rollup cells (see analytics_rollups) from start_date on: the monthly table
+    for all time, the daily table when a start date is given. Built from raw
+    rows if the ETL has not written rollups yet.
+    """
+    rollup_path = data_path('analytics_rollup_monthly.parquet' if start_date is None
+                            else 'analytics_rollup_daily.parquet')
+    if _is_fresh(rollup_path):
+        filters = None if start_date is None else [('period', '>=', pd.Timestamp(start_date))]
+        return pd.read_parquet(rollup_path, filters=filters)
+
+    store = _transactions_store()
+    if store is not None:
+        return store.query_rollup(freq='M' if start_date is None else 'D', start_date=start_date)
+
+    df = load_analytics_data(start_date=start_date)
+    return rollup_transactions(df, freq='M' if start_date is None else 'D')
+
+
+@data_cache.cached(data_version)
+def load_analytics_sample(start_date=None):
+    """Bounded sample of raw transactions from start_date on, for distribution plots"""
+    sample_path = data_path('analytics_sample.parquet')
+    if _is_fresh(sample_path):
+        filters = None if start_date is None else [('date', '>=', pd.Timestamp(start_date))]
+        return pd.read_parquet(sample_path, filters=filters)
+
+    df = load_analytics_data(columns=['date', 'model', 'market', 'has_damage', 'days_to_sell',
+                                      'profit_eur', 'selling_price_eur', 'profit_margin'],
+                             start_date=start_date)
+    return df.sample(n=min(len(df), FALLBACK_SAMPLE_ROWS), random_state=42)
+
+
+@data_cache.cached(data_version)
+def load_baseline_summary():
+    """Transaction count plus total and mean vanilla profit and mean profit margin"""
+    store = _transactions_store()
+    if store is not None:
+        totals = store.query_totals(['vanilla_profit_eur', 'profit_margin'])
+        return {
+            'transactions': int(totals['row_count']),
+            'vanilla_profit_total': totals['vanilla_profit_eur_sum'] or 0.0,
+            'vanilla_profit_mean': totals['vanilla_profit_eur_mean'] or 0.0,
+            'profit_margin_mean': totals['profit_margin_mean'] or 0.0
+        }
+
+    df = load_analytics_data(columns=['vanilla_profit_eur', 'profit_margin'])
+    return {
+        'transactions': len(df),
+        'vanilla_profit_total': df['vanilla_profit_eur'].sum(),
+        'vanilla_profit_mean': df['vanilla_profit_eur'].mean(),
+        'profit_margin_mean': df['profit_margin'].mean() if 'profit_margin' in df.columns else 0.0
+    }
+
+
+@data_cache.cached(data_version)
+def load_baseline_sample(n):
+    """Random sample of n transactions' vanilla (market-rate) profit"""
+    store = _transactions_store()
+    if store is not None:
+        return store.sample_transactions(['vanilla_profit_eur'], n)
+
+    df = load_analytics_data(columns=['vanilla_profit_eur'])
+    return df.sample(n=min(n, len(df)))
+
+
+def load_feedback_history(start=None, end=None, limit=None):
+    """Feedback records stored by the ETL import, the simulators and the dashboard, oldest first ([] without a store)"""
+    store = pricing_store()
+    return store.load_feedback(start, end, limit) if store is not None else []
+
+
+def record_feedback(record):
+    """Append one feedback record sent from the dashboard to the store, creating it if needed"""
+    pricing_store(create=True).record_feedback([record], source='ui')
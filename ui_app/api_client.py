@@ -0,0 +1,210 @@
+"""
+Shared HTTP client for the dashboard's calls to the ML API.
+
+One client per process (see get_client()) serves every Streamlit rerun and
+session:
+
+- a requests.Session whose connection pool keeps connections to the API alive
+- post_all() sends several requests concurrently (e.g. one per bandit model
+  for model comparison), so they cost one round trip of wall time, and
+  reports failures per request so one failing call does not fail the rest
+- failed calls are retried with jittered exponential backoff; for calls that
+  must not be repeated (reporting outcomes) only failures where the API cannot
+  have acted are retried: connection failures and admission-control 503s
+  (which honor the API's Retry-After)
+- a circuit breaker fails fast with CircuitOpenError after repeated failures
+  instead of waiting for every call to time out while the API is down;
+  admission-control sheds do not count, since the API is up and answering
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+POOL_SIZE = 8
+CONNECT_TIMEOUT = 3.0
+MAX_RETRIES = 2
+BACKOFF_BASE = 0.25
+BACKOFF_MAX = 2.0
+RETRY_STATUSES = {502, 503, 504}
+BREAKER_THRESHOLD = 5
+BREAKER_RESET_SECONDS = 30.0
+
+_client = None
+_client_lock = threading.Lock()
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """The API failed repeatedly and calls are refused until the breaker resets"""
+
+
+def _admission_shed(response):
+    """True for the API's admission-control 503, sent before the route ran (so always safe to retry)"""
+    return response.status_code == 503 and 'Retry-After' in response.headers
+
+
+def _retry_after_seconds(response):
+    """The response's Retry-After delay in seconds, or None if it has none (or an HTTP date)"""
+    try:
+        return float(response.headers['Retry-After'])
+    except (KeyError, ValueError):
+        return None
+
+
+def split_failures(outcomes):
+    """Split a post_all() result into ({key: response}, {key: exception})"""
+    responses = {key: outcome for key, outcome in outcomes.items() if not isinstance(outcome, Exception)}
+    failures = {key: outcome for key, outcome in outcomes.items() if isinstance(outcome, Exception)}
+    return responses, failures
+
+
+def _request_not_sent(error):
+    """True if the request failed before reaching the API (connection refused or connect timeout)"""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+class CircuitBreaker:
+    """Opens after threshold consecutive failures; after reset_seconds lets one trial call through"""
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, reset_seconds=BREAKER_RESET_SECONDS):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._trial_thread = None  # Thread whose call is the half-open trial
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """True if a call may be attempted now"""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_seconds or self._trial_running:
+                return False
+            self._trial_running = True  # Half-open: one call probes whether the API is back
+            self._trial_thread = threading.get_ident()
+            return True
+
+    def end_trial(self):
+        """Let another call probe the API if this thread's trial call ended without success or failure"""
+        with self._lock:
+            if self._trial_thread == threading.get_ident():
+                self._trial_running = False
+                self._trial_thread = None
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+            self._trial_thread = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            self._trial_thread = None
+            if self.opened_at is not None or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return 'closed'
+            return 'open' if time.monotonic() - self.opened_at < self.reset_seconds else 'half-open'
+
+
+class ApiClient:
+    """Pooled, retrying, circuit-broken client for one API base URL"""
+
+    def __init__(self, base_url, pool_size=POOL_SIZE, max_retries=MAX_RETRIES, breaker=None):
+        self.base_url = base_url.rstrip('/')
+        self.max_retries = max_retries
+        self.breaker = breaker or CircuitBreaker()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='api-client')
+
+    def _backoff(self, attempt, retry_after=None):
+        """Full-jitter exponential backoff before retry number attempt (1-based), or the API's Retry-After"""
+        if retry_after is not None:
+            time.sleep(min(BACKOFF_MAX, retry_after))
+            return
+        time.sleep(random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1))))
+
+    def post(self, path, payload, timeout=10, idempotent=True):
+        """
+        POST payload as JSON to path and return the response. Calls that never
+        reached the API or were shed by its admission control are always
+        retried; timeouts, dropped connections and other 502/503/504 responses
+        only when idempotent, since the API may already have acted on the request.
+        """
+        url = f'{self.base_url}{path}'
+        retry_after = None
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                raise CircuitOpenError(f'ML API at {self.base_url} is failing; retrying in up to '
+                                       f'{self.breaker.reset_seconds:.0f}s')
+            try:
+                if attempt:
+                    self._backoff(attempt, retry_after)
+                    retry_after = None
+                try:
+                    response = self.session.post(url, json=payload, timeout=(CONNECT_TIMEOUT, timeout))
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    self.breaker.record_failure()
+                    if not (idempotent or _request_not_sent(e)) or attempt == self.max_retries:
+                        raise
+                    continue
+                if _admission_shed(response):
+                    # The API is up and refused the call under load: not a breaker failure
+                    if attempt < self.max_retries:
+                        retry_after = _retry_after_seconds(response)
+                        continue
+                elif response.status_code >= 500:
+                    self.breaker.record_failure()
+                    if idempotent and response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                        continue
+                else:
+                    self.breaker.record_success()
+                return response
+            finally:
+                # A half-open trial that was shed or hit any other request error
+                # must not keep the breaker refusing every call
+                self.breaker.end_trial()
+
+    def post_all(self, path, payloads, timeout=10):
+        """
+        POST each payload in {key: payload} concurrently. Returns {key: response},
+        with the exception in place of the response for calls that failed
+        (see split_failures).
+        """
+        futures = {key: self._executor.submit(self.post, path, payload, timeout) for key, payload in payloads.items()}
+        outcomes = {}
+        for key, future in futures.items():
+            try:
+                outcomes[key] = future.result()
+            except requests.exceptions.RequestException as e:
+                outcomes[key] = e
+        return outcomes
+
+
+def get_client(base_url):
+    """The process-wide client for base_url"""
+    global _client
+    with _client_lock:
+        if _client is None or _client.base_url != base_url.rstrip('/'):
+            _client = ApiClient(base_url)
+        return _client
@@ -5,6 +5,12 @@ import numpy as np
 import random
 from datetime import datetime, timedelta
 import os
+import sys
+
+# Run from the checkout root, the dashboard's store helpers live in ui_app/
+UI_APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ui_app')
+if os.path.isdir(UI_APP_DIR) and UI_APP_DIR not in sys.path:
+    sys.path.append(UI_APP_DIR)
 
 def create_realistic_feedback_history(num_records=50):
     """
@@ -92,14 +98,40 @@ def create_realistic_feedback_history(num_records=50):
     
     return feedback_records
 
+def feedback_store():
+    """The shared store feedback is appended to (see analytics_data), or None where it is not available"""
+    try:
+        from analytics_data import pricing_store
+    except ImportError:
+        return None
+    return pricing_store(create=True)
+
 def load_or_create_feedback_history():
     """
     Load existing feedback history or create a new realistic one for demonstration
     """
     import json
     
-    # First, try to load the comprehensive AI feedback history (500 records)
     comprehensive_feedback_file = 'data/ai_feedback_history.json'
+    demo_feedback_file = 'data/demo_feedback_history.json'
+    
+    # The shared feedback log: seed it from the history files (or a new demo
+    # history) once, then read it instead of the files
+    store = feedback_store()
+    if store is not None:
+        if store.count_feedback() < 5:
+            for feedback_file in [comprehensive_feedback_file, demo_feedback_file]:
+                if os.path.exists(feedback_file):
+                    with open(feedback_file, 'r') as f:
+                        store.record_feedback(json.load(f), source=os.path.basename(feedback_file))
+        if store.count_feedback() < 5:
+            store.record_feedback(create_realistic_feedback_history(50), source='demo')
+            print(f"✨ Created new demo feedback history in {store.path}")
+        feedback_history = store.load_feedback()
+        print(f"📚 Loaded feedback history from {store.path}: {len(feedback_history)} records")
+        return feedback_history
+    
+    # First, try to load the comprehensive AI feedback history (500 records)
     if os.path.exists(comprehensive_feedback_file):
         with open(comprehensive_feedback_file, 'r') as f:
             feedback_history = json.load(f)
@@ -107,7 +139,6 @@ def load_or_create_feedback_history():
         return feedback_history
     
     # Fallback to smaller demo feedback
-    demo_feedback_file = 'data/demo_feedback_history.json'
     if os.path.exists(demo_feedback_file):
         with open(demo_feedback_file, 'r') as f:
             feedback_history = json.load(f)
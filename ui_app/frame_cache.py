@@ -0,0 +1,139 @@
+"""
+Process-wide cache of loaded analytics data for the dashboard.
+
+Streamlit reruns the whole script on every widget interaction, and all
+sessions run in one process. Loaders wrapped with FrameCache.cached() read
+and parse their files once per data version and hand the same typed result
+to every rerun of every session. Entries are dropped when the data version
+changes (the ETL wrote new outputs) and, least recently used first, when
+their total size exceeds the cache's memory budget.
+
+Callers get their own copy of every cached frame, Series, dict or list, so
+editing a result never changes what other reruns and sessions are served.
+With pandas' copy-on-write (always on from pandas 3) frames are copied
+lazily, only when a caller actually modifies one.
+"""
+
+import copy
+import functools
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+_MISSING = object()
+
+COPY_ON_WRITE = int(pd.__version__.split('.')[0]) >= 3
+
+
+def _freeze(value):
+    """Hashable form of a loader argument (lists become tuples)"""
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def caller_copy(value):
+    """A copy of a cached value that the caller may modify freely"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy(deep=not COPY_ON_WRITE)
+    if isinstance(value, (dict, list)):
+        return copy.deepcopy(value)
+    return value  # Scalars and timestamps are immutable
+
+
+def value_bytes(value):
+    """Approximate memory footprint of a cached value"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(value_bytes(item) for item in value.values())
+    return sys.getsizeof(value)
+
+
+class FrameCache:
+    """Memory-capped LRU cache whose contents are invalidated when the data version changes"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.version = None
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._lock = threading.Lock()
+
+    def _check_version(self, version):
+        if version != self.version:
+            self._entries.clear()
+            self.bytes = 0
+            self.version = version
+
+    def get(self, key, version):
+        """The cached value for key, or _MISSING"""
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return _MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, version, value):
+        """Store value for key, evicting least recently used entries beyond the memory budget"""
+        size = value_bytes(value)
+        if size > self.max_bytes:
+            return  # Larger than the whole budget; callers reload it each time
+        with self._lock:
+            self._check_version(version)
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def cached(self, version_function):
+        """Decorator caching a loader's results per arguments for the current version_function() value"""
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                version = version_function()
+                key = (function.__name__, _freeze(args), tuple(sorted((name, _freeze(arg)) for name, arg in kwargs.items())))
+                value = self.get(key, version)
+                if value is _MISSING:
+                    value = function(*args, **kwargs)
+                    self.put(key, version, value)
+                return caller_copy(value)
+            return wrapper
+        return decorator
+
+    def clear(self):
+        """Drop every entry (e.g. after the loaders were pointed at other data)"""
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+            self.version = None
+
+    def stats(self):
+        """Hit/miss counters and current memory use"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'megabytes': round(self.bytes / 2 ** 20, 2),
+                'max_megabytes': round(self.max_bytes / 2 ** 20, 2),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'version': self.version
+            }
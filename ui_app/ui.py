@@ -6,9 +6,14 @@ import plotly.graph_objects as go
 from datetime import datetime
 import json
 import os
+from analytics_data import (load_analytics_data, latest_analytics_date, earliest_analytics_date, load_rollup,
+                            load_analytics_sample, load_baseline_summary, load_baseline_sample, load_feedback_history, record_feedback)
+from analytics_rollups import summarize_rollup
+from api_client import get_client, split_failures
 
-# Initialize API base URL at global scope for all tabs
+# Initialize API base URL and the shared (pooled, retrying) API client at global scope for all tabs
 api_base = os.getenv('ML_API_URL', 'http://localhost:5002')
+api_client = get_client(api_base)
 
 # Configure page
 st.set_page_config(
@@ -134,7 +139,6 @@ with tab1:
     
     # Handle Single Market Analysis
     if single_market_button:
-        api_url = f'{api_base}/recommend_price'
         payload = {
             'Model': selected_iphone_model,
             'Battery': battery, 
@@ -148,21 +152,25 @@ with tab1:
         
         try:
             if show_model_comparison:
-                # Get recommendations from all three AI models
-                all_model_results = {}
-                for model_name in ['LinTS', 'LinUCB', 'EpsilonGreedy']:
-                    model_payload = payload.copy()
-                    model_payload['model'] = model_name
-                    model_response = requests.post(api_url, json=model_payload, timeout=10)
-                    all_model_results[model_name] = model_response.json()
+                # Get recommendations from all three AI models concurrently
+                model_responses, model_failures = split_failures(api_client.post_all('/recommend_price', {
+                    model_name: {**payload, 'model': model_name}
+                    for model_name in ['LinTS', 'LinUCB', 'EpsilonGreedy']
+                }, timeout=10))
+                if not model_responses:
+                    raise model_failures['LinTS']
+                for model_name, error in model_failures.items():
+                    st.warning(f"⚠️ {model_name} is unavailable for comparison: {error}")
+                all_model_results = {model_name: model_response.json()
+                                     for model_name, model_response in model_responses.items()}
                 
                 # Store model results for display later
                 st.session_state['model_comparison_results'] = all_model_results
                 
-                # Use the originally selected model for session state
-                result = all_model_results['LinTS']  # Use default LinTS model
+                # Use the originally selected model for session state (or the first that answered)
+                result = all_model_results.get('LinTS', next(iter(all_model_results.values())))
             else:
-                response = requests.post(api_url, json=payload, timeout=10)
+                response = api_client.post('/recommend_price', payload, timeout=10)
                 result = response.json()
             
             # Store results in session state (apply manual overrides if set)
@@ -378,7 +386,6 @@ with tab1:
     
     # Handle Multi-Market Optimization 
     if multi_market_button:
-        api_url = f'{api_base}/optimize_market_and_price'
         payload = {
             'Model': selected_iphone_model,
             'Battery': battery, 
@@ -391,13 +398,17 @@ with tab1:
         
         try:
             if show_model_comparison:
-                # Get multi-market recommendations from all three AI models
-                all_multimarket_results = {}
-                for model_name in ['LinTS', 'LinUCB', 'EpsilonGreedy']:
-                    model_payload = payload.copy()
-                    model_payload['model'] = model_name
-                    model_response = requests.post(api_url, json=model_payload, timeout=15)
-                    all_multimarket_results[model_name] = model_response.json()
+                # Get multi-market recommendations from all three AI models concurrently
+                model_responses, model_failures = split_failures(api_client.post_all('/optimize_market_and_price', {
+                    model_name: {**payload, 'model': model_name}
+                    for model_name in ['LinTS', 'LinUCB', 'EpsilonGreedy']
+                }, timeout=15))
+                if not model_responses:
+                    raise model_failures['LinTS']
+                for model_name, error in model_failures.items():
+                    st.warning(f"⚠️ {model_name} is unavailable for comparison: {error}")
+                all_multimarket_results = {model_name: model_response.json()
+                                           for model_name, model_response in model_responses.items()}
                 
                 # Display comparison of multi-market results
                 st.subheader("🤖 Multi-Market AI Model Comparison")
@@ -435,10 +446,10 @@ with tab1:
                 # Store multimarket model results for display later
                 st.session_state['multimarket_comparison_results'] = all_multimarket_results
                 
-                # Use the originally selected model for session state
-                result = all_multimarket_results['LinTS']  # Use default LinTS model
+                # Use the originally selected model for session state (or the first that answered)
+                result = all_multimarket_results.get('LinTS', next(iter(all_multimarket_results.values())))
             else:
-                response = requests.post(api_url, json=payload, timeout=15)
+                response = api_client.post('/optimize_market_and_price', payload, timeout=15)
                 result = response.json()
             
             if 'best_option' in result and result['best_option']:
@@ -858,26 +869,28 @@ with tab1:
         # Final Action: Send Feedback to AI
         st.markdown("---")
         if st.button('🚀 **SEND FEEDBACK TO AI BANDIT**', type="primary", use_container_width=True):
-            feedback_api_url = f'{api_base}/report_outcome'  # Use same API base
             # Use the manual reward override value or calculated smart reward
             reward_to_send = manual_reward
             feedback_payload = {'decision_id': st.session_state['decision_id'], 'reward': reward_to_send}
             
             try:
-                response = requests.post(feedback_api_url, json=feedback_payload)
+                # Not retried once sent: the bandit must learn from each outcome only once
+                response = api_client.post('/report_outcome', feedback_payload, timeout=10, idempotent=False)
                 if response.status_code == 200:
                     st.success("✅ Feedback sent! The bandit has learned from this outcome.")
                     # Store feedback history
                     if 'feedback_history' not in st.session_state:
                         st.session_state['feedback_history'] = []
-                    st.session_state['feedback_history'].append({
+                    feedback_record = {
                         'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
                         'decision_id': st.session_state['decision_id'],
                         'tier': st.session_state['tier'],
                         'reward': reward_to_send,
                         'sale_outcome': sale_outcome,
                         'features': st.session_state.get('last_payload', {})
-                    })
+                    }
+                    st.session_state['feedback_history'].append(feedback_record)
+                    record_feedback(feedback_record)
                     del st.session_state['decision_id']
                     del st.session_state['tier']
                 else:
@@ -986,13 +999,8 @@ with tab2:
     
     # Load enhanced analytics data
     try:
-        # Load the new analytics dataset from ETL
-        # Use absolute path that works in container environment
-        analytics_data_path = '/app/data/analytics_data.csv' if os.path.exists('/app/data/analytics_data.csv') else os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'analytics_data.csv')
-        df = pd.read_csv(analytics_data_path)
-        
-        # Convert date column to datetime
-        df['date'] = pd.to_datetime(df['date'])
+        # Only the most recent partition is read to anchor the date range
+        max_date = latest_analytics_date()
         
         # Global controls and date range selector
         st.subheader("📅 Global Controls")
@@ -1005,7 +1013,6 @@ with tab2:
             
         with col2:
             # Filter data based on selected period
-            max_date = df['date'].max()
             if selected_period == 'Last 30 Days':
                 start_date = max_date - pd.Timedelta(days=30)
             elif selected_period == 'Last Quarter':
@@ -1013,10 +1020,17 @@ with tab2:
             elif selected_period == 'Year to Date':
                 start_date = pd.Timestamp(year=max_date.year, month=1, day=1)
             else:  # All Time
-                start_date = df['date'].min()
-            
-            filtered_df = df[df['date'] >= start_date]
-            st.info(f"Showing {len(filtered_df):,} records from {start_date.strftime('%Y-%m-%d')}")
+                start_date = None
+            
+            # KPIs and charts come from the ETL's pre-aggregated rollups; only the
+            # distribution plots use a bounded sample of raw transactions
+            rollup = load_rollup(start_date)
+            sample_df = load_analytics_sample(start_date)
+            if start_date is None:
+                # Monthly rollup periods start on the 1st; take the first actual day
+                start_date = earliest_analytics_date()
+            units_sold = int(rollup['units'].sum())
+            st.info(f"Showing {units_sold:,} records from {start_date.strftime('%Y-%m-%d')}")
         
         st.markdown("---")
         
@@ -1026,23 +1040,22 @@ with tab2:
         col1, col2, col3, col4, col5 = st.columns(5)
         
         with col1:
-            total_revenue = filtered_df['revenue_eur'].sum()
+            total_revenue = rollup['revenue_eur_sum'].sum()
             st.metric("💵 Total Revenue", f"€{total_revenue:,.0f}")
             
         with col2:
-            total_profit = filtered_df['profit_eur'].sum()
+            total_profit = rollup['profit_eur_sum'].sum()
             st.metric("💰 Total Profit", f"€{total_profit:,.0f}")
             
         with col3:
-            units_sold = len(filtered_df)
             st.metric("📱 Units Sold", f"{units_sold:,}")
             
         with col4:
-            avg_profit = filtered_df['profit_eur'].mean() if len(filtered_df) > 0 else 0
+            avg_profit = total_profit / units_sold if units_sold > 0 else 0
             st.metric("💹 Avg Profit/Unit", f"€{avg_profit:.0f}")
             
         with col5:
-            avg_days = filtered_df['days_to_sell'].mean() if len(filtered_df) > 0 else 0
+            avg_days = rollup['days_to_sell_sum'].sum() / units_sold if units_sold > 0 else 0
             st.metric("⏱️ Avg Days to Sell", f"{avg_days:.1f}")
         
         st.markdown("---")
@@ -1051,11 +1064,12 @@ with tab2:
         st.subheader("📈 Financial & Sales Trends")
         
         # Aggregate by month for trend analysis
-        monthly_data = filtered_df.groupby(filtered_df['date'].dt.to_period('M')).agg({
-            'revenue_eur': 'sum',
-            'profit_eur': 'sum',
-            'selling_price_eur': 'count'  # Count as units sold
+        monthly_data = rollup.groupby(rollup['period'].dt.to_period('M')).agg({
+            'revenue_eur_sum': 'sum',
+            'profit_eur_sum': 'sum',
+            'units': 'sum'  # Count as units sold
         }).reset_index()
+        monthly_data.columns = ['date', 'revenue_eur', 'profit_eur', 'selling_price_eur']
         monthly_data['date_str'] = monthly_data['date'].astype(str)
         
         if len(monthly_data) > 0:
@@ -1103,9 +1117,7 @@ with tab2:
         with col1:
             # Profitability Leaderboard by Model
             st.subheader("🏆 Profitability Leaderboard")
-            model_profits = filtered_df.groupby('model').agg({
-                'profit_eur': ['sum', 'mean', 'count']
-            }).round(2)
+            model_profits = summarize_rollup(rollup, 'model')[['profit_eur_sum', 'avg_profit_eur', 'units']].round(2)
             model_profits.columns = ['Total Profit (€)', 'Avg Profit (€)', 'Units']
             model_profits = model_profits.sort_values('Total Profit (€)', ascending=False)
             
@@ -1120,9 +1132,7 @@ with tab2:
         with col2:
             # Profitability by Market
             st.subheader("🌍 Market Performance")
-            market_profits = filtered_df.groupby('market').agg({
-                'profit_eur': ['sum', 'mean', 'count']
-            }).round(2)
+            market_profits = summarize_rollup(rollup, 'market')[['profit_eur_sum', 'avg_profit_eur', 'units']].round(2)
             market_profits.columns = ['Total Profit (€)', 'Avg Profit (€)', 'Units']
             market_profits = market_profits.sort_values('Total Profit (€)', ascending=False)
             
@@ -1135,7 +1145,7 @@ with tab2:
         
         # Inventory Velocity vs Profit Analysis
         st.subheader("🔄 Inventory Velocity vs Profit Analysis")
-        fig = px.scatter(filtered_df, x='days_to_sell', y='profit_eur', 
+        fig = px.scatter(sample_df, x='days_to_sell', y='profit_eur', 
                         color='model', size='selling_price_eur',
                         title='Profit vs Days to Sell (Size = Selling Price)',
                         labels={'days_to_sell': 'Days to Sell', 'profit_eur': 'Profit (€)'},
@@ -1146,8 +1156,8 @@ with tab2:
         st.subheader("🔧 Condition Impact Analysis")
         
         try:
-            # Create damage categories
-            filtered_df['condition_category'] = filtered_df['has_damage'].apply(
+            # Create damage categories (rollups already carry condition_category)
+            sample_df['condition_category'] = sample_df['has_damage'].apply(
                 lambda x: 'Damaged' if x else 'Undamaged'
             )
             
@@ -1156,9 +1166,9 @@ with tab2:
             with col1:
                 # Treemap showing model/condition breakdown
                 try:
-                    condition_model_profit = filtered_df.groupby(['model', 'condition_category']).agg({
-                        'profit_eur': 'sum',
-                        'selling_price_eur': 'count'
+                    condition_model_profit = rollup.groupby(['model', 'condition_category']).agg({
+                        'profit_eur_sum': 'sum',
+                        'units': 'sum'
                     }).reset_index()
                     condition_model_profit.columns = ['Model', 'Condition', 'Total_Profit', 'Volume']
                     
@@ -1172,7 +1182,8 @@ with tab2:
                 except Exception as treemap_error:
                     st.warning(f"Treemap visualization not available: {str(treemap_error)}")
                     # Show alternative visualization
-                    damage_summary = filtered_df.groupby('condition_category')['profit_eur'].sum().reset_index()
+                    damage_summary = rollup.groupby('condition_category')['profit_eur_sum'].sum().reset_index()
+                    damage_summary.columns = ['condition_category', 'profit_eur']
                     fig = px.bar(damage_summary, x='condition_category', y='profit_eur',
                                 title='Total Profit by Condition')
                     st.plotly_chart(fig, use_container_width=True)
@@ -1180,22 +1191,17 @@ with tab2:
             with col2:
                 # Simplified condition summary using basic operations
                 try:
-                    # Use more compatible pandas operations
-                    condition_groups = filtered_df.groupby('condition_category')
-                    
-                    summary_data = []
-                    for condition, group in condition_groups:
-                        summary_data.append({
-                            'Condition': condition,
-                            'Avg Profit (€)': round(group['profit_eur'].mean(), 2),
-                            'Total Profit (€)': round(group['profit_eur'].sum(), 2), 
-                            'Count': len(group),
-                            'Avg Days to Sell': round(group['days_to_sell'].mean(), 2),
-                            'Avg Margin': round(group['profit_margin'].mean(), 3)
-                        })
+                    # Means are recovered from the rollup sums
+                    condition_groups = summarize_rollup(rollup, 'condition_category')
                     
-                    condition_summary = pd.DataFrame(summary_data)
-                    condition_summary = condition_summary.set_index('Condition')
+                    condition_summary = pd.DataFrame({
+                        'Avg Profit (€)': condition_groups['avg_profit_eur'].round(2),
+                        'Total Profit (€)': condition_groups['profit_eur_sum'].round(2),
+                        'Count': condition_groups['units'].astype(int),
+                        'Avg Days to Sell': condition_groups['avg_days_to_sell'].round(2),
+                        'Avg Margin': condition_groups['avg_profit_margin'].round(3)
+                    })
+                    condition_summary.index.name = 'Condition'
                     
                     st.subheader("📊 Condition Summary")
                     st.dataframe(condition_summary, use_container_width=True)
@@ -1203,20 +1209,20 @@ with tab2:
                 except Exception as summary_error:
                     st.error(f"Condition analysis error: {str(summary_error)}")
                     # Minimal fallback
-                    damaged_count = len(filtered_df[filtered_df['has_damage'] == True])
-                    undamaged_count = len(filtered_df[filtered_df['has_damage'] == False])
+                    damaged_count = int(rollup.loc[rollup['condition_category'] == 'Damaged', 'units'].sum())
+                    undamaged_count = int(rollup.loc[rollup['condition_category'] == 'Undamaged', 'units'].sum())
                     st.write(f"Damaged devices: {damaged_count}")
                     st.write(f"Undamaged devices: {undamaged_count}")
                 
                 # Damage impact on profit margin - simplified
                 try:
-                    fig = px.box(filtered_df, x='condition_category', y='profit_margin',
+                    fig = px.box(sample_df, x='condition_category', y='profit_margin',
                                 title='Profit Margin Distribution by Condition')
                     st.plotly_chart(fig, use_container_width=True)
                 except Exception as box_error:
                     st.warning(f"Box plot not available: {str(box_error)}")
                     # Alternative: simple histogram
-                    fig = px.histogram(filtered_df, x='profit_margin', color='condition_category',
+                    fig = px.histogram(sample_df, x='profit_margin', color='condition_category',
                                      title='Profit Margin Distribution by Condition')
                     st.plotly_chart(fig, use_container_width=True)
         
@@ -1233,6 +1239,12 @@ with tab2:
 with tab3:
     st.header("🚀 Optimized Business: AI-Driven Performance")
     
+    # Feedback recorded in the embedded store (imported history plus earlier sessions)
+    if 'feedback_history' not in st.session_state or len(st.session_state.get('feedback_history', [])) < 5:
+        stored_feedback = load_feedback_history()
+        if len(stored_feedback) >= 5:
+            st.session_state['feedback_history'] = stored_feedback
+    
     # Auto-populate with demo data if no real feedback exists (for demonstration)
     if 'feedback_history' not in st.session_state or len(st.session_state.get('feedback_history', [])) < 5:
         try:
@@ -1289,10 +1301,8 @@ with tab3:
                 st.session_state['feedback_history'] = minimal_feedback
     
     try:
-        # Load analytics data for baseline comparison
-        # Use absolute path that works in container environment
-        analytics_data_path = '/app/data/analytics_data.csv' if os.path.exists('/app/data/analytics_data.csv') else os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'analytics_data.csv')
-        baseline_df = pd.read_csv(analytics_data_path)
+        # Baseline totals for comparison, aggregated by the store
+        baseline = load_baseline_summary()
         
         # Check if we have feedback history from live recommendations or demo data
         if 'feedback_history' in st.session_state and st.session_state['feedback_history']:
@@ -1311,7 +1321,7 @@ with tab3:
             with col2:
                 # Baseline performance (using vanilla_profit_eur from same number of records)
                 # Use a more conservative baseline estimate that shows realistic simple pricing
-                baseline_sample = baseline_df.sample(n=min(len(feedback_df), len(baseline_df)))
+                baseline_sample = load_baseline_sample(len(feedback_df))
                 # Scale down baseline to represent simpler "market rate only" pricing
                 baseline_total_profit = baseline_sample['vanilla_profit_eur'].sum() * 0.4  # More realistic baseline
                 st.metric("🗜️ Total Profit (Simple Model)", f"€{baseline_total_profit:.0f}")
@@ -1343,7 +1353,7 @@ with tab3:
             feedback_df_sorted['cumulative_ai_profit'] = feedback_df_sorted['reward'].cumsum()
             
             # Create baseline cumulative (assuming fixed performance)
-            baseline_avg = baseline_df['vanilla_profit_eur'].mean()
+            baseline_avg = baseline['vanilla_profit_mean']
             feedback_df_sorted['cumulative_simple_profit'] = [baseline_avg * (i + 1) for i in range(len(feedback_df_sorted))]
             feedback_df_sorted['decision_number'] = range(1, len(feedback_df_sorted) + 1)
             
@@ -1469,11 +1479,11 @@ with tab3:
             
             # Show some baseline statistics from the analytics data
             st.subheader("📋 Baseline Model Insights")
-            st.write(f"**Dataset Size**: {len(baseline_df):,} historical transactions")
+            st.write(f"**Dataset Size**: {baseline['transactions']:,} historical transactions")
             
-            if 'vanilla_profit_eur' in baseline_df.columns:
-                baseline_avg_profit = baseline_df['vanilla_profit_eur'].mean()
-                baseline_total_profit = baseline_df['vanilla_profit_eur'].sum()
+            if baseline['transactions']:
+                baseline_avg_profit = baseline['vanilla_profit_mean']
+                baseline_total_profit = baseline['vanilla_profit_total']
                 
                 col1, col2, col3 = st.columns(3)
                 with col1:
@@ -1481,7 +1491,7 @@ with tab3:
                 with col2:
                     st.metric("Baseline Total Profit", f"€{baseline_total_profit:,.0f}")
                 with col3:
-                    profit_margin_avg = baseline_df['profit_margin'].mean() if 'profit_margin' in baseline_df.columns else 0
+                    profit_margin_avg = baseline['profit_margin_mean']
                     st.metric("Baseline Avg Margin", f"{profit_margin_avg:.1%}")
     
     except FileNotFoundError: